@@ -0,0 +1,119 @@
+"""
+Micro-benchmark: extractores de nautapy.html_parsers vs BeautifulSoup
+
+Compara, sobre las páginas grabadas del portal en ``test/assets``, el tiempo
+por operación y la memoria transitoria máxima (tracemalloc) de cada
+extracción que hace el protocolo.
+
+Usage:
+    python -m benchmarks.bench_html_parsers [--number N]
+
+Requiere beautifulsoup4 (requirements/test.txt).
+"""
+
+import argparse
+import os
+import timeit
+import tracemalloc
+
+import bs4
+
+from nautapy import html_parsers
+from nautapy.utils import format_table
+
+_assets_dir = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "test",
+    "assets",
+)
+
+CREDIT_SELECTOR = "#sessioninfo > tbody:nth-child(1) > tr:nth-child(2) > td:nth-child(2)"
+
+
+def read_asset(asset_name):
+    with open(os.path.join(_assets_dir, asset_name)) as fp:
+        return fp.read()
+
+
+def _bs4_inputs(soup):
+    return {
+        _["name"]: _.get("value", default=None)
+        for _ in soup.select("input[name]")
+    }
+
+
+def bs4_landing(html):
+    return _bs4_inputs(bs4.BeautifulSoup(html, "html.parser"))
+
+
+def bs4_login_form(html):
+    form_soup = bs4.BeautifulSoup(html, "html.parser").find("form", id="formulario")
+    return form_soup["action"], _bs4_inputs(form_soup)
+
+
+def bs4_last_script(html):
+    return bs4.BeautifulSoup(html, "html.parser").find_all("script")[-1].get_text()
+
+
+def bs4_credit(html):
+    return bs4.BeautifulSoup(html, "html.parser").select_one(CREDIT_SELECTOR).get_text()
+
+
+def fast_credit(html):
+    return html_parsers.extract_child_path_text(
+        html, "sessioninfo", [("tbody", 1), ("tr", 2), ("td", 2)]
+    )
+
+
+CASES = [
+    # (nombre, página, implementación bs4, extractor)
+    ("landing inputs", "landing.html", bs4_landing, html_parsers.extract_inputs),
+    ("form#formulario", "login_page.html", bs4_login_form,
+     lambda html: html_parsers.extract_form(html, "formulario")),
+    ("last <script>", "logged_in.html", bs4_last_script, html_parsers.extract_last_script),
+    ("#sessioninfo credit", "user_info.html", bs4_credit, fast_credit),
+]
+
+
+def peak_memory(func, html):
+    tracemalloc.start()
+    try:
+        func(html)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def per_call_us(func, html, number):
+    best = min(timeit.repeat(lambda: func(html), number=number, repeat=5))
+    return best / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--number", type=int, default=200,
+                        help="Iteraciones por repetición")
+    args = parser.parse_args()
+
+    headers = ["Caso", "bs4 µs", "rápido µs", "speedup", "bs4 KiB", "rápido KiB"]
+    rows = []
+    for name, asset, slow, fast in CASES:
+        html = read_asset(asset)
+        assert slow(html) == fast(html), "Resultados distintos en {}".format(name)
+
+        slow_us = per_call_us(slow, html, args.number)
+        fast_us = per_call_us(fast, html, args.number)
+        rows.append([
+            name,
+            "{:.1f}".format(slow_us),
+            "{:.1f}".format(fast_us),
+            "{:.1f}x".format(slow_us / fast_us),
+            "{:.1f}".format(peak_memory(slow, html) / 1024),
+            "{:.1f}".format(peak_memory(fast, html) / 1024),
+        ])
+
+    print(format_table(headers, rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark de up/down/info contra el simulador local del portal
+
+Levanta ``test/portal_server.py`` en otro proceso y mide:
+
+- Por fase, dentro de este proceso: comprobación de conexión, creación de
+  la sesión del portal (página de entrada y formulario), envío de las
+  credenciales, consulta del tiempo restante, cierre de sesión y consulta
+  del crédito.
+- De extremo a extremo: ``nauta up -b``, ``nauta info`` y ``nauta down``
+  como procesos aparte, con un HOME temporal, igual que los ejecutaría un
+  usuario.
+
+No necesita una cuenta Nauta ni conexión a la red, así que sirve para
+detectar regresiones de rendimiento.
+
+Usage:
+    python -m benchmarks.bench_portal [--iterations N] [--cli-iterations N]
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from nautapy.utils import format_table
+
+USER = "benchmark@nauta.com.cu"
+PASSWORD = "benchmark"
+
+
+def _serve_portal(queue):
+    from test.portal_server import PortalServer
+
+    server = PortalServer({USER: PASSWORD})
+    queue.put((server.url, server.check_page, server.no_content_page))
+    server.serve_forever()
+
+
+def _measure(timings, name, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    timings.setdefault(name, []).append(time.perf_counter() - started)
+    return result
+
+
+def bench_phases(iterations):
+    from nautapy import nauta_api
+    from nautapy.nauta_api import NautaClient, NautaProtocol
+
+    timings = {}
+    for _ in range(iterations):
+        _measure(timings, "is_connected", NautaProtocol.is_connected)
+        session = _measure(timings, "create_session", NautaProtocol.create_session)
+        session.attribute_uuid = _measure(
+            timings, "login", NautaProtocol.login, session, USER, PASSWORD
+        )
+        session.save(USER)
+        _measure(timings, "get_user_time", NautaProtocol.get_user_time, session, USER)
+        _measure(timings, "logout", NautaProtocol.logout, session, USER)
+        session.dispose()
+        _measure(timings, "user_credit", lambda: NautaClient(USER, PASSWORD).user_credit)
+
+    assert not os.path.exists(nauta_api.NAUTA_SESSION_FILE)
+    return timings
+
+
+def bench_cli(iterations, env):
+    def nauta(*args):
+        subprocess.run(
+            [sys.executable, "-m", "nautapy", "--no-daemon"] + list(args),
+            env=env,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+    nauta("users", "add", USER, PASSWORD)
+
+    timings = {}
+    for _ in range(iterations):
+        _measure(timings, "nauta up -b", nauta, "up", "-b")
+        _measure(timings, "nauta info", nauta, "info")
+        _measure(timings, "nauta down", nauta, "down")
+    return timings
+
+
+def print_table(timings):
+    headers = ["Operación", "Media (ms)", "p50 (ms)", "p95 (ms)", "Máx (ms)"]
+    rows = []
+    for name, values in timings.items():
+        values = sorted(values)
+        rows.append([
+            name,
+            "{:.2f}".format(statistics.mean(values) * 1000),
+            "{:.2f}".format(values[len(values) // 2] * 1000),
+            "{:.2f}".format(values[min(len(values) - 1, int(len(values) * 0.95))] * 1000),
+            "{:.2f}".format(values[-1] * 1000),
+        ])
+
+    print(format_table(headers, rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--iterations", type=int, default=50,
+                        help="Repeticiones de las fases medidas en este proceso")
+    parser.add_argument("-c", "--cli-iterations", type=int, default=5,
+                        help="Repeticiones de up/info/down como procesos aparte")
+    args = parser.parse_args()
+
+    queue = multiprocessing.Queue()
+    portal = multiprocessing.Process(target=_serve_portal, args=(queue,), daemon=True)
+    portal.start()
+    portal_url, check_page, no_content_page = queue.get()
+
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(
+            os.environ,
+            HOME=home,
+            NAUTAPY_PORTAL_URL=portal_url,
+            NAUTAPY_CHECK_PAGE=check_page,
+            NAUTAPY_NO_CONTENT_PAGE=no_content_page,
+        )
+
+        # Las fases se miden en este proceso, con el estado en el HOME temporal
+        from nautapy import nauta_api, sqlite_utils
+
+        nauta_api.set_portal(portal_url, check_page, no_content_page)
+        nauta_api.NAUTA_SESSION_FILE = os.path.join(home, "nauta-session")
+        sqlite_utils.CONNECTIONS_DB = os.path.join(home, "connections.db")
+        nauta_api.NautaProtocol.connectivity.cache_file = None
+
+        print("Fases ({} repeticiones):".format(args.iterations))
+        print_table(bench_phases(args.iterations))
+
+        print("\nDe extremo a extremo ({} repeticiones):".format(args.cli_iterations))
+        print_table(bench_cli(args.cli_iterations, env))
+        sqlite_utils.close_all()
+
+    portal.terminate()
+
+
+if __name__ == "__main__":
+    main()
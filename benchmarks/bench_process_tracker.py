@@ -0,0 +1,105 @@
+"""
+Benchmark de la comprobación de openvpn antes del logout
+
+Simula un equipo con muchos procesos (``--processes`` procesos ``sleep``
+además de los que ya haya) y compara:
+
+- ``process_iter + name()``: recorrer la tabla pidiendo el nombre de cada
+  proceso, como hacía ``check_if_process_running`` originalmente.
+- ``scan``: el recorrido único de :class:`ProcessTracker` que solo pide el
+  nombre (proceso no encontrado, caché negativa desactivada).
+- ``pid en caché``: el proceso ya se encontró y solo se valida su PID.
+- ``fichero de PID``: el PID se lee de un fichero.
+- ``caché negativa``: el proceso no existe y se comprobó hace poco.
+
+Usage:
+    python -m benchmarks.bench_process_tracker [--processes N] [--iterations N]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+import psutil
+
+from nautapy.process_tracker import ProcessTracker
+from nautapy.utils import format_table
+
+NAME = "nautabenchvpn"
+
+
+def legacy_check(name):
+    for proc in psutil.process_iter():
+        try:
+            if name in proc.name().lower():
+                return True
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            pass
+    return False
+
+
+def measure(func, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-p", "--processes", type=int, default=500,
+                        help="Procesos adicionales para simular un equipo ocupado")
+    parser.add_argument("-n", "--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    sleep = shutil.which("sleep")
+    extra = [subprocess.Popen([sleep, "600"]) for _ in range(args.processes)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        executable = os.path.join(tmp_dir, NAME)
+        shutil.copy(sleep, executable)
+        vpn = subprocess.Popen([executable, "600"])
+        while psutil.Process(vpn.pid).name() != NAME:
+            time.sleep(0.01)
+        pidfile = os.path.join(tmp_dir, "vpn.pid")
+        with open(pidfile, "w") as fp:
+            fp.write(str(vpn.pid))
+
+        try:
+            print("Procesos en el sistema: {}".format(len(psutil.pids())))
+            cached = ProcessTracker(NAME)
+            cached.find()
+            missing = ProcessTracker("noexiste", negative_ttl=3600)
+            missing.find()
+
+            def pidfile_lookup():
+                ProcessTracker(NAME, pidfiles=(pidfile,)).find()
+
+            results = [
+                ("process_iter + name()", measure(lambda: legacy_check("noexiste"), args.iterations)),
+                ("scan", measure(ProcessTracker("noexiste", negative_ttl=0).find, args.iterations)),
+                ("pid en caché", measure(cached.find, args.iterations)),
+                ("fichero de PID", measure(pidfile_lookup, args.iterations)),
+                ("caché negativa", measure(missing.find, args.iterations)),
+            ]
+        finally:
+            for proc in extra + [vpn]:
+                proc.kill()
+                proc.wait()
+
+    headers = ["Método", "Media (ms)", "Máx (ms)"]
+    rows = [
+        [name, "{:.3f}".format(statistics.mean(t) * 1000), "{:.3f}".format(max(t) * 1000)]
+        for name, t in results
+    ]
+    print(format_table(headers, rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Coste de recuperación de login y logout ante fallos del portal
+
+Para cada perfil de fallos levanta el simulador de ``test/portal_server.py``
+con esos fallos y mide el tiempo real hasta completar un login y un logout,
+reintentando como lo haría el usuario (otra vez el mismo comando) cuando
+nautapy se rinde. En el logout ese tiempo se cobra: la sesión sigue abierta
+mientras no se consigue cerrar.
+
+Usage:
+    python -m benchmarks.bench_recovery [--deadline S] [--fault SPEC ...]
+
+Con ``--fault`` (formato de ``Fault.parse``, se puede repetir) se mide solo
+ese perfil en lugar de los predefinidos.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from requests import RequestException
+
+from nautapy import nauta_api, sqlite_utils
+from nautapy.exceptions import NautaException
+from nautapy.nauta_api import NautaClient
+from nautapy.utils import format_table
+from test.portal_server import Fault, PortalServer
+
+USER = "benchmark@nauta.com.cu"
+PASSWORD = "benchmark"
+
+PROFILES = {
+    "sin fallos": [],
+    "latencia 300 ms": [Fault("latency", delay=0.3)],
+    "cuerpo lento": [Fault("slow_body", delay=0.05, chunk_size=512)],
+    "login 503 x2": [Fault("error", route="/LoginServlet", times=2)],
+    "login alert x1": [Fault("alert", route="/LoginServlet", times=1)],
+    "entrada cortada x1": [Fault("drop", route="/", times=1)],
+    "logout 503 x1": [Fault("error", route="/LogoutServlet", times=1)],
+    "logout cortado x1": [Fault("drop", route="/LogoutServlet", times=1)],
+    "logout cortado x2": [Fault("drop", route="/LogoutServlet", times=2)],
+}
+
+
+def _until_success(action, deadline):
+    """
+    Repite ``action`` hasta que no falle
+
+    Returns:
+        tuple: ``(segundos, intentos, error)``; ``error`` es el último
+        error si se agotó el plazo.
+    """
+    started = time.monotonic()
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            # nautapy informa de los reintentos por stdout
+            with contextlib.redirect_stdout(io.StringIO()):
+                action()
+            return time.monotonic() - started, attempts, None
+        except (NautaException, RequestException) as ex:
+            if time.monotonic() - started > deadline:
+                return time.monotonic() - started, attempts, ex
+
+
+def run_profile(faults, deadline):
+    with PortalServer({USER: PASSWORD}, faults=faults) as portal:
+        nauta_api.set_portal(portal.url, portal.check_page, portal.no_content_page)
+        client = NautaClient(USER, PASSWORD)
+
+        def login():
+            if client.session:
+                client.session.dispose()
+                client.session = None
+            client.login()
+
+        login_result = _until_success(login, deadline)
+        logout_result = _until_success(client.logout, deadline)
+        requests_sent = len(portal.state.requests)
+
+    return login_result, logout_result, requests_sent
+
+
+def _format(result):
+    seconds, attempts, error = result
+    text = "{:.2f} s ({} int.)".format(seconds, attempts)
+    return text + " sin éxito" if error else text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--deadline", type=float, default=120,
+                        help="Segundos máximos reintentando cada operación")
+    parser.add_argument("-f", "--fault", action="append", type=Fault.parse, default=[],
+                        help="Fallo del perfil a medir (TIPO[:RUTA[:VECES[:PARÁMETRO]]])")
+    args = parser.parse_args()
+
+    profiles = {"personalizado": args.fault} if args.fault else PROFILES
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        nauta_api.NAUTA_SESSION_FILE = os.path.join(tmp_dir, "nauta-session")
+        sqlite_utils.CONNECTIONS_DB = os.path.join(tmp_dir, "connections.db")
+        nauta_api.NautaProtocol.connectivity.cache_file = None
+
+        headers = ["Perfil", "Login", "Logout (tiempo cobrado)", "Peticiones"]
+        rows = []
+        baseline = None
+        for name, faults in profiles.items():
+            login_result, logout_result, requests_sent = run_profile(faults, args.deadline)
+            if baseline is None:
+                baseline = logout_result[0]
+            logout = _format(logout_result)
+            if name != "sin fallos":
+                logout += " {:+.2f} s".format(logout_result[0] - baseline)
+            rows.append([name, _format(login_result), logout, requests_sent])
+            print("Medido: {}".format(name))
+
+        sqlite_utils.close_all()
+
+    print()
+    print(format_table(headers, rows))
+
+
+if __name__ == "__main__":
+    main()
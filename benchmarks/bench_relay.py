@@ -0,0 +1,161 @@
+"""
+Benchmark del reenvío de túneles CONNECT del proxy: splice vs buffered
+
+Levanta el proxy en este proceso y, en procesos aparte, un servidor de eco
+local y los clientes que envían datos a través de túneles CONNECT. Así el
+tiempo de CPU medido en este proceso es solo el del proxy.
+
+Usage:
+    python -m benchmarks.bench_relay [--connections N] [--megabytes MB]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import socketserver
+import threading
+import time
+
+from nautapy import relay
+from nautapy.proxy import ProxyServer, SessionManager
+from nautapy.utils import format_table
+
+CHUNK = 64 * 1024
+
+
+class _NoSessionClient(object):
+    user = "benchmark"
+
+    def login(self):
+        return self
+
+    def logout(self):
+        pass
+
+
+class _EchoHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            data = self.request.recv(CHUNK)
+            if not data:
+                break
+            self.request.sendall(data)
+
+
+def _echo_server(port_queue):
+    socketserver.ThreadingTCPServer.daemon_threads = True
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _EchoHandler)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def _tunnel_client(proxy_port, echo_port, total_bytes):
+    sock = socket.create_connection(("127.0.0.1", proxy_port))
+    sock.sendall("CONNECT 127.0.0.1:{} HTTP/1.1\r\n\r\n".format(echo_port).encode())
+    response = b""
+    while not response.endswith(b"\r\n\r\n"):
+        response += sock.recv(1)
+
+    payload = b"x" * CHUNK
+
+    def send():
+        sent = 0
+        while sent < total_bytes:
+            sock.sendall(payload)
+            sent += len(payload)
+        sock.shutdown(socket.SHUT_WR)
+
+    sender = threading.Thread(target=send)
+    sender.start()
+    received = 0
+    while True:
+        data = sock.recv(CHUNK)
+        if not data:
+            break
+        received += len(data)
+    sender.join()
+    sock.close()
+    return received
+
+
+def _load(proxy_port, echo_port, connections, total_bytes, result_queue):
+    threads = []
+    started = time.monotonic()
+    for _ in range(connections):
+        thread = threading.Thread(
+            target=_tunnel_client, args=(proxy_port, echo_port, total_bytes)
+        )
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    result_queue.put(time.monotonic() - started)
+
+
+async def _measure(mode, echo_port, connections, total_bytes):
+    proxy = ProxyServer(
+        SessionManager(_NoSessionClient(), session_is_open=lambda: True),
+        host="127.0.0.1",
+        port=0,
+        relay_mode=mode,
+    )
+    await proxy.start()
+
+    result_queue = multiprocessing.Queue()
+    load = multiprocessing.Process(
+        target=_load,
+        args=(proxy.port, echo_port, connections, total_bytes, result_queue),
+    )
+
+    cpu_started = time.process_time()
+    load.start()
+    loop = asyncio.get_running_loop()
+    elapsed = await loop.run_in_executor(None, result_queue.get)
+    cpu = time.process_time() - cpu_started
+    await loop.run_in_executor(None, load.join)
+
+    proxy.server.close()
+    await proxy.server.wait_closed()
+    return elapsed, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-c", "--connections", type=int, default=4,
+                        help="Túneles simultáneos")
+    parser.add_argument("-m", "--megabytes", type=int, default=256,
+                        help="MB enviados (y recibidos de vuelta) por túnel")
+    args = parser.parse_args()
+
+    port_queue = multiprocessing.Queue()
+    echo = multiprocessing.Process(target=_echo_server, args=(port_queue,), daemon=True)
+    echo.start()
+    echo_port = port_queue.get()
+
+    modes = ["buffered"] + (["splice"] if relay.SPLICE_AVAILABLE else [])
+    total_bytes = args.megabytes * 1024 * 1024
+
+    headers = ["Modo", "MB/s", "CPU s", "CPU s/conexión", "CPU ms/MB"]
+    rows = []
+    for mode in modes:
+        elapsed, cpu = asyncio.run(
+            _measure(mode, echo_port, args.connections, total_bytes)
+        )
+        # Cada byte atraviesa el proxy dos veces: ida y vuelta del eco
+        megabytes = 2 * args.megabytes * args.connections
+        rows.append([
+            mode,
+            "{:.1f}".format(megabytes / elapsed),
+            "{:.2f}".format(cpu),
+            "{:.3f}".format(cpu / args.connections),
+            "{:.2f}".format(cpu * 1000 / megabytes),
+        ])
+
+    echo.terminate()
+
+    print(format_table(headers, rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark del resumen mensual (``nauta -rc``) sobre un historial grande
+
+Genera un ``connections.db`` sintético y compara tres formas de obtener las
+horas por usuario y mes:
+
+- ``python``: cargar todas las conexiones y agregarlas con ``strptime`` en
+  Python, como hacía ``resume_connections`` originalmente.
+- ``sql``: un único ``GROUP BY user, month`` en SQLite sobre todas las
+  conexiones (:func:`sql_resume`).
+- ``rollup``: leer la tabla ``monthly_usage`` que mantiene ``save_logout``
+  (:func:`nautapy.sqlite_utils.monthly_usage`).
+
+Usage:
+    python -m benchmarks.bench_resume [--rows N] [--users N] [--keep PATH]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from nautapy import sqlite_utils
+from nautapy.utils import format_table
+
+
+def create_history(rows, users, years=5):
+    """Inserta ``rows`` conexiones de ``users`` usuarios en los últimos ``years`` años"""
+    rnd = random.Random(0)
+    names = ["usuario{:02d}@nauta.com.cu".format(i) for i in range(users)]
+    end = int(time.time())
+    start = end - years * 365 * 24 * 3600
+
+    def connections():
+        for _ in range(rows):
+            inicio = rnd.randrange(start, end)
+            cierre = inicio + rnd.randrange(60, 4 * 3600)
+            inicio_dt = datetime.fromtimestamp(inicio)
+            cierre_dt = datetime.fromtimestamp(cierre)
+            yield rnd.choice(names), str(inicio_dt), str(cierre_dt), inicio, cierre
+
+    conn = sqlite_utils.connections_db()
+    with conn:
+        conn.executemany(
+            """
+            INSERT INTO connections
+                (user, fecha_inicio_sesion, fecha_cierre_sesion, inicio_ts, cierre_ts)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            connections(),
+        )
+    sqlite_utils.rebuild_monthly_usage()
+
+
+def python_resume():
+    """Agregación original: todas las filas en memoria y fechas con strptime"""
+    user_hours_per_month = defaultdict(lambda: defaultdict(float))
+    for user, fecha_inicio, fecha_cierre in sqlite_utils.list_connections(None):
+        if not fecha_cierre:
+            continue
+        inicio_dt = datetime.strptime(fecha_inicio.split(".")[0], "%Y-%m-%d %H:%M:%S")
+        cierre_dt = datetime.strptime(fecha_cierre.split(".")[0], "%Y-%m-%d %H:%M:%S")
+        duration = (cierre_dt - inicio_dt).total_seconds() / 3600.0
+        user_hours_per_month[user][inicio_dt.strftime("%Y-%m")] += duration
+
+    # Usuarios en el orden de su primera conexión y meses del más reciente
+    # al más antiguo, como el resumen original
+    return [
+        (user, month, round(hours * 3600))
+        for user, months in user_hours_per_month.items()
+        for month, hours in sorted(months.items(), reverse=True)
+    ]
+
+
+def sql_resume():
+    """La misma agregación con la que se reconstruye ``monthly_usage``, hecha al vuelo"""
+    return sqlite_utils.connections_db().execute(
+        sqlite_utils._MONTHLY_USAGE_SELECT + " ORDER BY user, month DESC"
+    ).fetchall()
+
+
+def _measure(func):
+    started = time.perf_counter()
+    result = func()
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-r", "--rows", type=int, default=1000000, help="Conexiones a generar")
+    parser.add_argument("-u", "--users", type=int, default=40, help="Usuarios distintos")
+    parser.add_argument("--keep", help="Generar la base de datos en PATH y no borrarla")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sqlite_utils.CONNECTIONS_DB = args.keep or os.path.join(tmp_dir, "connections.db")
+
+        print("Generando {} conexiones ...".format(args.rows))
+        elapsed, _ = _measure(lambda: create_history(args.rows, args.users))
+        print("Generadas en {:.1f} s\n".format(elapsed))
+
+        python_time, python_result = _measure(python_resume)
+        sql_time, sql_result = _measure(sql_resume)
+        rollup_time, rollup_result = _measure(sqlite_utils.monthly_usage)
+        sqlite_utils.close_all()
+
+    # Las duraciones pueden diferir en los cambios de horario, porque las
+    # fechas en texto están en hora local; los grupos deben ser los mismos
+    assert [row[:2] for row in python_result] == [row[:2] for row in rollup_result], \
+        "La agregación en Python no coincide con el resumen mensual"
+    assert sorted(rollup_result) == sorted(sql_result), "El resumen mensual no coincide con la agregación"
+
+    headers = ["Método", "Tiempo (s)", "Filas resultado", "Aceleración"]
+    rows = [
+        [name, "{:.3f}".format(seconds), len(result), "{:.1f}x".format(python_time / seconds)]
+        for name, seconds, result in (
+            ("python", python_time, python_result),
+            ("sql", sql_time, sql_result),
+            ("rollup", rollup_time, rollup_result),
+        )
+    ]
+
+    print(format_table(headers, rows))
+
+
+if __name__ == "__main__":
+    main()
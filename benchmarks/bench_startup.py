@@ -0,0 +1,124 @@
+"""
+Tiempo de arranque de los subcomandos que no acceden a la red
+
+``nauta is-logged-in``, ``nauta users list`` y ``nauta --list-conn`` solo
+leen ficheros y SQLite, y se llaman a menudo desde prompts y scripts de
+monitorización. Este benchmark los ejecuta con ``python -X importtime``
+(con un HOME temporal) y mide:
+
+- El tiempo de importación de los módulos que carga nautapy, descontando
+  los que ya carga un intérprete vacío.
+- El tiempo total del proceso.
+- Si se cargó alguna dependencia pesada (requests, psutil, httpx...).
+
+Termina con código 1 si se supera ``--max-import-ms`` o se carga una
+dependencia pesada, para usarlo como prueba de regresión.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs N] [--max-import-ms MS]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from nautapy.utils import format_table
+
+COMMANDS = [
+    ["is-logged-in"],
+    ["users", "list"],
+    ["--list-conn"],
+]
+
+# Módulos que estos subcomandos no deberían cargar
+HEAVY_MODULES = (
+    "requests", "urllib3", "psutil", "httpx", "bs4", "ssl", "http.cookiejar", "asyncio",
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr):
+    """
+    Returns:
+        dict: ``{módulo: microsegundos acumulados}`` de los módulos de
+        primer nivel, y el conjunto de todos los módulos cargados.
+    """
+    top_level = {}
+    loaded = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+
+        loaded.add(name.strip())
+        # Los módulos de primer nivel van precedidos de un solo espacio
+        if not name.startswith("  "):
+            top_level[name.strip()] = int(cumulative)
+    return top_level, loaded
+
+
+def run(args, env):
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime"] + args,
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True,
+    )
+    return time.perf_counter() - started, proc.stderr
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--runs", type=int, default=10)
+    parser.add_argument("--max-import-ms", type=float, default=60,
+                        help="Tiempo de importación máximo (mediana) por subcomando")
+    args = parser.parse_args()
+
+    headers = ["Subcomando", "Importación (ms)", "Proceso (ms)", "Dependencias pesadas"]
+    rows = []
+    failed = False
+
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, HOME=home, PYTHONPATH=ROOT)
+        baseline, _ = parse_importtime(run(["-c", "pass"], env)[1])
+
+        for command in COMMANDS:
+            import_times, wall_times, heavy = [], [], set()
+            for _ in range(args.runs):
+                wall, stderr = run(["-m", "nautapy", "--no-daemon"] + command, env)
+                top_level, loaded = parse_importtime(stderr)
+                import_times.append(sum(
+                    us for name, us in top_level.items() if name not in baseline
+                ) / 1000)
+                wall_times.append(wall * 1000)
+                heavy |= loaded.intersection(HEAVY_MODULES)
+
+            import_ms = statistics.median(import_times)
+            failed |= bool(heavy) or import_ms > args.max_import_ms
+            rows.append([
+                " ".join(command),
+                "{:.1f}".format(import_ms),
+                "{:.1f}".format(statistics.median(wall_times)),
+                ", ".join(sorted(heavy)) or "-",
+            ])
+
+    print(format_table(headers, rows))
+
+    if failed:
+        print(
+            "\nRegresión: importación por encima de {} ms o dependencias pesadas cargadas".format(
+                args.max_import_ms
+            ),
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 import os
 
 
+# Directorio de datos; se crea al escribir el primer fichero
+# (utils.ensure_parent_dir), no al importar el paquete
 appdata_path = os.path.expanduser("~/.local/share/nautapy")
-os.makedirs(appdata_path, exist_ok=True)
-
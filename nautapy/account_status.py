@@ -0,0 +1,121 @@
+"""
+Consulta en paralelo del estado de todas las cuentas guardadas
+
+``nauta users status`` pregunta al portal el tiempo restante de cada cuenta
+(y el crédito, si no hay conexión) con un número limitado de hilos, en lugar
+de ejecutar ``nauta info`` cuenta por cuenta. Cada consulta usa su propia
+sesión HTTP en memoria, con un timeout por petición, así que no toca el
+fichero de la sesión abierta.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from nautapy import tracing, utils
+from nautapy.exceptions import NautaException
+from nautapy.nauta_api import NautaProtocol, SessionObject
+
+DEFAULT_WORKERS = 8
+DEFAULT_TIMEOUT = 10
+
+
+class _TimeoutSession(requests.Session):
+    """``requests.Session`` que aplica ``timeout`` a todas sus peticiones"""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, *args, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(*args, **kwargs)
+
+
+class AccountStatus(object):
+    """
+    Resultado de la consulta de una cuenta
+
+    Attributes:
+        user: Usuario Nauta.
+        remaining_time: Tiempo restante (texto del portal) o el error.
+        credit: Crédito, el error o None si no se consultó.
+        latency: Segundos que tardó la consulta.
+        ok: False si alguna consulta falló.
+    """
+
+    def __init__(self, user, remaining_time, credit, latency, ok):
+        self.user = user
+        self.remaining_time = remaining_time
+        self.credit = credit
+        self.latency = latency
+        self.ok = ok
+
+
+def _error_text(ex):
+    # Los mensajes de requests ocupan varias líneas de la tabla
+    if isinstance(ex, requests.RequestException):
+        return "Error de red ({})".format(type(ex).__name__)
+    return str(ex.args[0]) if ex.args else type(ex).__name__
+
+
+def query_account(user, password, online, timeout=DEFAULT_TIMEOUT):
+    """
+    Consulta el tiempo restante de ``user`` y, si ``online`` es False, su crédito
+
+    Returns:
+        AccountStatus: Los errores se devuelven como texto, sin lanzarlos.
+    """
+    started = time.perf_counter()
+    ok = True
+    credit = None
+
+    with tracing.span("status.account", user=user):
+        http = _TimeoutSession(timeout)
+        try:
+            try:
+                remaining_time = NautaProtocol.get_user_time(
+                    SessionObject(requests_session=http), user
+                ).strip()
+                utils.strtime2seconds(remaining_time)
+            except (requests.RequestException, NautaException) as ex:
+                ok = False
+                remaining_time = _error_text(ex)
+
+            if not online:
+                try:
+                    session = NautaProtocol.create_session(http)
+                    credit = NautaProtocol.get_user_credit(session, user, password)
+                except (requests.RequestException, NautaException) as ex:
+                    ok = False
+                    credit = _error_text(ex)
+        finally:
+            http.close()
+
+    return AccountStatus(user, remaining_time, credit, time.perf_counter() - started, ok)
+
+
+def sweep(credentials, workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT, online=None):
+    """
+    Consulta todas las cuentas de ``credentials`` con hasta ``workers`` hilos
+
+    Args:
+        credentials: Lista ``[(usuario, contraseña)]``.
+        online: Si hay conexión; por defecto se comprueba una sola vez antes
+            de empezar.
+
+    Returns:
+        tuple: Los :class:`AccountStatus` en el orden de ``credentials`` y
+        los segundos totales transcurridos.
+    """
+    if online is None:
+        online = NautaProtocol.is_connected()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = list(executor.map(
+            lambda item: query_account(item[0], item[1], online, timeout), credentials
+        ))
+
+    return results, time.perf_counter() - started
@@ -0,0 +1,352 @@
+"""
+Asyncio API for interacting with Nauta Captive Portal
+
+Same operations as :mod:`nautapy.nauta_api`, but every network call is
+awaitable and all of them share one pooled ``httpx.AsyncClient`` per client.
+Requires the optional dependency ``httpx`` (``pip install nautapy[async]``).
+
+Example:
+    async with AsyncNautaClient("pepe@nauta.com.cu", "pepepass") as nauta_client:
+        await nauta_client.login()
+        # We are connected
+        print(await nauta_client.get_remaining_time())
+
+    # We are disconnected now
+
+"""
+
+import asyncio
+import subprocess
+
+import httpx
+
+from nautapy.__about__ import __name__ as prog_name
+from nautapy.exceptions import (
+    NautaLoginException,
+    NautaLogoutException,
+    NautaException,
+    NautaPreLoginException,
+)
+from nautapy import nauta_api
+from nautapy.nauta_api import (
+    NautaProtocol,
+    SessionObject,
+    portal_reachable,
+)
+from nautapy.retry import NO_RETRY, RetryPolicy
+from nautapy.sqlite_utils import save_logout
+
+DEFAULT_TIMEOUT = 30
+
+
+async def _run_blocking(func, *args):
+    """Ejecuta ``func`` en el executor por defecto para no bloquear el event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, func, *args)
+
+
+class AsyncSessionObject(SessionObject):
+    """:class:`SessionObject` sobre el cliente httpx compartido del cliente"""
+
+    def __init__(
+            self,
+            http_client,
+            login_action=None,
+            csrfhw=None,
+            wlanuserip=None,
+            attribute_uuid=None,
+    ):
+        # Se mantiene el nombre del atributo para reutilizar save/dispose
+        self.requests_session = http_client
+
+        self.login_action = login_action
+        self.csrfhw = csrfhw
+        self.wlanuserip = wlanuserip
+        self.attribute_uuid = attribute_uuid
+
+    def _cookie_jar(self):
+        return self.requests_session.cookies.jar
+
+    @classmethod
+    def load(cls, http_client):
+        inst = object.__new__(cls)
+        inst.requests_session = http_client
+        return cls._restore(inst)
+
+
+class AsyncNautaProtocol(object):
+    """Protocol Layer (Interface), asyncio version
+
+    Mirrors :class:`NautaProtocol` over an ``httpx.AsyncClient``. The HTML
+    parsing is shared with the synchronous protocol.
+
+    """
+
+    @classmethod
+    async def is_connected(cls):
+        # Las mismas sondas y la misma caché que NautaProtocol.is_connected,
+        # en un hilo para no bloquear el event loop
+        return await _run_blocking(NautaProtocol.is_connected)
+
+    @classmethod
+    async def create_session(cls, http_client):
+        if await cls.is_connected():
+            if SessionObject.is_logged_in():
+                raise NautaPreLoginException("Hay una sessión abierta")
+            else:
+                raise NautaPreLoginException("Hay una conexión activa")
+
+        session = AsyncSessionObject(http_client)
+        resp = await http_client.get(nauta_api.PORTAL_URL)
+        if not resp.is_success:
+            raise NautaPreLoginException("Failed to create session")
+
+        data = NautaProtocol._parse_landing_form(resp.text)
+
+        # Now go to the login page
+        resp = await http_client.post(nauta_api.PORTAL_URL, data=data)
+        session.login_action, data = NautaProtocol._parse_login_form(resp.text)
+
+        session.csrfhw = data["CSRFHW"]
+        session.wlanuserip = data["wlanuserip"]
+
+        return session
+
+    @classmethod
+    async def login(cls, session, username, password):
+        r = await session.requests_session.post(
+            session.login_action,
+            data={
+                "CSRFHW": session.csrfhw,
+                "wlanuserip": session.wlanuserip,
+                "username": username,
+                "password": password,
+            },
+        )
+
+        if not r.is_success:
+            raise NautaLoginException(
+                "Falló el inicio de sesión: {} - {}".format(
+                    r.status_code, r.reason_phrase
+                )
+            )
+
+        return NautaProtocol._parse_login_result(str(r.url), r.text)
+
+    @classmethod
+    async def logout(cls, session, username):
+        response = await session.requests_session.post(
+            NautaProtocol._logout_url(session, username)
+        )
+
+        try:
+            if not response.is_success:
+                raise NautaLogoutException(
+                    "Fallo al cerrar la sesión: {} - {}".format(
+                        response.status_code, response.reason_phrase
+                    )
+                )
+
+            if "SUCCESS" not in response.text.upper():
+                raise NautaLogoutException(
+                    "Fallo al cerrar la sesión: {}".format(response.text[:100])
+                )
+        finally:
+            # Cierra la entrada en la BD aunque hayan errores
+            await _run_blocking(save_logout, username)
+
+    @classmethod
+    async def get_user_time(cls, session, username):
+        r = await session.requests_session.post(
+            nauta_api.PORTAL_URL + "/EtecsaQueryServlet",
+            data={
+                "op": "getLeftTime",
+                "ATTRIBUTE_UUID": session.attribute_uuid,
+                "CSRFHW": session.csrfhw,
+                "wlanuserip": session.wlanuserip,
+                "username": username,
+            },
+        )
+
+        return r.text
+
+    @classmethod
+    async def get_user_credit(cls, session, username, password):
+        r = await session.requests_session.post(
+            nauta_api.PORTAL_URL + "/EtecsaQueryServlet",
+            data={
+                "CSRFHW": session.csrfhw,
+                "wlanuserip": session.wlanuserip,
+                "username": username,
+                "password": password,
+            },
+        )
+
+        if not r.is_success:
+            raise NautaException(
+                "Fallo al obtener la información del usuario: {} - {}".format(
+                    r.status_code, r.reason_phrase
+                )
+            )
+
+        if nauta_api.LOGIN_DOMAIN.decode() not in str(r.url):
+            raise NautaException(
+                "No se puede obtener el crédito del usuario mientras está online"
+            )
+
+        return NautaProtocol._parse_user_credit(r.text)
+
+
+class AsyncNautaClient(object):
+    """
+    Cliente asyncio equivalente a :class:`NautaClient`
+
+    Cada instancia mantiene un único ``httpx.AsyncClient`` (pool de
+    conexiones keep-alive) que se libera con :meth:`aclose` o al salir
+    del bloque ``async with``.
+
+    Args:
+        user: Usuario Nauta.
+        password: Contraseña del usuario.
+        timeout: Timeout en segundos de cada petición al portal.
+        retry_policy: :class:`RetryPolicy` del logout.
+        login_retry_policy: :class:`RetryPolicy` de la creación de la sesión
+            del portal (por defecto sin reintentos).
+        **client_kwargs: Argumentos adicionales para ``httpx.AsyncClient``.
+    """
+
+    def __init__(
+            self,
+            user,
+            password,
+            timeout=DEFAULT_TIMEOUT,
+            retry_policy=None,
+            login_retry_policy=NO_RETRY,
+            **client_kwargs
+    ):
+        self.user = user
+        self.password = password
+        self.session = None
+        self.retry_policy = retry_policy or RetryPolicy(probe=portal_reachable)
+        self.login_retry_policy = login_retry_policy
+
+        self.http_client = httpx.AsyncClient(
+            cookies=SessionObject._create_cookie_jar(),
+            follow_redirects=True,
+            timeout=timeout,
+            **client_kwargs
+        )
+
+    async def init_session(self):
+        self.session = await self.login_retry_policy.acall(
+            lambda: AsyncNautaProtocol.create_session(self.http_client),
+            retry_on=(httpx.TransportError,),
+        )
+        await _run_blocking(self.session.save)
+
+    @property
+    def is_logged_in(self):
+        return SessionObject.is_logged_in()
+
+    async def is_connected(self):
+        return await AsyncNautaProtocol.is_connected()
+
+    async def login(self):
+        if not self.session:
+            await self.init_session()
+
+        self.session.attribute_uuid = await AsyncNautaProtocol.login(
+            self.session, self.user, self.password
+        )
+
+        await _run_blocking(self.session.save, self.user)
+        await _run_blocking(NautaProtocol.connectivity.remember, True)
+
+        return self
+
+    async def get_user_credit(self):
+        dispose_session = False
+        try:
+            if not self.session:
+                dispose_session = True
+                await self.init_session()
+
+            return await AsyncNautaProtocol.get_user_credit(
+                session=self.session, username=self.user, password=self.password
+            )
+        finally:
+            if self.session and dispose_session:
+                await _run_blocking(self.session.dispose)
+                self.session = None
+
+    async def get_remaining_time(self):
+        dispose_session = False
+        try:
+            if not self.session:
+                dispose_session = True
+                self.session = AsyncSessionObject(self.http_client)
+
+            return await AsyncNautaProtocol.get_user_time(
+                session=self.session,
+                username=self.user,
+            )
+        finally:
+            if self.session and dispose_session:
+                await _run_blocking(self.session.dispose)
+                self.session = None
+
+    async def _logout_once(self):
+        # Voy a chequear si tengo openvpn ejecutando antes del logout
+        if await _run_blocking(
+                NautaProtocol.check_if_process_running, "openvpn"
+        ):
+            print("Está ejecutando openvpn, voy a cerrarlo")
+            await _run_blocking(
+                subprocess.run, ("sudo", "kill_openvpn.sh")
+            )
+
+        await AsyncNautaProtocol.logout(
+            session=self.session,
+            username=self.user
+        )
+
+    async def logout(self):
+        try:
+            try:
+                await self.retry_policy.acall(
+                    self._logout_once,
+                    retry_on=(httpx.TransportError,),
+                    on_retry=lambda ex, attempt: print(
+                        "Error al intentar cerrar la sesión:", ex,
+                        "\nVolviendo a intentar..."
+                    ),
+                )
+            except httpx.TransportError:
+                raise NautaLogoutException(
+                    "Hay problemas en la red y no se puede cerrar la sesión.\n"
+                    "Es posible que ya esté desconectado. Intente con '{} down' "
+                    "dentro de unos minutos".format(prog_name)
+                )
+
+            await _run_blocking(self.session.dispose)
+            self.session = None
+            await _run_blocking(NautaProtocol.connectivity.remember, False)
+        finally:
+            # Cierra la entrada en la BD sin importar si hubo excepciones o no
+            await _run_blocking(save_logout, self.user)
+
+    def load_last_session(self):
+        self.session = AsyncSessionObject.load(self.http_client)
+
+    async def aclose(self):
+        await self.http_client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if SessionObject.is_logged_in() and self.session:
+                await self.logout()
+        finally:
+            await self.aclose()
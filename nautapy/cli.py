@@ -1,24 +1,45 @@
 import argparse
 import os
-import subprocess
 import sys
 import time
-from collections import defaultdict
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from requests import RequestException
-
-from nautapy import utils
+from nautapy import daemon_client, tracing, utils
 from nautapy.__about__ import __cli__ as prog_name, __version__ as version
 from nautapy.exceptions import NautaException
-from nautapy.nauta_api import NautaClient, NautaProtocol
+from nautapy import nauta_api
+from nautapy.nauta_api import NautaClient, NautaProtocol, client_options
+from nautapy.remaining_time import RemainingTimeCache
+from nautapy.scheduler import SessionScheduler
 from nautapy.sqlite_utils import _get_default_user, save_login, add_user, set_default_user, set_password, \
-    remove_user, list_users, _find_credentials, list_connections, list_connections_current_month, \
-    list_connections_last_month
+    remove_user, list_users, _find_credentials, _all_credentials, _most_time_user, save_balances, \
+    connections_column_widths, iter_connections_between, \
+    current_month_range, last_month_range, monthly_usage, rebuild_monthly_usage, iter_connections_export
+
+
+def _pick_most_time_user():
+    """Usuario con más tiempo restante según el índice de saldos, sin consultar al portal"""
+    best = _most_time_user()
+    if not best:
+        print("No se conoce el saldo de ninguna cuenta, se usará la predeterminada")
+        return None
+
+    user, seconds, updated_ts = best
+    print(
+        "Usuario con más tiempo restante: {} ({} a las {})".format(
+            user,
+            utils.seconds2strtime(seconds),
+            datetime.fromtimestamp(updated_ts).strftime("%d/%m %I:%M %p"),
+        )
+    )
+    return user
 
 
 def _get_credentials(args):
-    user = args.user or _get_default_user()
+    user = args.user
+    if not user and getattr(args, "most_time", False):
+        user = _pick_most_time_user()
+    user = user or _get_default_user()
     password = args.password or None
 
     if not user:
@@ -31,9 +52,134 @@ def _get_credentials(args):
     return _find_credentials(user=user, default_password=password)
 
 
+def _connect_daemon(args):
+    """Cliente del daemon si está en ejecución y no se pidió el modo directo"""
+    if getattr(args, "no_daemon", False):
+        return None
+    return daemon_client.connect()
+
+
+def _client_options(args):
+    """--retry-deadline, --login-retry-deadline y --time-resync, para client_options()"""
+    return dict(
+        retry_deadline=args.retry_deadline,
+        login_retry_deadline=args.login_retry_deadline,
+        time_resync=args.time_resync,
+    )
+
+
+def _create_client(args, user, password, prewarmed=False, query_time_at_logout=False):
+    daemon = _connect_daemon(args)
+    if daemon:
+        # El daemon crea su NautaClient con las mismas opciones
+        return daemon_client.RemoteNautaClient(
+            daemon,
+            user,
+            password,
+            prewarmed=prewarmed,
+            query_time_at_logout=query_time_at_logout,
+            options=_client_options(args),
+        )
+
+    login_context = None
+    if prewarmed:
+        from nautapy.login_context import LoginContextCache
+
+        login_context = LoginContextCache()
+    return NautaClient(
+        user=user,
+        password=password,
+        login_context=login_context,
+        query_time_at_logout=query_time_at_logout,
+        **client_options(**_client_options(args))
+    )
+
+
+def _remember_balance(user, remaining_time):
+    """Guarda en el índice de saldos el tiempo restante informado por el portal"""
+    try:
+        save_balances([(user, utils.strtime2seconds(remaining_time))])
+    except (NautaException, TypeError):
+        pass
+
+
+def _remaining_countdown(remaining_time):
+    """
+    Cuenta atrás local a partir del tiempo restante informado por el portal
+
+    Returns:
+        Función que devuelve los segundos restantes, o None si
+        ``remaining_time`` no es un tiempo válido (p. ej. un mensaje de error).
+    """
+    try:
+        seconds = utils.strtime2seconds(remaining_time)
+    except (NautaException, TypeError):
+        return None
+
+    started_at = time.time()
+    return lambda: max(0, int(seconds - (time.time() - started_at)))
+
+
+def _print_session_status(login_time, deadline, remaining=None):
+    print(
+        "\rTiempo de conexión: {}".format(
+            utils.seconds2strtime(int(time.time()) - login_time)
+        ),
+        end="",
+    )
+    if remaining is not None:
+        print(" Tiempo restante: {}".format(utils.seconds2strtime(remaining())), end="")
+    if deadline is not None:
+        print(
+            " La sesión se cerrará en {}".format(
+                utils.seconds2strtime(max(0, int(deadline - time.time())))
+            ),
+            end="",
+        )
+
+
+def _wait_session_end(session_file, login_time, deadline=None, refresh=1, remaining=None):
+    """
+    Espera a que termine la sesión abierta por ``up``
+
+    No se consulta nada periódicamente: el proceso duerme hasta que se borra
+    ``session_file`` (p. ej. con '{} down' desde otro terminal), se cumple
+    ``deadline`` o, si ``refresh`` no es 0, toca actualizar el tiempo mostrado.
+    El tiempo restante se muestra con la cuenta atrás local ``remaining``,
+    sin consultar al portal.
+
+    Returns:
+        str: "logout" si la sesión se cerró desde otro proceso, "deadline"
+        si se cumplió el tiempo.
+    """
+    from nautapy.file_watch import watch_removal
+
+    if not refresh and deadline is not None:
+        print("La sesión se cerrará a las {}".format(
+            datetime.fromtimestamp(deadline).strftime("%I:%M:%S %p")
+        ))
+
+    with watch_removal(session_file) as watcher:
+        while True:
+            now = time.time()
+            if deadline is not None and now >= deadline:
+                return "deadline"
+
+            wake_at = [] if deadline is None else [deadline]
+            if refresh:
+                _print_session_status(login_time, deadline, remaining)
+                wake_at.append(now + refresh)
+
+            timeout = max(0, min(wake_at) - time.time()) if wake_at else None
+            if watcher.wait_removed(timeout):
+                return "logout"
+
+
 def up(args):
     user, password = _get_credentials(args)
-    client = NautaClient(user=user, password=password)
+    client = _create_client(
+        args, user, password, prewarmed=args.prewarmed, query_time_at_logout=True
+    )
 
     print(
         "Conectando usuario: {}".format(
@@ -44,11 +190,9 @@ def up(args):
     if args.batch:
         client.login()
         print("[Sesión iniciada: {}]".format(datetime.now().strftime("%I:%M:%S %p")))
-        print(
-            "Tiempo restante: {}".format(
-                utils.val_or_error(lambda: client.remaining_time)
-            )
-        )
+        remaining_time = utils.val_or_error(lambda: client.remaining_time)
+        print("Tiempo restante: {}".format(remaining_time))
+        _remember_balance(client.user, remaining_time)
     else:
         with client.login():
             login_time = int(time.time())
@@ -57,16 +201,14 @@ def up(args):
             print(
                 "[Sesión iniciada: {}]".format(datetime.now().strftime("%I:%M:%S %p"))
             )
-            print(
-                "Tiempo restante: {}".format(
-                    utils.val_or_error(lambda: client.remaining_time)
-                )
-            )
+            remaining_time = utils.val_or_error(lambda: client.remaining_time)
+            print("Tiempo restante: {}".format(remaining_time))
             print(
                 "Presione Ctrl+C para desconectarse, o ejecute '{} down' desde otro terminal".format(
                     prog_name
                 )
             )
+            deadline = None
             if args.session_time:
                 if args.session_time.lower().endswith("h"):
                     args.session_time = int(args.session_time[:-1]) * 3600
@@ -74,64 +216,57 @@ def up(args):
                     args.session_time = int(args.session_time[:-1]) * 60
                 else:
                     args.session_time = int(args.session_time)
+                # Con unidad de tarificación se aprovecha la unidad ya cobrada
+                deadline = SessionScheduler(
+                    args.time_unit, started_at=login_time
+                ).session_deadline(args.session_time)
             try:
-                while True:
-                    if not client.is_logged_in:
-                        break
-
-                    elapsed = int(time.time()) - login_time
-
-                    print(
-                        "\rTiempo de conexión: {}".format(
-                            utils.seconds2strtime(elapsed)
-                        ),
-                        end="",
-                    )
-
-                    if args.session_time:
-                        if args.session_time < elapsed:
-                            break
-
-                        print(
-                            " La sesión se cerrará en {}".format(
-                                utils.seconds2strtime(args.session_time - elapsed)
-                            ),
-                            end="",
-                        )
-
-                    time.sleep(1)
+                _wait_session_end(
+                    nauta_api.NAUTA_SESSION_FILE,
+                    login_time,
+                    deadline=deadline,
+                    refresh=args.refresh,
+                    remaining=_remaining_countdown(remaining_time),
+                )
             except KeyboardInterrupt:
                 pass
             finally:
                 print("\n\nCerrando sesión ...")
                 # Voy a chequear si tengo openvpn ejecutando antes del logout
                 if NautaProtocol.check_if_process_running("openvpn"):
+                    import subprocess
+
                     print("Está ejecutando openvpn, voy a cerrarlo")
                     subprocess.run(("sudo", "kill_openvpn.sh"))
-                print(
-                    "Tiempo restante: {}".format(
-                        utils.val_or_error(lambda: client.remaining_time)
-                    )
-                )
 
+        # La cifra que dio el portal justo después del logout, que ya quedó
+        # guardada en el índice de saldos
+        remaining_time = getattr(client, "last_remaining_time", None)
+        if remaining_time is not None:
+            print("Tiempo restante: {}".format(remaining_time))
         print(
             "Sesión cerrada con éxito: {}".format(
                 datetime.now().strftime("%I:%M:%S %p")
             )
         )
+        if client.login_context:
+            # Deja listo el contexto para el próximo 'up --prewarmed'
+            utils.val_or_error(client.login_context.refresh)
         # print("Crédito: {}".format(
         #    utils.val_or_error(lambda: client.user_credit)
         # ))
 
 
 def down(args):
-    client = NautaClient(user=None, password=None)
+    client = _create_client(args, user=None, password=None)
 
     if client.is_logged_in:
         client.load_last_session()
         client.user = client.session.__dict__.get("username")
-        client.logout()
+        client.logout(query_remaining_time=True)
         print("Sesión cerrada con éxito")
+        if client.last_remaining_time is not None:
+            print("Tiempo restante: {}".format(client.last_remaining_time))
     else:
         print("No hay ninguna sesión activa")
 
@@ -143,32 +278,135 @@ def is_logged_in(args):
 
 
 def is_online(args):
-    print("Online: {}".format("Sí" if NautaProtocol.is_connected() else "No"))
+    daemon = _connect_daemon(args)
+    connected = daemon.request("is_connected") if daemon else NautaProtocol.is_connected()
+    print("Online: {}".format("Sí" if connected else "No"))
 
 
 def info(args):
     user, password = _get_credentials(args)
-    client = NautaClient(user, password)
+    client = _create_client(args, user, password)
 
     if client.is_logged_in:
         client.load_last_session()
 
     print("Usuario Nauta: {}".format(user))
-    print(
-        "Tiempo restante: {}".format(utils.val_or_error(lambda: client.remaining_time))
-    )
+    remaining_time = utils.val_or_error(lambda: client.remaining_time)
+    print("Tiempo restante: {}".format(remaining_time))
+    _remember_balance(user, remaining_time)
     # print("Crédito: {}".format(
     #    utils.val_or_error(lambda: client.user_credit)
     # ))
 
 
+def prewarm(args):
+    from nautapy.login_context import LoginContextCache, prewarm_loop
+
+    cache = LoginContextCache(max_age=args.max_age)
+    if args.interval:
+        print("Renovando el contexto de inicio de sesión cada {} segundos".format(args.interval))
+        try:
+            prewarm_loop(cache, args.interval)
+        except KeyboardInterrupt:
+            pass
+    else:
+        cache.refresh()
+        print("Contexto de inicio de sesión precargado")
+
+
+def daemon(args):
+    from nautapy.daemon import serve
+
+    print("Daemon de {} escuchando en {}".format(prog_name, daemon_client.DAEMON_SOCKET))
+    serve()
+
+
+def proxy(args):
+    from nautapy import proxy as nauta_proxy
+
+    user, password = _get_credentials(args)
+
+    nauta_proxy.configure_logging(args.log)
+    print("Proxy de {} en el puerto {} (usuario: {})".format(prog_name, args.port, user))
+    nauta_proxy.run(
+        NautaClient(
+            user,
+            password,
+            **client_options(args.retry_deadline, args.login_retry_deadline)
+        ),
+        port=args.port,
+        time_unit=args.time_unit,
+        max_conn=args.max_conn,
+        relay_mode=args.relay,
+    )
+
+
 def run_connected(args):
     user, password = _get_credentials(args)
-    client = NautaClient(user, password)
+    client = _create_client(args, user, password, query_time_at_logout=True)
 
     with client.login():
+        scheduler = SessionScheduler(args.time_unit).start()
         os.system(" ".join(args.cmd))
 
+        if args.linger:
+            # La unidad en curso ya está cobrada: se puede seguir usando
+            delay = scheduler.idle_deadline() - time.time()
+            print(
+                "Manteniendo la sesión durante {} (Ctrl+C para cerrarla ya)".format(
+                    utils.seconds2strtime(int(delay))
+                )
+            )
+            try:
+                time.sleep(delay)
+            except KeyboardInterrupt:
+                pass
+
+
+def users_status(args):
+    from nautapy.account_status import sweep
+
+    credentials = _all_credentials()
+    if not credentials:
+        print("No existe ningún usuario")
+        return
+
+    results, elapsed = sweep(credentials, workers=args.workers, timeout=args.timeout)
+    # Las respuestas actualizan el índice de saldos de 'up --most-time'
+    balances = [
+        (result.user, utils.strtime2seconds(result.remaining_time))
+        for result in results if result.ok
+    ]
+    save_balances(balances)
+
+    if args.time_resync:
+        # y sirven de punto de partida a la estimación local
+        cache = RemainingTimeCache(resync_interval=args.time_resync)
+        try:
+            state = nauta_api.SessionObject._read_state()
+        except (OSError, ValueError):
+            state = {}
+        for user, seconds in balances:
+            session_id = state.get("attribute_uuid") if state.get("username") == user else None
+            cache.update(user, seconds, session_id)
+
+    headers = ["Usuario", "Tiempo restante", "Crédito", "Latencia (s)"]
+    rows = [
+        [
+            result.user,
+            result.remaining_time,
+            "-" if result.credit is None else result.credit,
+            "{:.2f}".format(result.latency),
+        ]
+        for result in results
+    ]
+    print(utils.format_table(headers, rows))
+    print(
+        "Tiempo total: {:.2f} s (suma de las consultas: {:.2f} s)".format(
+            elapsed, sum(result.latency for result in results)
+        )
+    )
+
 
 def create_user_subparsers(subparsers):
     users_parser = subparsers.add_parser("users")
@@ -203,149 +441,125 @@ def create_user_subparsers(subparsers):
     user_list_parser = user_subparsers.add_parser("list")
     user_list_parser.set_defaults(func=list_users)
 
+    # Status of every user
+    user_status_parser = user_subparsers.add_parser(
+        "status", help="Tiempo restante (y crédito si no hay conexión) de todos los usuarios"
+    )
+    user_status_parser.set_defaults(func=users_status)
+    user_status_parser.add_argument(
+        "-w", "--workers", type=int, default=8,
+        help="Consultas simultáneas como máximo (por defecto: 8)",
+    )
+    user_status_parser.add_argument(
+        "-t", "--timeout", type=float, default=10,
+        help="Timeout en segundos de cada petición al portal (por defecto: 10)",
+    )
+
 
 def list_connections_cli(args):
     if args.last_month:
-        # Obtener las conexiones desde sqlite_utils, las del mes pasado
-        connections = list_connections_last_month(args)
+        # Las conexiones del mes pasado
+        start, end = last_month_range()
     elif args.all_conn:
-        # Obtener las conexiones desde sqlite_utils, todas las conexiones
-        connections = list_connections(args)
+        # Todas las conexiones
+        start, end = None, None
     else:
-        # Obtener las conexiones desde sqlite_utils, por defecto las del mes actual
-        connections = list_connections_current_month(args)
+        # Por defecto las del mes actual
+        start, end = current_month_range()
 
-    # Asegurarse de que connections no sea None
-    if connections is None or len(connections) == 0:
+    # Los anchos de las columnas se calculan en la BD, así la tabla se
+    # escribe a medida que se leen las conexiones, sin cargarlas en memoria
+    widths = connections_column_widths(start, end)
+    if not widths:
         print("No se encontraron conexiones.")
         return
 
     # Encabezados de la tabla
     headers = ["Usuario", "Fecha inicio sesión", "Fecha cierre sesión"]
 
-    # Convertir las conexiones a listas para construir la tabla,
-    # y eliminar los milisegundos de las fechas
-    rows = [
-        [
-            connection[0],  # Usuario
-            connection[1].split(".")[0] if connection[1] else "N/A",  # Fecha inicio sin milisegundos
-            connection[2].split(".")[0] if connection[2] else "N/A"  # Fecha cierre sin milisegundos
-        ]
-        for connection in connections
-    ]
-
     # Calcular los anchos de cada columna
-    col_widths = [
-        max(len(str(row[i])) for row in rows + [headers])  # ancho máximo de cada columna
-        for i in range(len(headers))
-    ]
-
-    # Función para formatear una fila
-    def format_row(row):
-        return "| " + " | ".join(str(row[i]).ljust(col_widths[i]) for i in range(len(row))) + " |"
+    col_widths = [max(width, len(header)) for width, header in zip(widths, headers)]
+    separator = utils.table_separator(col_widths)
 
-    # Separador
-    separator = "+" + "+".join("-" * (width + 2) for width in col_widths) + "+"
-    # Crear la tabla
-    table = [format_row(headers), separator]
+    out = sys.stdout
+    out.write(utils.table_row(headers, col_widths) + "\n" + separator + "\n")
+    out.flush()
 
-    # Agregar las filas con los datos
-    for row in rows:
-        table.append(format_row(row))
-        table.append(separator)
+    # Las fechas ya vienen sin milisegundos
+    for row in iter_connections_between(start, end):
+        out.write(utils.table_row(row, col_widths) + "\n" + separator + "\n")
+    out.flush()
 
-    # Mostrar la tabla
-    print("\n".join(table))
     # Si se pide el resumen, se muestra al final de la tabla
     if args.resume_conn:
         resume_connections(args)
 
 
-def resume_connections(args):
-    # Obtener las conexiones desde sqlite_utils
-    connections = list_connections(args)
-
-    # Asegurarse de que connections no sea None
-    if connections is None or len(connections) == 0:
-        print("No se encontraron conexiones.")
-        return
-
-    # Diccionario para acumular las horas por usuario y mes
-    user_hours_per_month = defaultdict(lambda: defaultdict(float))
-    # Diccionario para guardar la fecha de referencia de cada mes
-    month_date_reference = {}
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError("Fecha inválida, use AAAA-MM-DD: {}".format(value))
 
-    # Procesar cada conexión
-    for connection in connections:
-        user = connection[0]
-        fecha_inicio = connection[1]
-        fecha_cierre = connection[2]
 
-        # Ignorar si no hay fecha de cierre o si está vacío
-        if not fecha_cierre or fecha_cierre.strip() == '':
-            continue
+def export(args):
+    from nautapy.export import BINARY_FORMATS, EXPORT_FORMATS
 
-        try:
-            # Convertir las fechas a objetos datetime
-            inicio_dt = datetime.strptime(fecha_inicio.split(".")[0], "%Y-%m-%d %H:%M:%S")
-            cierre_dt = datetime.strptime(fecha_cierre.split(".")[0], "%Y-%m-%d %H:%M:%S")
+    start = int(args.since.timestamp()) if args.since else None
+    # --until incluye el día indicado
+    end = int((args.until + timedelta(days=1)).timestamp()) if args.until else None
+    binary = args.format in BINARY_FORMATS
 
-            # Calcular la duración de la conexión en horas
-            duration = (cierre_dt - inicio_dt).total_seconds() / 3600.0
+    if args.output == "-":
+        fp = sys.stdout.buffer if binary else sys.stdout
+    else:
+        fp = open(args.output, "wb" if binary else "w", newline=None if binary else "")
 
-            # Obtener el nombre del mes y año de la fecha de inicio
-            mes_anio = inicio_dt.strftime("%B %Y")
-            
-            # Guardar la fecha de referencia para ordenar (primer día del mes)
-            if mes_anio not in month_date_reference:
-                month_date_reference[mes_anio] = inicio_dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    started = time.perf_counter()
+    try:
+        rows = iter_connections_export(start, end, args.user)
+        count = EXPORT_FORMATS[args.format](rows, fp)
+        fp.flush()
+    finally:
+        if fp not in (sys.stdout, sys.stdout.buffer):
+            fp.close()
+
+    elapsed = time.perf_counter() - started
+    print(
+        "{} conexiones exportadas en {:.2f} s ({:.0f} filas/s)".format(
+            count, elapsed, count / elapsed if elapsed else 0
+        ),
+        file=sys.stderr,
+    )
 
-            # Acumular la duración en horas para el usuario y mes correspondiente
-            user_hours_per_month[user][mes_anio] += duration
 
-        except ValueError as e:
-            print(f"Error al procesar las fechas para la conexión de {user}: {e}")
-            continue
+def resume_connections(args):
+    # Obtener el resumen mensual ya calculado desde sqlite_utils
+    usage = monthly_usage(args)
 
     # Mostrar el resumen de horas por usuario y mes
-    if not user_hours_per_month:
-        print("No se encontraron conexiones válidas.")
+    if not usage:
+        print("No se encontraron conexiones.")
     else:
         # Cabecera de la tabla
         headers = ["Usuario", "Mes", "Cantidad de horas"]
 
         rows = []
-        for user, hours_per_month in user_hours_per_month.items():
-            # Ordenar los meses cronológicamente, por order inverso, usando la fecha de referencia
-            for mes_anio, horas in sorted(hours_per_month.items(), key=lambda x: month_date_reference[x[0]],
-                                          reverse=True):
-                horas_int = int(horas)
-                minutos = int((horas - horas_int) * 60)
-                if horas_int == 0:
-                    horas_str = f"{minutos} minutos"
-                elif minutos == 0:
-                    horas_str = f"{horas_int} horas"
-                else:
-                    horas_str = f"{horas_int} hora{'s' if horas_int > 1 else ''} {minutos} minuto{'s' if minutos > 1 else ''}"
-                rows.append([user, mes_anio.capitalize(), horas_str])
-
-        col_widths = [
-            max(len(str(row[i])) for row in rows + [headers])
-            for i in range(len(headers))
-        ]
-
-        def format_row(row):
-            return "| " + " | ".join(str(row[i]).ljust(col_widths[i]) for i in range(len(row))) + " |"
-
-        table = [format_row(headers)]
-        separator = "+" + "+".join("-" * (width + 2) for width in col_widths) + "+"
-        table.append(separator)
-
-        for row in rows:
-            table.append(format_row(row))
-            table.append(separator)
-
-        print("\n".join(table))
+        # Los meses vienen ordenados del más reciente al más antiguo
+        for user, month, total_seconds, _ in usage:
+            mes_anio = datetime.strptime(month, "%Y-%m").strftime("%B %Y")
+            horas = total_seconds / 3600.0
+            horas_int = int(horas)
+            minutos = int((horas - horas_int) * 60)
+            if horas_int == 0:
+                horas_str = f"{minutos} minutos"
+            elif minutos == 0:
+                horas_str = f"{horas_int} horas"
+            else:
+                horas_str = f"{horas_int} hora{'s' if horas_int > 1 else ''} {minutos} minuto{'s' if minutos > 1 else ''}"
+            rows.append([user, mes_anio.capitalize(), horas_str])
+
+        print(utils.format_table(headers, rows, row_separators=True))
 
 
 def main():
@@ -354,6 +568,56 @@ def main():
         "--version", action="version", version="{} v{}".format(prog_name, version)
     )
     parser.add_argument("-d", "--debug", action="store_true", help="show debug info")
+    parser.add_argument(
+        "--probe-ttl",
+        type=int,
+        default=0,
+        help="Segundos durante los que se reutiliza la última comprobación de "
+             "conexión entre comandos (por defecto: 0, se comprueba siempre)",
+    )
+    parser.add_argument(
+        "--retry-deadline",
+        type=float,
+        default=60,
+        help="Segundos máximos reintentando el cierre de sesión si falla la red; las "
+             "esperas entre intentos son cortas y crecen, y se reintenta en cuanto el "
+             "portal vuelve a responder (por defecto: 60)",
+    )
+    parser.add_argument(
+        "--login-retry-deadline",
+        type=float,
+        default=0,
+        help="Segundos máximos reintentando el acceso a la página de entrada del "
+             "portal si falla la red, 0 para no reintentar (por defecto: 0)",
+    )
+    parser.add_argument(
+        "--time-resync",
+        type=int,
+        default=300,
+        metavar="SEGUNDOS",
+        help="Segundos durante los que el tiempo restante se calcula localmente a "
+             "partir de la última consulta al portal, 0 para consultarlo siempre "
+             "(por defecto: 300)",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FICHERO",
+        default=None,
+        help='Añade a FICHERO la duración de cada fase en JSON Lines, "-" para stderr',
+    )
+    parser.add_argument(
+        "--trace-prom",
+        metavar="FICHERO",
+        default=None,
+        help="Acumula la duración de cada fase en FICHERO, en el formato del "
+             "textfile collector de Prometheus",
+    )
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        default=False,
+        help="No usar el daemon aunque esté en ejecución",
+    )
     # listar las conexiones de todos los usuarios, solo las del mes actual
     parser.add_argument(
         "-lc",
@@ -386,6 +650,14 @@ def main():
         help="Hace un resumen mensual de todas las conexiones, por usuario",
     )
 
+    # Recalcula el resumen mensual desde el historial de conexiones
+    parser.add_argument(
+        "--rebuild-resume",
+        action="store_true",
+        default=False,
+        help="Recalcula el resumen mensual de --resume-conn a partir de todas las conexiones",
+    )
+
     subparsers = parser.add_subparsers()
 
     # Create user subparsers in another function
@@ -402,6 +674,22 @@ def main():
         type=str,
         help="Tiempo de desconexión en segundos por defecto, se pueden usar modificadores 'h' y 'm' para horas y minutos, por ejemplo: '1h' o '10m'",
     )
+    up_parser.add_argument(
+        "--time-unit",
+        type=int,
+        default=None,
+        help="Unidad mínima de tarificación en segundos, por ejemplo 120 para Nauta Hogar. "
+             "Con --session-time, la sesión se cierra justo antes del final de la unidad "
+             "en la que se cumple el tiempo",
+    )
+    up_parser.add_argument(
+        "-r",
+        "--refresh",
+        type=float,
+        default=1,
+        help="Segundos entre actualizaciones del tiempo de conexión mostrado, "
+             "0 para no mostrarlo y no despertar al proceso (por defecto: 1)",
+    )
     up_parser.add_argument(
         "-b",
         "--batch",
@@ -409,6 +697,14 @@ def main():
         default=False,
         help="Ejecutar en modo no interactivo",
     )
+    up_parser.add_argument(
+        "-m",
+        "--most-time",
+        action="store_true",
+        default=False,
+        help="Si no se indica el usuario, usar la cuenta con más tiempo restante según "
+             "la última consulta guardada (sin consultar al portal)",
+    )
     up_parser.add_argument("user", nargs="?", help="Usuario Nauta")
     up_parser.add_argument("password", nargs="?", help="Password del usuario Nauta")
     up_parser.add_argument(
@@ -419,6 +715,36 @@ def main():
         help="No salvar en la BD el log de esta conexión",
     )
 
+    up_parser.add_argument(
+        "-w",
+        "--prewarmed",
+        action="store_true",
+        default=False,
+        help="Usar el contexto de inicio de sesión precargado con '{} prewarm' "
+             "y renovarlo al cerrar la sesión".format(prog_name),
+    )
+
+    # Prewarm parser
+    prewarm_parser = subparsers.add_parser("prewarm")
+    prewarm_parser.set_defaults(func=prewarm)
+    prewarm_parser.add_argument(
+        "-i",
+        "--interval",
+        type=int,
+        default=0,
+        help="Mantener el contexto renovado comprobándolo cada INTERVAL segundos",
+    )
+    prewarm_parser.add_argument(
+        "--max-age",
+        type=int,
+        default=600,
+        help="Segundos durante los que un contexto precargado es válido (por defecto: 600)",
+    )
+
+    # Daemon parser
+    daemon_parser = subparsers.add_parser("daemon")
+    daemon_parser.set_defaults(func=daemon)
+
     # Logout parser
     down_parser = subparsers.add_parser("down")
     down_parser.set_defaults(func=down)
@@ -437,6 +763,59 @@ def main():
     info_parser.add_argument("user", nargs="?", help="Usuario Nauta")
     info_parser.add_argument("password", nargs="?", help="Password del usuario Nauta")
 
+    # Proxy parser
+    proxy_parser = subparsers.add_parser("proxy")
+    proxy_parser.set_defaults(func=proxy, password=None)
+    proxy_parser.add_argument(
+        "-p", "--port", type=int, default=3128, help="Puerto del proxy (por defecto: 3128)"
+    )
+    proxy_parser.add_argument(
+        "-t",
+        "--time-unit",
+        type=int,
+        required=True,
+        help="Unidad mínima de tarificación en segundos, por ejemplo 120 para Nauta Hogar",
+    )
+    proxy_parser.add_argument(
+        "-u", "--user", required=False, help="Usuario Nauta (por defecto el predeterminado)"
+    )
+    proxy_parser.add_argument(
+        "-m", "--max-conn", type=int, default=None, help="Máximo de conexiones simultáneas"
+    )
+    proxy_parser.add_argument(
+        "--relay",
+        choices=("auto", "splice", "buffered"),
+        default="auto",
+        help="Reenvío de los túneles CONNECT: 'splice' sin copias en el kernel (Linux), "
+             "'buffered' en Python, 'auto' el mejor disponible (por defecto: auto)",
+    )
+    proxy_parser.add_argument(
+        "-l", "--log", default="-", help='Fichero de logs, "-" para stdout (por defecto: "-")'
+    )
+
+    # Export parser
+    export_parser = subparsers.add_parser("export")
+    export_parser.set_defaults(func=export)
+    export_parser.add_argument(
+        "-f",
+        "--format",
+        choices=("csv", "jsonl", "columnar"),
+        default="csv",
+        help="Formato de salida; 'columnar' es binario y se recarga rápido (por defecto: csv)",
+    )
+    export_parser.add_argument(
+        "-o", "--output", default="-", help='Fichero de salida, "-" para stdout (por defecto: "-")'
+    )
+    export_parser.add_argument(
+        "--since", type=_parse_date, default=None,
+        help="Solo conexiones iniciadas desde esta fecha (AAAA-MM-DD)",
+    )
+    export_parser.add_argument(
+        "--until", type=_parse_date, default=None,
+        help="Solo conexiones iniciadas hasta esta fecha, incluida (AAAA-MM-DD)",
+    )
+    export_parser.add_argument("-u", "--user", default=None, help="Solo las conexiones de este usuario")
+
     # Run connected parser
     run_connected_parser = subparsers.add_parser("run-connected")
     run_connected_parser.set_defaults(func=run_connected)
@@ -446,12 +825,36 @@ def main():
     run_connected_parser.add_argument(
         "-p", "--password", required=False, help="Password del usuario Nauta"
     )
+    run_connected_parser.add_argument(
+        "-m",
+        "--most-time",
+        action="store_true",
+        default=False,
+        help="Si no se indica el usuario, usar la cuenta con más tiempo restante según "
+             "la última consulta guardada (sin consultar al portal)",
+    )
+    run_connected_parser.add_argument(
+        "-t",
+        "--time-unit",
+        type=int,
+        default=None,
+        help="Unidad mínima de tarificación en segundos, por ejemplo 120 para Nauta Hogar",
+    )
+    run_connected_parser.add_argument(
+        "--linger",
+        action="store_true",
+        default=False,
+        help="Al terminar el comando, mantener la sesión hasta justo antes del final "
+             "de la unidad ya cobrada (requiere --time-unit)",
+    )
     run_connected_parser.add_argument(
         "cmd", nargs=argparse.REMAINDER, help="The command line to run"
     )
 
     args = parser.parse_args()
 
+    NautaProtocol.connectivity.cache_ttl = args.probe_ttl
+
     # Chequeo que usen --last-month con --list-connections
     if args.last_month and not args.list_conn:
         parser.error("--last-month requiere --list-conn")
@@ -460,6 +863,27 @@ def main():
     if args.all_conn and not args.list_conn:
         parser.error("--all-conn requiere --list-conn")
 
+    if args.retry_deadline < 0 or args.login_retry_deadline < 0:
+        parser.error("Los plazos de reintento no pueden ser negativos")
+
+    if getattr(args, "workers", 1) < 1:
+        parser.error("--workers debe ser al menos 1")
+
+    if args.time_resync < 0:
+        parser.error("--time-resync no puede ser negativo")
+
+    if getattr(args, "refresh", 0) < 0:
+        parser.error("--refresh no puede ser negativo")
+
+    if getattr(args, "linger", False) and not args.time_unit:
+        parser.error("--linger requiere --time-unit")
+
+    if args.rebuild_resume:
+        rebuild_monthly_usage(args)
+        print("Resumen mensual recalculado")
+        if not args.list_conn and not args.resume_conn:
+            sys.exit(0)
+
     # Muestra las conexiones de los usuarios en la BD
     if args.list_conn:
         list_connections_cli(args)
@@ -474,9 +898,21 @@ def main():
         parser.print_help()
         sys.exit(1)
 
+    tracer = tracing.enable() if args.trace or args.trace_prom else None
+
     try:
         args.func(args)
     except NautaException as ex:
         print(ex.args[0], file=sys.stderr)
-    except RequestException as ex:
+    except Exception as ex:
+        # requests solo se carga en los subcomandos que acceden a la red, y
+        # solo entonces puede haber lanzado la excepción
+        requests = sys.modules.get("requests")
+        if requests is None or not isinstance(ex, requests.RequestException):
+            raise
         print("Hubo un problema en la red, por favor revise su conexión:", ex, file=sys.stderr)
+    finally:
+        if args.trace:
+            tracer.write_jsonl(args.trace)
+        if args.trace_prom:
+            tracer.write_prometheus(args.trace_prom)
@@ -0,0 +1,200 @@
+"""
+Daemon residente de nautapy
+
+Mantiene en memoria el estado de la sesión y un único ``requests.Session``
+con conexiones keep-alive hacia el portal, de modo que ``up``, ``down``,
+``info`` e ``is-online`` no tengan que repetir el handshake TCP+TLS, releer
+las cookies del disco ni importar de nuevo requests/psutil en cada
+invocación. Los subcomandos hablan con él a través de un socket UNIX (ver
+:mod:`nautapy.daemon_client`).
+"""
+
+import os
+import signal
+import socket
+import socketserver
+import threading
+
+from requests import RequestException
+
+from nautapy.__about__ import __version__ as version
+from nautapy.daemon_client import DAEMON_SOCKET, decode_message, encode_message
+from nautapy.exceptions import NautaException
+from nautapy.login_context import LoginContextCache
+from nautapy.nauta_api import NautaClient, NautaProtocol, SessionObject, client_options
+from nautapy.utils import ensure_parent_dir
+
+
+class NautaDaemon(object):
+    """
+    Estado del daemon y operaciones que expone
+
+    Cada operación ``op`` de una petición se resuelve con el método
+    ``op_<op>``. Las operaciones se ejecutan de una en una. Las que usan un
+    :class:`NautaClient` reciben además las opciones de la CLI que lo
+    configuran (ver :func:`nautapy.nauta_api.client_options`).
+    """
+
+    def __init__(self):
+        self.requests_session = SessionObject._create_requests_session()
+        self.client = None
+        self.lock = threading.Lock()
+
+    def handle(self, request):
+        handler = getattr(self, "op_{}".format(request.pop("op", "")), None)
+        if not handler:
+            raise NautaException("Operación desconocida")
+
+        with self.lock:
+            return handler(**request)
+
+    def _new_client(self, user, password, login_context=None, requests_session=None, **options):
+        return NautaClient(
+            user,
+            password,
+            login_context=login_context,
+            requests_session=requests_session or self.requests_session,
+            **client_options(**options)
+        )
+
+    def _session_client(self, user=None, password=None, **options):
+        """Cliente con la sesión abierta, cargándola del disco si hace falta"""
+        if not self.client:
+            self.client = self._new_client(user, password, **options)
+            self.client.load_last_session()
+        elif options:
+            # Cada petición trae las opciones de su línea de comandos
+            for name, value in client_options(**options).items():
+                setattr(self.client, name, value)
+        return self.client
+
+    def op_ping(self):
+        return version
+
+    def op_is_connected(self):
+        return NautaProtocol.is_connected()
+
+    def op_is_logged_in(self):
+        return SessionObject.is_logged_in()
+
+    def op_session(self):
+        if not SessionObject.is_logged_in():
+            return {}
+
+        client = self._session_client()
+        state = {
+            key: value for key, value in client.session.__dict__.items()
+            if key != "requests_session"
+        }
+        state.setdefault("username", client.user)
+        return state
+
+    def op_login(self, user, password, prewarmed=False, **options):
+        client = self._new_client(
+            user, password, login_context=LoginContextCache() if prewarmed else None, **options
+        )
+        client.login()
+        self.client = client
+
+    def op_logout(self, user=None, query_remaining_time=False, **options):
+        client = self._session_client(user, **options)
+        client.user = user or client.user or client.session.__dict__.get("username")
+        login_context = client.login_context
+        try:
+            client.logout(query_remaining_time=query_remaining_time)
+        finally:
+            self.client = None
+
+        if login_context:
+            # Deja listo el contexto para el próximo 'up --prewarmed'
+            try:
+                login_context.refresh()
+            except (NautaException, RequestException):
+                pass
+
+        return client.last_remaining_time
+
+    def op_remaining_time(self, user, password=None, **options):
+        if SessionObject.is_logged_in():
+            # Igual que 'info': se consulta con la sesión abierta
+            client = self._new_client(user, password, **options)
+            client.session = self._session_client().session
+            return client.remaining_time
+
+        # Sin sesión abierta se consulta con su propio requests.Session: no
+        # se tocan las cookies compartidas
+        self.client = None
+        requests_session = SessionObject._create_requests_session()
+        try:
+            return self._new_client(
+                user, password, requests_session=requests_session, **options
+            ).remaining_time
+        finally:
+            requests_session.close()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+
+        try:
+            response = {"ok": True, "result": self.server.daemon.handle(decode_message(line))}
+        except NautaException as ex:
+            response = {"ok": False, "kind": type(ex).__name__, "error": ex.args[0]}
+        except RequestException as ex:
+            response = {"ok": False, "kind": "network", "error": str(ex)}
+        except Exception as ex:
+            response = {"ok": False, "kind": "error", "error": repr(ex)}
+
+        self.wfile.write(encode_message(response))
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, daemon, path=DAEMON_SOCKET):
+        self.daemon = daemon
+        ensure_parent_dir(path)
+        _remove_stale_socket(path)
+        super().__init__(path, _RequestHandler)
+        # Por el socket pasan credenciales: solo accesible por el usuario
+        os.chmod(path, 0o600)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.remove(self.server_address)
+        except OSError:
+            pass
+
+
+def _remove_stale_socket(path):
+    if not os.path.exists(path):
+        return
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            os.remove(path)
+            return
+
+    raise NautaException("Ya hay un daemon en ejecución: {}".format(path))
+
+
+def serve(path=DAEMON_SOCKET):
+    """Atiende peticiones hasta recibir SIGINT o SIGTERM"""
+    server = DaemonServer(NautaDaemon(), path)
+
+    def stop(signum, frame):
+        # shutdown() espera al bucle, así que se llama desde otro hilo
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
@@ -0,0 +1,163 @@
+"""
+Cliente ligero del daemon de nautapy
+
+Los subcomandos de la CLI usan :func:`connect` para hablar con un
+``nauta daemon`` en ejecución a través de su socket UNIX. Si no hay
+daemon, devuelve None y la CLI trabaja en modo directo. Este módulo solo
+depende de la biblioteca estándar, para no cargar requests ni psutil en
+los procesos cliente.
+
+Protocolo: una petición JSON por conexión (``{"op": ..., parámetros}``)
+terminada en salto de línea, y una respuesta ``{"ok": true, "result": ...}``
+o ``{"ok": false, "kind": ..., "error": ...}``.
+"""
+
+import json
+import os
+import socket
+import types
+
+from nautapy import appdata_path
+from nautapy import exceptions
+
+DAEMON_SOCKET = os.path.join(appdata_path, "nauta.sock")
+
+# El logout con reintentos puede tardar bastante
+DAEMON_TIMEOUT = 300
+
+
+def encode_message(message):
+    return json.dumps(message).encode("utf-8") + b"\n"
+
+
+def decode_message(line):
+    return json.loads(line.decode("utf-8"))
+
+
+def _exception_from_response(response):
+    exc_class = getattr(exceptions, response.get("kind") or "", None)
+    if isinstance(exc_class, type) and issubclass(exc_class, exceptions.NautaException):
+        return exc_class(response["error"])
+
+    if response.get("kind") == "network":
+        return exceptions.NautaException(
+            "Hubo un problema en la red, por favor revise su conexión: {}".format(
+                response["error"]
+            )
+        )
+
+    return exceptions.NautaException("Error en el daemon: {}".format(response["error"]))
+
+
+class DaemonClient(object):
+    def __init__(self, path=DAEMON_SOCKET, timeout=DAEMON_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+
+    def request(self, op, **params):
+        """
+        Envía una operación al daemon y devuelve su resultado
+
+        Raises:
+            OSError: Si no se puede hablar con el daemon.
+            NautaException: Si la operación falló en el daemon.
+        """
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            sock.sendall(encode_message(dict(params, op=op)))
+            with sock.makefile("rb") as fp:
+                line = fp.readline()
+
+        if not line:
+            raise ConnectionResetError("El daemon cerró la conexión")
+
+        response = decode_message(line)
+        if not response["ok"]:
+            raise _exception_from_response(response)
+        return response.get("result")
+
+
+def connect(path=DAEMON_SOCKET):
+    """
+    Returns:
+        DaemonClient: Cliente del daemon si está en ejecución, si no None.
+    """
+    if not os.path.exists(path):
+        return None
+
+    client = DaemonClient(path, timeout=2)
+    try:
+        client.request("ping")
+    except (OSError, ValueError):
+        return None
+
+    client.timeout = DAEMON_TIMEOUT
+    return client
+
+
+class RemoteNautaClient(object):
+    """
+    Equivalente a :class:`NautaClient` que delega cada operación en el daemon
+
+    Ofrece la parte de la interfaz de NautaClient que usa la CLI.
+    """
+
+    # El daemon renueva el contexto precargado por su cuenta
+    login_context = None
+
+    def __init__(
+            self,
+            daemon,
+            user,
+            password,
+            prewarmed=False,
+            query_time_at_logout=False,
+            options=None,
+    ):
+        self.daemon = daemon
+        self.user = user
+        self.password = password
+        self.prewarmed = prewarmed
+        self.query_time_at_logout = query_time_at_logout
+        # Opciones de NautaClient (ver nauta_api.client_options) que se
+        # envían en cada petición
+        self.options = options or {}
+        self.session = None
+        self.last_remaining_time = None
+
+    @property
+    def is_logged_in(self):
+        return self.daemon.request("is_logged_in")
+
+    def login(self):
+        self.daemon.request(
+            "login",
+            user=self.user,
+            password=self.password,
+            prewarmed=self.prewarmed,
+            **self.options
+        )
+        return self
+
+    @property
+    def remaining_time(self):
+        return self.daemon.request(
+            "remaining_time", user=self.user, password=self.password, **self.options
+        )
+
+    def logout(self, query_remaining_time=False):
+        self.last_remaining_time = self.daemon.request(
+            "logout", user=self.user, query_remaining_time=query_remaining_time, **self.options
+        )
+        self.session = None
+
+    def load_last_session(self):
+        self.session = types.SimpleNamespace(**self.daemon.request("session"))
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.is_logged_in:
+            self.logout(query_remaining_time=self.query_time_at_logout)
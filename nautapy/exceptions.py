@@ -14,5 +14,9 @@ class NautaLoginException(NautaException):
     pass
 
 
+class NautaSessionExpiredException(NautaLoginException):
+    pass
+
+
 class NautaLogoutException(NautaException):
     pass
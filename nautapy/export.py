@@ -0,0 +1,154 @@
+"""
+Exportación del historial de conexiones
+
+Las conexiones se escriben a medida que se leen del cursor, así que la
+memoria no crece con el tamaño del historial. Formatos:
+
+- ``csv``: con cabecera, columnas de ``EXPORT_COLUMNS``.
+- ``jsonl``: un objeto JSON por línea con las mismas claves.
+- ``columnar``: formato binario por columnas para recargarlo rápido con
+  :func:`read_columnar`. El fichero empieza con ``COLUMNAR_MAGIC`` y sigue
+  una secuencia de bloques de hasta ``block_size`` filas::
+
+      <I filas>  (0 marca el final)
+      <I bytes>  lista JSON con los usuarios distintos del bloque
+      filas x <I índice del usuario en la lista
+      filas x <q inicio_ts
+      filas x <q cierre_ts
+
+  ``NULL_TS`` representa un valor nulo (p. ej. una conexión abierta).
+
+  Todo en little-endian.
+"""
+
+import csv
+import json
+import struct
+import sys
+from array import array
+from datetime import datetime
+from itertools import islice
+
+from nautapy.sqlite_utils import EXPORT_COLUMNS
+
+COLUMNAR_MAGIC = b"NAUTACOL1\n"
+
+COLUMNAR_BLOCK_SIZE = 64 * 1024
+
+NULL_TS = -2 ** 63
+
+_count = struct.Struct("<I")
+
+
+def export_csv(rows, fp):
+    writer = csv.writer(fp)
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def export_jsonl(rows, fp):
+    count = 0
+    for row in rows:
+        fp.write(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n")
+        count += 1
+    return count
+
+
+def _little_endian(values):
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def export_columnar(rows, fp, block_size=COLUMNAR_BLOCK_SIZE):
+    """``fp`` debe estar abierto en modo binario"""
+    fp.write(COLUMNAR_MAGIC)
+    rows = iter(rows)
+    count = 0
+    while True:
+        block = list(islice(rows, block_size))
+        if not block:
+            break
+
+        users = {}
+        indexes = array("I", (users.setdefault(row[0], len(users)) for row in block))
+        starts = array("q", (NULL_TS if row[3] is None else row[3] for row in block))
+        ends = array("q", (NULL_TS if row[4] is None else row[4] for row in block))
+
+        names = json.dumps(list(users)).encode("utf-8")
+        fp.write(_count.pack(len(block)))
+        fp.write(_count.pack(len(names)))
+        fp.write(names)
+        for column in (indexes, starts, ends):
+            fp.write(_little_endian(column))
+        count += len(block)
+
+    fp.write(_count.pack(0))
+    return count
+
+
+def _read_exactly(fp, size):
+    data = fp.read(size)
+    if len(data) != size:
+        raise ValueError("Fichero columnar truncado")
+    return data
+
+
+def _read_column(fp, typecode, rows):
+    values = array(typecode)
+    values.frombytes(_read_exactly(fp, rows * values.itemsize))
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _format_ts(ts):
+    return None if ts is None else str(datetime.fromtimestamp(ts))
+
+
+def read_columnar(fp):
+    """
+    Lee un fichero del formato ``columnar``, bloque a bloque
+
+    Yields:
+        tuple: Filas con las columnas de ``EXPORT_COLUMNS``.
+    """
+    if _read_exactly(fp, len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError("No es un fichero columnar de nautapy")
+
+    while True:
+        rows = _count.unpack(_read_exactly(fp, _count.size))[0]
+        if not rows:
+            return
+
+        names_size = _count.unpack(_read_exactly(fp, _count.size))[0]
+        users = json.loads(_read_exactly(fp, names_size).decode("utf-8"))
+        indexes = _read_column(fp, "I", rows)
+        starts = _read_column(fp, "q", rows)
+        ends = _read_column(fp, "q", rows)
+
+        for index, start, end in zip(indexes, starts, ends):
+            start = None if start == NULL_TS else start
+            end = None if end == NULL_TS else end
+            yield (
+                users[index],
+                _format_ts(start),
+                _format_ts(end),
+                start,
+                end,
+                None if start is None or end is None else end - start,
+            )
+
+
+EXPORT_FORMATS = {
+    "csv": export_csv,
+    "jsonl": export_jsonl,
+    "columnar": export_columnar,
+}
+
+# Formatos que se escriben en binario
+BINARY_FORMATS = {"columnar"}
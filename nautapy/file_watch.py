@@ -0,0 +1,142 @@
+"""
+Espera a que se borre un fichero sin consultarlo cada segundo
+
+``nauta up`` termina cuando desaparece el fichero de sesión (por ejemplo
+porque se ejecutó ``nauta down`` en otro terminal). En Linux se usa inotify
+(a través de ctypes, sin dependencias nuevas) sobre el directorio del
+fichero: el proceso duerme hasta que hay un cambio en él o se acaba el
+tiempo de espera. En otros sistemas, o si inotify no está disponible, se
+comprueba el fichero periódicamente.
+
+Example:
+    with watch_removal(NAUTA_SESSION_FILE) as watcher:
+        if watcher.wait_removed(timeout=60):
+            print("Sesión cerrada desde otro proceso")
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import time
+
+# Constantes de <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+
+_WATCH_MASK = IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+
+POLL_INTERVAL = 1
+
+
+class PollingWatcher(object):
+    """Comprueba cada ``interval`` segundos si el fichero sigue existiendo"""
+
+    def __init__(self, path, interval=POLL_INTERVAL):
+        self.path = path
+        self.interval = interval
+
+    def wait_removed(self, timeout=None):
+        """
+        Espera a que ``path`` no exista
+
+        Args:
+            timeout: Segundos máximos de espera, None para no limitarla.
+
+        Returns:
+            bool: True si el fichero ya no existe, False si se acabó el tiempo.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while os.path.exists(self.path):
+            remaining = self.interval if deadline is None else deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.interval, remaining))
+        return True
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class InotifyWatcher(PollingWatcher):
+    """
+    Espera con inotify a cambios en el directorio de ``path``
+
+    Raises:
+        OSError: Si inotify no está disponible.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._fd = None
+
+        libc = _libc()
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self._fd = fd
+
+        directory = os.path.dirname(os.path.abspath(path))
+        if libc.inotify_add_watch(fd, os.fsencode(directory), _WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            self.close()
+            raise OSError(errno, "inotify_add_watch", directory)
+
+    def wait_removed(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # Se comprueba después de crear el watch, así no se pierde un
+        # borrado ocurrido antes
+        while os.path.exists(self.path):
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+
+            readable, _, _ = select.select([self._fd], [], [], remaining)
+            if readable:
+                self._drain()
+        return True
+
+    def _drain(self):
+        try:
+            while os.read(self._fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+_libc_cache = []
+
+
+def _libc():
+    if not _libc_cache:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify no está disponible")
+        _libc_cache.append(libc)
+    return _libc_cache[0]
+
+
+def watch_removal(path, interval=POLL_INTERVAL):
+    """
+    Vigilante del borrado de ``path``: con inotify si se puede y si no
+    comprobando cada ``interval`` segundos
+    """
+    try:
+        return InotifyWatcher(path)
+    except (OSError, AttributeError):
+        return PollingWatcher(path, interval)
@@ -0,0 +1,209 @@
+"""
+Extractores HTML para las páginas del portal cautivo
+
+El protocolo solo necesita unos pocos valores de cada página (los ``<input>``
+de un formulario, el último ``<script>`` o una celda de ``#sessioninfo``),
+así que en lugar de construir el árbol completo con BeautifulSoup se
+recorre el documento con :class:`html.parser.HTMLParser` y se detiene el
+análisis en cuanto se obtiene el dato buscado.
+
+Los resultados son los mismos que los de los selectores de bs4 que
+reemplazan (``html.parser`` como backend), incluyendo el tratamiento de
+las etiquetas vacías y del cierre de etiquetas no balanceadas.
+"""
+
+from html.parser import HTMLParser
+
+# Etiquetas que bs4 considera vacías: se cierran en el mismo momento en que se abren
+_VOID_TAGS = frozenset((
+    "area", "base", "basefont", "bgsound", "br", "col", "command", "embed",
+    "frame", "hr", "image", "img", "input", "isindex", "keygen", "link",
+    "menuitem", "meta", "nextid", "param", "source", "spacer", "track", "wbr",
+))
+
+
+class _StopParsing(Exception):
+    pass
+
+
+def _attrs_dict(attrs):
+    # Igual que bs4: los atributos sin valor quedan como cadena vacía
+    # y ante atributos repetidos gana el último
+    return {name: "" if value is None else value for name, value in attrs}
+
+
+class _ExtractorParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+
+    def extract(self, html):
+        try:
+            self.feed(html)
+            self.close()
+        except _StopParsing:
+            pass
+        return self
+
+
+class _FormParser(_ExtractorParser):
+    """Recolecta los ``input[name]`` de todo el documento o de ``form#form_id``"""
+
+    def __init__(self, form_id=None):
+        super().__init__()
+        self.form_id = form_id
+        self.found = form_id is None
+        self.action = None
+        self.inputs = {}
+        self._form_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self.form_id is not None:
+            if tag == "form":
+                if self._form_depth:
+                    self._form_depth += 1
+                else:
+                    attrs = _attrs_dict(attrs)
+                    if attrs.get("id") == self.form_id:
+                        self.found = True
+                        self.action = attrs.get("action")
+                        self._form_depth = 1
+                return
+
+            if not self._form_depth:
+                return
+
+        if tag == "input":
+            attrs = _attrs_dict(attrs)
+            if "name" in attrs:
+                self.inputs[attrs["name"]] = attrs.get("value")
+
+    def handle_endtag(self, tag):
+        if tag == "form" and self._form_depth:
+            self._form_depth -= 1
+            if not self._form_depth:
+                raise _StopParsing()
+
+
+class _LastScriptParser(_ExtractorParser):
+    def __init__(self):
+        super().__init__()
+        self.script = None
+        self._chunks = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "script":
+            self._chunks = []
+
+    def handle_data(self, data):
+        if self._chunks is not None:
+            self._chunks.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "script" and self._chunks is not None:
+            self.script = "".join(self._chunks)
+            self._chunks = None
+
+    def close(self):
+        super().close()
+        # Un <script> sin cerrar al final del documento también cuenta
+        if self._chunks is not None:
+            self.handle_endtag("script")
+
+
+class _ChildPathParser(_ExtractorParser):
+    """
+    Texto del primer elemento que cumple ``#root_id > tag:nth-child(n) > ...``
+
+    Mantiene solo la pila de etiquetas abiertas con el número de hijos de
+    cada una, suficiente para resolver ``nth-child`` sin construir el árbol.
+    """
+
+    def __init__(self, root_id, path):
+        super().__init__()
+        self.root_id = root_id
+        self.path = path
+        self.text = None
+        # Cada entrada: [tag, hijos vistos, nivel alcanzado en path o None]
+        self._stack = [[None, 0, None]]
+        self._chunks = None
+        self._capture_depth = None
+
+    def handle_starttag(self, tag, attrs):
+        parent = self._stack[-1]
+        parent[1] += 1
+
+        level = None
+        if parent[2] is not None and parent[2] < len(self.path):
+            path_tag, path_index = self.path[parent[2]]
+            if tag == path_tag and parent[1] == path_index:
+                level = parent[2] + 1
+        if level is None and _attrs_dict(attrs).get("id") == self.root_id:
+            level = 0
+
+        self._stack.append([tag, 0, level])
+        if level == len(self.path) and self._chunks is None:
+            self._chunks = []
+            self._capture_depth = len(self._stack)
+
+        if tag in _VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_data(self, data):
+        if self._chunks is not None:
+            self._chunks.append(data)
+
+    def handle_endtag(self, tag):
+        # Como bs4: se cierra la etiqueta abierta más reciente con ese nombre,
+        # y los cierres sin apertura se ignoran
+        for depth in range(len(self._stack) - 1, 0, -1):
+            if self._stack[depth][0] == tag:
+                break
+        else:
+            return
+
+        del self._stack[depth:]
+        if self._chunks is not None and len(self._stack) < self._capture_depth:
+            self.text = "".join(self._chunks)
+            raise _StopParsing()
+
+
+def extract_inputs(html):
+    """
+    Campos ``input[name]`` de todo el documento
+
+    Returns:
+        dict: ``{name: value}``, con ``value`` None si el input no lo tiene.
+    """
+    return _FormParser().extract(html).inputs
+
+
+def extract_form(html, form_id):
+    """
+    Acción y campos ``input[name]`` del formulario con el id indicado
+
+    Returns:
+        tuple: ``(action, inputs)``, o None si el formulario no existe.
+    """
+    parser = _FormParser(form_id).extract(html)
+    if not parser.found:
+        return None
+    return parser.action, parser.inputs
+
+
+def extract_last_script(html):
+    """Contenido del último ``<script>`` del documento, o None si no hay ninguno"""
+    return _LastScriptParser().extract(html).script
+
+
+def extract_child_path_text(html, root_id, path):
+    """
+    Texto del primer elemento que cumple un selector de hijos directos
+
+    Ejemplo: ``#sessioninfo > tbody:nth-child(1) > tr:nth-child(2)`` se
+    expresa como ``extract_child_path_text(html, "sessioninfo",
+    [("tbody", 1), ("tr", 2)])``.
+
+    Returns:
+        str: El texto (sin recortar) del elemento, o None si no existe.
+    """
+    return _ChildPathParser(root_id, path).extract(html).text
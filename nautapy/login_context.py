@@ -0,0 +1,136 @@
+"""
+Contexto de inicio de sesión precargado
+
+Antes de poder enviar las credenciales hay que pedir la página de entrada
+del portal, enviar su formulario y leer ``form#formulario`` para obtener
+``login_action``, ``CSRFHW``, ``wlanuserip`` y las cookies de la sesión del
+portal. :class:`LoginContextCache` hace ese trabajo por adelantado y lo
+guarda en disco, de modo que ``nauta up --prewarmed`` solo necesita el POST
+de las credenciales. Si el contexto caducó, :class:`NautaClient` vuelve de
+forma transparente al flujo completo.
+"""
+
+import json
+import os
+import time
+
+from requests import RequestException
+
+from nautapy import appdata_path
+from nautapy.exceptions import NautaPreLoginException
+from nautapy.nauta_api import NautaProtocol, SessionObject
+from nautapy.utils import write_json_atomic
+
+LOGIN_CONTEXT_FILE = os.path.join(appdata_path, "nauta-login-context")
+
+# Tiempo (segundos) durante el que se considera válido un contexto precargado
+LOGIN_CONTEXT_MAX_AGE = 600
+
+
+class LoginContextCache(object):
+    """
+    Almacén de un único contexto de inicio de sesión
+
+    Args:
+        path: Fichero donde se guarda el contexto.
+        max_age: Segundos tras los cuales el contexto ya no se usa.
+    """
+
+    def __init__(self, path=LOGIN_CONTEXT_FILE, max_age=LOGIN_CONTEXT_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+    def age(self):
+        """Edad en segundos del contexto guardado, o None si no hay ninguno"""
+        data = self._read()
+        return time.time() - data["fetched_at"] if data else None
+
+    def is_valid(self):
+        age = self.age()
+        return age is not None and 0 <= age < self.max_age
+
+    def store(self, session):
+        write_json_atomic(self.path, {
+            "login_action": session.login_action,
+            "csrfhw": session.csrfhw,
+            "wlanuserip": session.wlanuserip,
+            "cookies": session.export_cookies(),
+            "fetched_at": time.time(),
+        })
+
+    def refresh(self):
+        """
+        Obtiene un contexto nuevo del portal y lo guarda
+
+        Raises:
+            NautaPreLoginException: Si hay conexión o una sesión abierta.
+        """
+        self.store(NautaProtocol.create_session())
+
+    def refresh_if_needed(self, margin=60):
+        """Renueva el contexto si falta o caduca en menos de ``margin`` segundos"""
+        age = self.age()
+        if age is not None and 0 <= age < self.max_age - margin:
+            return False
+
+        self.refresh()
+        return True
+
+    def take(self, requests_session=None):
+        """
+        Extrae el contexto guardado como un :class:`SessionObject`
+
+        El contexto es de un solo uso, así que se elimina del disco.
+
+        Returns:
+            SessionObject: La sesión lista para el login, o None si no hay
+            un contexto válido.
+        """
+        data = self._read()
+        self.discard()
+
+        if not data or not 0 <= time.time() - data["fetched_at"] < self.max_age:
+            return None
+
+        session = SessionObject(
+            login_action=data["login_action"],
+            csrfhw=data["csrfhw"],
+            wlanuserip=data["wlanuserip"],
+            requests_session=requests_session,
+        )
+        session.import_cookies(data["cookies"])
+        return session
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def prewarm_loop(cache, interval, log=print):
+    """
+    Mantiene el contexto renovado mientras no haya una sesión abierta
+
+    Args:
+        cache: :class:`LoginContextCache` a mantener.
+        interval: Segundos entre comprobaciones.
+        log: Función para informar de cada renovación.
+    """
+    while True:
+        if not SessionObject.is_logged_in():
+            try:
+                if cache.refresh_if_needed(margin=interval):
+                    log("Contexto de inicio de sesión renovado")
+            except NautaPreLoginException as ex:
+                log(ex.args[0])
+            except RequestException as ex:
+                log("No se pudo renovar el contexto: {}".format(ex))
+        time.sleep(interval)
@@ -20,88 +20,223 @@ Example:
 
 """
 
-import http.cookiejar as cookielib
 import json
 import os
 import re
-import subprocess
-import time
+from urllib.parse import urlsplit
 
-import bs4
-import psutil
-import requests
-from requests import RequestException
-
-from nautapy import appdata_path
+from nautapy import appdata_path, utils
 from nautapy.__about__ import __name__ as prog_name
+from nautapy import html_parsers, tracing
+from nautapy.probes import ConnectivityDetector, NoContentProbe, PagePrefixProbe, TcpProbe
 from nautapy.exceptions import (
     NautaLoginException,
     NautaLogoutException,
     NautaException,
+    NautaFormatException,
     NautaPreLoginException,
+    NautaSessionExpiredException,
 )
-from nautapy.sqlite_utils import save_logout
+from nautapy.retry import DEFAULT_DEADLINE, NO_RETRY, RetryPolicy
+from nautapy.sqlite_utils import save_balances, save_logout
+
+# Las direcciones se pueden cambiar con variables de entorno o con
+# set_portal(), p. ej. para usar el simulador del portal de test/portal_server.py
+CHECK_PAGE = os.environ.get("NAUTAPY_CHECK_PAGE", "http://www.cubadebate.cu/")
 
-MAX_DISCONNECT_ATTEMPTS = 10
+NO_CONTENT_PAGE = os.environ.get(
+    "NAUTAPY_NO_CONTENT_PAGE", "http://clients3.google.com/generate_204"
+)
 
-CHECK_PAGE = "http://www.cubadebate.cu/"
+PORTAL_URL = os.environ.get("NAUTAPY_PORTAL_URL", "https://secure.etecsa.net:8443")
 
-LOGIN_DOMAIN = b"secure.etecsa.net"
+LOGIN_DOMAIN = urlsplit(PORTAL_URL).hostname.encode()
 # _re_login_fail_reason = re.compile("alert\(\"(?P<reason>[^\"]*?)\"\)")
 
+# Registro de la sesión abierta: un único JSON con los datos del formulario
+# del portal, el usuario y las cookies
 NAUTA_SESSION_FILE = os.path.join(appdata_path, "nauta-session")
 
+CONNECTIVITY_CACHE_FILE = os.path.join(appdata_path, "connectivity-cache")
+
+
+def _session_lock():
+    """Serializa entre procesos las escrituras y el borrado del registro de la sesión"""
+    return utils.file_lock(NAUTA_SESSION_FILE + ".lock")
+
 
 class SessionObject(object):
     def __init__(
-            self, login_action=None, csrfhw=None, wlanuserip=None, attribute_uuid=None
+            self,
+            login_action=None,
+            csrfhw=None,
+            wlanuserip=None,
+            attribute_uuid=None,
+            requests_session=None,
     ):
-        self.requests_session = self.__class__._create_requests_session()
+        # Se puede reutilizar un requests.Session (y su pool de conexiones)
+        # creado con _create_requests_session
+        self.requests_session = (
+                requests_session or self.__class__._create_requests_session()
+        )
 
         self.login_action = login_action
         self.csrfhw = csrfhw
         self.wlanuserip = wlanuserip
         self.attribute_uuid = attribute_uuid
 
+    @classmethod
+    def _create_cookie_jar(cls):
+        # http.cookiejar arrastra urllib.request y ssl: solo se carga al usarse
+        import http.cookiejar as cookielib
+
+        # Las cookies se guardan dentro del registro de la sesión (ver save)
+        return cookielib.CookieJar()
+
     @classmethod
     def _create_requests_session(cls):
+        # requests se importa al usarse: la CLI solo lo carga en los
+        # subcomandos que acceden a la red
+        import requests
+
         requests_session = requests.Session()
-        requests_session.cookies = cookielib.MozillaCookieJar(NAUTA_SESSION_FILE)
+        requests_session.cookies = cls._create_cookie_jar()
         return requests_session
 
+    def _cookie_jar(self):
+        return self.requests_session.cookies
+
+    def export_cookies(self):
+        """Cookies de la sesión como una lista de dicts serializable a JSON"""
+        return [
+            {
+                "name": cookie.name,
+                "value": cookie.value,
+                "domain": cookie.domain,
+                "path": cookie.path,
+                "secure": cookie.secure,
+                "expires": cookie.expires,
+            }
+            for cookie in self._cookie_jar()
+        ]
+
+    def import_cookies(self, cookies):
+        """Restaura las cookies obtenidas con :meth:`export_cookies`"""
+        from requests.cookies import create_cookie
+
+        jar = self._cookie_jar()
+        for cookie in cookies:
+            jar.set_cookie(create_cookie(**cookie))
+
+    @tracing.traced("session.save")
     def save(self, username=None):
-        self.requests_session.cookies.save()
+        """
+        Guarda la sesión y sus cookies en una sola escritura atómica
 
+        Se escribe a un temporal que luego se renombra: un lector, o una
+        caída a mitad de escritura, nunca deja un registro a medias.
+        """
         data = {**self.__dict__}
         data.pop("requests_session")
         data["username"] = username
+        data["cookies"] = self.export_cookies()
 
-        with open(NAUTA_SESSION_FILE, "w") as fp:
-            json.dump(data, fp)
+        with _session_lock():
+            utils.write_text_atomic(NAUTA_SESSION_FILE, json.dumps(data, separators=(",", ":")))
 
     @classmethod
-    def load(cls):
-        inst = object.__new__(cls)
-        inst.requests_session = cls._create_requests_session()
-
+    def _read_state(cls):
+        """Registro de la sesión guardada, incluidas las cookies"""
         with open(NAUTA_SESSION_FILE, "r") as fp:
-            inst.__dict__.update(json.load(fp))
+            return json.load(fp)
 
+    @classmethod
+    def _restore(cls, inst):
+        state = cls._read_state()
+        # Los registros anteriores no incluían las cookies
+        cookies = state.pop("cookies", [])
+        inst.__dict__.update(state)
+        inst.import_cookies(cookies)
         return inst
 
+    @classmethod
+    def load(cls, requests_session=None):
+        inst = object.__new__(cls)
+        inst.requests_session = requests_session or cls._create_requests_session()
+        return cls._restore(inst)
+
     def dispose(self):
-        self.requests_session.cookies.clear()
-        self.requests_session.cookies.save()
-        try:
-            os.remove(NAUTA_SESSION_FILE)
-        except:
-            pass
+        self._cookie_jar().clear()
+        with _session_lock():
+            try:
+                os.remove(NAUTA_SESSION_FILE)
+            except FileNotFoundError:
+                pass
 
     @classmethod
     def is_logged_in(cls):
         return os.path.exists(NAUTA_SESSION_FILE)
 
 
+def _connectivity_probes():
+    return [
+        PagePrefixProbe(CHECK_PAGE, LOGIN_DOMAIN),
+        NoContentProbe(NO_CONTENT_PAGE, LOGIN_DOMAIN),
+    ]
+
+
+def portal_reachable(timeout=1):
+    """Comprobación rápida (solo una conexión TCP) de que el portal responde"""
+    url = urlsplit(PORTAL_URL)
+    port = url.port or (443 if url.scheme == "https" else 80)
+    return bool(TcpProbe(url.hostname, port, reachable_means_online=True).check(timeout))
+
+
+def client_options(retry_deadline=DEFAULT_DEADLINE, login_retry_deadline=0, time_resync=0):
+    """
+    Argumentos de :class:`NautaClient` según las opciones de la CLI
+
+    Los usan la CLI en modo directo y el daemon, que recibe las opciones en
+    cada petición.
+
+    Args:
+        retry_deadline: Plazo de los reintentos del logout.
+        login_retry_deadline: Plazo de los reintentos de la creación de la
+            sesión del portal.
+        time_resync: Intervalo de :class:`RemainingTimeCache`, 0 para
+            consultar siempre el tiempo restante al portal.
+    """
+    time_cache = None
+    if time_resync:
+        from nautapy.remaining_time import RemainingTimeCache
+
+        time_cache = RemainingTimeCache(resync_interval=time_resync)
+
+    return dict(
+        retry_policy=RetryPolicy(deadline=retry_deadline, probe=portal_reachable),
+        login_retry_policy=RetryPolicy(deadline=login_retry_deadline, probe=portal_reachable),
+        time_cache=time_cache,
+    )
+
+
+def set_portal(portal_url, check_page=None, no_content_page=None):
+    """
+    Cambia la dirección del portal y de las páginas de comprobación
+
+    Args:
+        portal_url: URL base del portal, p. ej. ``https://secure.etecsa.net:8443``.
+        check_page: Página que el portal intercepta cuando no hay sesión.
+        no_content_page: Página que responde ``204`` cuando hay conexión.
+    """
+    global PORTAL_URL, LOGIN_DOMAIN, CHECK_PAGE, NO_CONTENT_PAGE
+
+    PORTAL_URL = portal_url
+    LOGIN_DOMAIN = urlsplit(portal_url).hostname.encode()
+    CHECK_PAGE = check_page or CHECK_PAGE
+    NO_CONTENT_PAGE = no_content_page or NO_CONTENT_PAGE
+    NautaProtocol.connectivity.probes = _connectivity_probes()
+
+
 class NautaProtocol(object):
     """Protocol Layer (Interface)
 
@@ -111,96 +246,135 @@ class NautaProtocol(object):
 
     """
 
-    @classmethod
-    def _get_inputs(cls, form_soup):
-        return {
-            _["name"]: _.get("value", default=None)
-            for _ in form_soup.select("input[name]")
-        }
+    # Sondas de conectividad; ``connectivity.cache_ttl`` habilita la caché
+    connectivity = ConnectivityDetector(
+        probes=_connectivity_probes(),
+        timeout=3,
+        cache_file=CONNECTIVITY_CACHE_FILE,
+    )
 
     @classmethod
+    @tracing.traced("protocol.is_connected")
     def is_connected(cls):
-        try:
-            r = requests.get(CHECK_PAGE, timeout=3)
-            return LOGIN_DOMAIN not in r.content
-        except (requests.ConnectionError, requests.Timeout) as exception:
-            return False
-        # return LOGIN_DOMAIN not in r.content
+        return cls.connectivity.is_connected()
 
     @classmethod
-    def create_session(cls):
+    @tracing.traced("protocol.create_session")
+    def create_session(cls, requests_session=None):
         if cls.is_connected():
             if SessionObject.is_logged_in():
                 raise NautaPreLoginException("Hay una sessión abierta")
             else:
                 raise NautaPreLoginException("Hay una conexión activa")
 
-        session = SessionObject()
+        session = SessionObject(requests_session=requests_session)
         # resp = session.requests_session.get(CHECK_PAGE, allow_redirects=True)
-        resp = session.requests_session.get("https://secure.etecsa.net:8443")
+        with tracing.span("portal.landing_get"):
+            resp = session.requests_session.get(PORTAL_URL)
         if not resp.ok:
             raise NautaPreLoginException("Failed to create session")
 
-        soup = bs4.BeautifulSoup(resp.text, "html.parser")
         # action = soup.form["action"]
-        action = "https://secure.etecsa.net:8443"
-        data = cls._get_inputs(soup)
+        action = PORTAL_URL
+        with tracing.span("parse.landing_form"):
+            data = cls._parse_landing_form(resp.text)
 
         # Now go to the login page
-        resp = session.requests_session.post(action, data)
-        soup = bs4.BeautifulSoup(resp.text, "html.parser")
-        form_soup = soup.find("form", id="formulario")
-
-        session.login_action = form_soup["action"]
-        data = cls._get_inputs(form_soup)
+        with tracing.span("portal.landing_post"):
+            resp = session.requests_session.post(action, data)
+        with tracing.span("parse.login_form"):
+            session.login_action, data = cls._parse_login_form(resp.text)
 
         session.csrfhw = data["CSRFHW"]
         session.wlanuserip = data["wlanuserip"]
 
         return session
 
+    @classmethod
+    def _parse_landing_form(cls, html):
+        return html_parsers.extract_inputs(html)
+
+    @classmethod
+    def _parse_login_form(cls, html):
+        """
+        Extrae la acción y los campos del formulario de inicio de sesión
+
+        Returns:
+            tuple: ``(login_action, inputs)`` del ``form#formulario``.
+        """
+        form = html_parsers.extract_form(html, "formulario")
+        if not form:
+            raise NautaPreLoginException(
+                "No se encontró el formulario de inicio de sesión"
+            )
+
+        return form
+
     @classmethod
     def login(cls, session, username, password):
-        r = session.requests_session.post(
-            session.login_action,
-            {
-                "CSRFHW": session.csrfhw,
-                "wlanuserip": session.wlanuserip,
-                "username": username,
-                "password": password,
-            },
-        )
+        with tracing.span("portal.credentials_post"):
+            r = session.requests_session.post(
+                session.login_action,
+                {
+                    "CSRFHW": session.csrfhw,
+                    "wlanuserip": session.wlanuserip,
+                    "username": username,
+                    "password": password,
+                },
+            )
 
         if not r.ok:
             raise NautaLoginException(
                 "Falló el inicio de sesión: {} - {}".format(r.status_code, r.reason)
             )
 
-        if not "online.do" in r.url:
-            soup = bs4.BeautifulSoup(r.text, "html.parser")
-            script_text = soup.find_all("script")[-1].get_text()
+        with tracing.span("parse.login_result"):
+            return cls._parse_login_result(r.url, r.text)
+
+    @classmethod
+    def _parse_login_result(cls, url, html):
+        """
+        Interpreta la respuesta al envío de las credenciales
+
+        Returns:
+            str: El ATTRIBUTE_UUID de la sesión, o None si no aparece.
+
+        Raises:
+            NautaLoginException: Si el portal no redirigió a ``online.do``.
+            NautaSessionExpiredException: Si además no explicó el motivo.
+        """
+        if not "online.do" in url:
+            script_text = html_parsers.extract_last_script(html) or ""
             # match = _re_login_fail_reason.match(script_text)
             match = re.search(r"alert\(\"(?P<reason>[^\"]*?)\"\)", script_text)
-            raise NautaLoginException(
-                "Falló el inicio de sesión: {}".format(
-                    match and match.groupdict().get("reason")
+            if not match:
+                # Sin mensaje de error el portal no reconoció la sesión
+                # (CSRFHW o cookies caducadas)
+                raise NautaSessionExpiredException(
+                    "Falló el inicio de sesión: la sesión del portal no es válida"
                 )
+            raise NautaLoginException(
+                "Falló el inicio de sesión: {}".format(match.group("reason"))
             )
 
-        m = re.search(r"ATTRIBUTE_UUID=(\w+)&CSRFHW=", r.text)
+        m = re.search(r"ATTRIBUTE_UUID=(\w+)&CSRFHW=", html)
 
         return m.group(1) if m else None
 
     @classmethod
-    def logout(cls, session, username):
-        logout_url = (
-                "https://secure.etecsa.net:8443/LogoutServlet?"
+    def _logout_url(cls, session, username):
+        return (
+                PORTAL_URL + "/LogoutServlet?"
                 + "CSRFHW={}&"
                 + "username={}&"
                 + "ATTRIBUTE_UUID={}&"
                 + "wlanuserip={}"
         ).format(session.csrfhw, username, session.attribute_uuid, session.wlanuserip)
-        response = session.requests_session.post(logout_url)
+
+    @classmethod
+    def logout(cls, session, username):
+        with tracing.span("portal.logout_post"):
+            response = session.requests_session.post(cls._logout_url(session, username))
         cls._handle_logout_errors(response, username)
 
     @staticmethod
@@ -232,10 +406,11 @@ class NautaProtocol(object):
             save_logout(username)
 
     @classmethod
+    @tracing.traced("portal.get_user_time")
     def get_user_time(cls, session, username):
 
         r = session.requests_session.post(
-            "https://secure.etecsa.net:8443/EtecsaQueryServlet",
+            PORTAL_URL + "/EtecsaQueryServlet",
             {
                 "op": "getLeftTime",
                 "ATTRIBUTE_UUID": session.attribute_uuid,
@@ -248,10 +423,11 @@ class NautaProtocol(object):
         return r.text
 
     @classmethod
+    @tracing.traced("portal.get_user_credit")
     def get_user_credit(cls, session, username, password):
 
         r = session.requests_session.post(
-            "https://secure.etecsa.net:8443/EtecsaQueryServlet",
+            PORTAL_URL + "/EtecsaQueryServlet",
             {
                 "CSRFHW": session.csrfhw,
                 "wlanuserip": session.wlanuserip,
@@ -267,62 +443,126 @@ class NautaProtocol(object):
                 )
             )
 
-        if "secure.etecsa.net" not in r.url:
+        if LOGIN_DOMAIN.decode() not in r.url:
             raise NautaException(
                 "No se puede obtener el crédito del usuario mientras está online"
             )
 
-        soup = bs4.BeautifulSoup(r.text, "html.parser")
-        credit_tag = soup.select_one(
-            "#sessioninfo > tbody:nth-child(1) > tr:nth-child(2) > td:nth-child(2)"
+        return cls._parse_user_credit(r.text)
+
+    @classmethod
+    def _parse_user_credit(cls, html):
+        # #sessioninfo > tbody:nth-child(1) > tr:nth-child(2) > td:nth-child(2)
+        credit_text = html_parsers.extract_child_path_text(
+            html, "sessioninfo", [("tbody", 1), ("tr", 2), ("td", 2)]
         )
 
-        if not credit_tag:
+        if credit_text is None:
             raise NautaException(
                 "Fallo al obtener el crédito del usuario: no se encontró la información"
             )
 
-        return credit_tag.get_text().strip()
+        return credit_text.strip()
+
+    # Un ProcessTracker por nombre, para no recorrer la tabla de procesos
+    # en cada intento de logout
+    _process_trackers = {}
 
     @classmethod
+    @tracing.traced("process.check_running")
     def check_if_process_running(cls, process_name):
         """
         Chequea si existe algun proceso con el nombre processName.
         """
-        # Iterar la lista de todos los procesos
-        for proc in psutil.process_iter():
-            try:
-                # Chequea si el nombre del proceso contiene la cadena a buscar
-                if process_name.lower() in proc.name().lower():
-                    return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
-        return False
+        from nautapy.process_tracker import ProcessTracker, openvpn_tracker
+
+        tracker = cls._process_trackers.get(process_name)
+        if tracker is None:
+            tracker = openvpn_tracker() if process_name == "openvpn" else ProcessTracker(process_name)
+            cls._process_trackers[process_name] = tracker
+
+        return tracker.is_running()
 
 
 class NautaClient(object):
-    def __init__(self, user, password):
+    def __init__(
+            self,
+            user,
+            password,
+            login_context=None,
+            requests_session=None,
+            retry_policy=None,
+            login_retry_policy=NO_RETRY,
+            time_cache=None,
+            query_time_at_logout=False,
+    ):
         self.user = user
         self.password = password
         self.session = None
+        # LoginContextCache opcional con sesiones del portal precargadas
+        self.login_context = login_context
+        # requests.Session compartido entre sesiones (p. ej. en el daemon)
+        self.requests_session = requests_session
+        # Reintentos del logout y de la creación de la sesión del portal
+        self.retry_policy = retry_policy or RetryPolicy(probe=portal_reachable)
+        self.login_retry_policy = login_retry_policy
+        # RemainingTimeCache opcional: el tiempo restante se estima
+        # localmente y solo se consulta al portal de vez en cuando
+        self.time_cache = time_cache
+        # Si el logout del bloque ``with`` consulta el tiempo restante
+        self.query_time_at_logout = query_time_at_logout
+        # Tiempo restante según el portal al cerrar la última sesión
+        self.last_remaining_time = None
 
     def init_session(self):
-        self.session = NautaProtocol.create_session()
+        self.session = self.login_retry_policy.call(
+            lambda: NautaProtocol.create_session(self.requests_session),
+            on_retry=lambda ex, attempt: print(
+                "Error al contactar con el portal ({}), reintentando...".format(ex)
+            ),
+        )
+        self.session.save()
+
+    def _init_prewarmed_session(self):
+        """Usa un contexto precargado si hay uno válido, devuelve True si lo usó"""
+        session = (
+            self.login_context.take(self.requests_session) if self.login_context else None
+        )
+        if not session:
+            self.init_session()
+            return False
+
+        self.session = session
         self.session.save()
+        return True
 
     @property
     def is_logged_in(self):
         return SessionObject.is_logged_in()
 
+    @tracing.traced("client.login")
     def login(self):
+        prewarmed = False
         if not self.session:
-            self.init_session()
+            prewarmed = self._init_prewarmed_session()
 
-        self.session.attribute_uuid = NautaProtocol.login(
-            self.session, self.user, self.password
-        )
+        try:
+            self.session.attribute_uuid = NautaProtocol.login(
+                self.session, self.user, self.password
+            )
+        except NautaSessionExpiredException:
+            if not prewarmed:
+                raise
+
+            # El contexto precargado caducó: se repite con una sesión nueva
+            self.session.dispose()
+            self.init_session()
+            self.session.attribute_uuid = NautaProtocol.login(
+                self.session, self.user, self.password
+            )
 
         self.session.save(self.user)
+        NautaProtocol.connectivity.remember(True)
 
         return self
 
@@ -342,13 +582,37 @@ class NautaClient(object):
                 self.session.dispose()
                 self.session = None
 
+    def _open_session_id(self):
+        """ATTRIBUTE_UUID de la sesión abierta si es de este usuario, si no None"""
+        try:
+            state = SessionObject._read_state()
+        except (OSError, ValueError):
+            return None
+        return state.get("attribute_uuid") if state.get("username") == self.user else None
+
     @property
     def remaining_time(self):
+        if self.time_cache is None:
+            return self._query_remaining_time()
+
+        session_id = self._open_session_id()
+        seconds = self.time_cache.estimate(self.user, session_id)
+        if seconds is None:
+            text = self._query_remaining_time()
+            try:
+                seconds = utils.strtime2seconds(text)
+            except NautaFormatException:
+                return text
+            self.time_cache.update(self.user, seconds, session_id)
+
+        return utils.seconds2strtime(seconds)
+
+    def _query_remaining_time(self):
         dispose_session = False
         try:
             if not self.session:
                 dispose_session = True
-                self.session = SessionObject()
+                self.session = SessionObject(requests_session=self.requests_session)
 
             return NautaProtocol.get_user_time(
                 session=self.session,
@@ -359,44 +623,98 @@ class NautaClient(object):
                 self.session.dispose()
                 self.session = None
 
-    def logout(self):
+    def _query_time_after_logout(self):
+        """Tiempo restante según el portal una vez cerrada la sesión, o None si falla"""
+        from requests import RequestException
+
+        # Sesión temporal sin dispose(): el fichero de sesión ya no es de
+        # este cliente
+        requests_session = self.requests_session or SessionObject._create_requests_session()
         try:
-            for _ in range(0, MAX_DISCONNECT_ATTEMPTS):
-                try:
-                    # Voy a chequear si tengo openvpn ejecutando antes del logout
-                    if NautaProtocol.check_if_process_running("openvpn"):
-                        print("Está ejecutando openvpn, voy a cerrarlo")
-                        subprocess.run(("sudo", "kill_openvpn.sh"))
-
-                    NautaProtocol.logout(
-                        session=self.session,
-                        username=self.user
-                    )
-                    self.session.dispose()
-                    self.session = None
-
-                    return  # Si el logout es exitoso, se sale del método
-                except RequestException as e:
-                    print("Error al intentar cerrar la sesión:", e)
-                    print("Esperando 10 segundos antes de volver a intentar...")
-                    time.sleep(10)
-            else:
+            return NautaProtocol.get_user_time(
+                SessionObject(requests_session=requests_session), self.user
+            )
+        except (RequestException, NautaException):
+            return None
+        finally:
+            if requests_session is not self.requests_session:
+                requests_session.close()
+
+    def _logout_once(self):
+        # Voy a chequear si tengo openvpn ejecutando antes del logout
+        if NautaProtocol.check_if_process_running("openvpn"):
+            import subprocess
+
+            print("Está ejecutando openvpn, voy a cerrarlo")
+            subprocess.run(("sudo", "kill_openvpn.sh"))
+
+        NautaProtocol.logout(
+            session=self.session,
+            username=self.user
+        )
+
+    @tracing.traced("client.logout")
+    def logout(self, query_remaining_time=False):
+        """
+        Cierra la sesión
+
+        Args:
+            query_remaining_time: Si es True, tras el logout se consulta al
+                portal el tiempo restante y se guarda en
+                ``last_remaining_time`` y en el índice de saldos. La consulta
+                se hace con la sesión ya cerrada, así que no consume tiempo
+                cobrado.
+        """
+        from requests import RequestException
+
+        self.last_remaining_time = None
+        try:
+            try:
+                self.retry_policy.call(
+                    self._logout_once,
+                    on_retry=lambda ex, attempt: print(
+                        "Error al intentar cerrar la sesión:", ex,
+                        "\nVolviendo a intentar..."
+                    ),
+                )
+            except RequestException:
                 raise NautaLogoutException(
                     "Hay problemas en la red y no se puede cerrar la sesión.\n"
                     "Es posible que ya esté desconectado. Intente con '{} down' "
                     "dentro de unos minutos".format(prog_name)
                 )
+
+            self.session.dispose()
+            self.session = None
+            NautaProtocol.connectivity.remember(False)
+
+            if query_remaining_time:
+                # Es la cifra del portal al final de la sesión: la
+                # estimación local no vale aquí
+                self.last_remaining_time = self._query_time_after_logout()
+
+            if self.last_remaining_time is not None:
+                try:
+                    seconds = utils.strtime2seconds(self.last_remaining_time)
+                except NautaFormatException:
+                    pass
+                else:
+                    if self.time_cache is not None:
+                        # Sin sesión abierta el tiempo ya no se descuenta
+                        self.time_cache.update(self.user, seconds, None)
+                    # Índice de saldos de 'up --most-time'
+                    save_balances([(self.user, seconds)])
         finally:
             # Guardo en la BD el usuario y la hora de cierre de sesión
             # Cierra la entrada en la BD sin importar si hubo excepciones o no
             save_logout(self.user)
 
     def load_last_session(self):
-        self.session = SessionObject.load()
+        self.session = SessionObject.load(self.requests_session)
 
     def __enter__(self):
         pass
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if SessionObject.is_logged_in():
-            self.logout()
+            self.logout(query_remaining_time=self.query_time_at_logout)
@@ -0,0 +1,217 @@
+"""
+Detección de conectividad con varias sondas concurrentes
+
+Cada sonda hace una comprobación ligera y responde ``True`` (hay
+internet), ``False`` (estamos detrás del portal cautivo o sin red) o
+``None`` (no concluyente). :class:`ConnectivityDetector` lanza todas las
+sondas en paralelo, devuelve la primera respuesta concluyente y puede
+guardar el veredicto en disco durante unos segundos para que varios
+comandos seguidos no repitan la comprobación.
+"""
+
+import abc
+import json
+import os
+import queue
+import socket
+import threading
+import time
+
+from nautapy.utils import write_json_atomic
+
+
+class Probe(abc.ABC):
+    """Interfaz de una sonda de conectividad"""
+
+    name = "probe"
+
+    @abc.abstractmethod
+    def check(self, timeout):
+        """
+        Returns:
+            bool: True si hay conexión, False si no, None si no es concluyente.
+        """
+
+
+class PagePrefixProbe(Probe):
+    """
+    Pide una página y revisa solo la redirección y los primeros bytes
+
+    El portal cautivo responde con una página pequeña (o una redirección)
+    que apunta a ``login_domain``, así que no hace falta descargar la
+    página completa.
+    """
+
+    name = "page"
+
+    def __init__(self, url, login_domain, max_bytes=4096):
+        self.url = url
+        self.login_domain = login_domain
+        self.max_bytes = max_bytes
+
+    def check(self, timeout):
+        import requests
+
+        try:
+            with requests.get(
+                    self.url, timeout=timeout, allow_redirects=False, stream=True
+            ) as r:
+                location = r.headers.get("Location", "").encode("latin-1", "replace")
+                if self.login_domain in location:
+                    return False
+                if r.is_redirect:
+                    return True
+
+                return self.login_domain not in self._read_prefix(r)
+        except (requests.ConnectionError, requests.Timeout):
+            return None
+
+    def _read_prefix(self, response):
+        prefix = b""
+        for chunk in response.iter_content(chunk_size=self.max_bytes):
+            prefix += chunk
+            if len(prefix) >= self.max_bytes:
+                break
+        return prefix
+
+
+class NoContentProbe(PagePrefixProbe):
+    """
+    Sonda contra un endpoint que responde ``204 No Content`` cuando hay internet
+
+    Cualquier otra respuesta solo es concluyente si menciona el portal.
+    """
+
+    name = "204"
+
+    def check(self, timeout):
+        import requests
+
+        try:
+            with requests.get(
+                    self.url, timeout=timeout, allow_redirects=False, stream=True
+            ) as r:
+                if r.status_code == 204:
+                    return True
+
+                location = r.headers.get("Location", "").encode("latin-1", "replace")
+                if self.login_domain in location or self.login_domain in self._read_prefix(r):
+                    return False
+                return None
+        except (requests.ConnectionError, requests.Timeout):
+            return None
+
+
+class TcpProbe(Probe):
+    """
+    Intenta abrir una conexión TCP a ``host:port``
+
+    Como el portal cautivo intercepta las conexiones, poder conectarse no
+    demuestra que haya internet; en cambio no poder hacerlo indica que no
+    hay red. Con ``reachable_means_online`` el éxito se considera
+    concluyente (útil para destinos que el portal bloquea).
+    """
+
+    name = "tcp"
+
+    def __init__(self, host, port, reachable_means_online=False):
+        self.host = host
+        self.port = port
+        self.reachable_means_online = reachable_means_online
+
+    def check(self, timeout):
+        try:
+            socket.create_connection((self.host, self.port), timeout=timeout).close()
+        except OSError:
+            return False
+        return True if self.reachable_means_online else None
+
+
+class ConnectivityDetector(object):
+    """
+    Ejecuta las sondas en paralelo y cachea el veredicto
+
+    Args:
+        probes: Lista de :class:`Probe`.
+        timeout: Tiempo máximo de espera (segundos) por el veredicto.
+        cache_file: Fichero donde se comparte el veredicto entre procesos.
+        cache_ttl: Segundos durante los que el veredicto guardado es válido.
+            Con 0 (por defecto) no se usa la caché.
+    """
+
+    def __init__(self, probes, timeout=3, cache_file=None, cache_ttl=0):
+        self.probes = probes
+        self.timeout = timeout
+        self.cache_file = cache_file
+        self.cache_ttl = cache_ttl
+
+    def is_connected(self):
+        cached = self.cached_verdict()
+        if cached is not None:
+            return cached
+
+        connected = self.probe()
+        self.remember(connected)
+        return connected
+
+    def probe(self):
+        """Lanza todas las sondas y devuelve la primera respuesta concluyente"""
+        results = queue.Queue()
+
+        def run(probe):
+            try:
+                results.put(probe.check(self.timeout))
+            except Exception:
+                results.put(None)
+
+        # Hilos daemon: las sondas que queden pendientes no retrasan la salida
+        for probe in self.probes:
+            threading.Thread(target=run, args=(probe,), daemon=True).start()
+
+        deadline = time.monotonic() + self.timeout
+        for _ in self.probes:
+            try:
+                verdict = results.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if verdict is not None:
+                return verdict
+
+        # Ninguna sonda concluyó: igual que antes, sin respuesta no hay conexión
+        return False
+
+    def cached_verdict(self):
+        if self.cache_ttl <= 0 or not self.cache_file:
+            return None
+
+        try:
+            with open(self.cache_file, "r") as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+        age = time.time() - data.get("timestamp", 0)
+        if 0 <= age < self.cache_ttl:
+            return data.get("connected")
+        return None
+
+    def remember(self, connected):
+        """Guarda un veredicto conocido, p. ej. justo después del login o logout"""
+        if self.cache_ttl <= 0 or not self.cache_file:
+            return
+
+        try:
+            write_json_atomic(
+                self.cache_file, {"connected": connected, "timestamp": time.time()}
+            )
+        except OSError:
+            pass
+
+    def invalidate(self):
+        if not self.cache_file:
+            return
+
+        try:
+            os.remove(self.cache_file)
+        except OSError:
+            pass
@@ -0,0 +1,159 @@
+"""
+Localización barata de un proceso por su nombre (p. ej. openvpn)
+
+Recorrer toda la tabla de procesos con ``psutil.process_iter()`` y pedir el
+nombre de cada uno cuesta cientos de milisegundos en un equipo con muchos
+procesos, y el cierre de sesión lo hace en cada intento. :class:`ProcessTracker`
+lo evita así:
+
+1. Si ya encontró el proceso, solo comprueba que ese PID sigue vivo y es el
+   mismo proceso (misma hora de creación, para no confundirlo con un PID
+   reutilizado).
+2. Si no, lee los ficheros de PID conocidos.
+3. Solo si nada de lo anterior funciona recorre la tabla de procesos, una
+   vez y leyendo únicamente el nombre (de ``/proc`` directamente en Linux).
+   Si no lo encuentra, el resultado se reutiliza durante ``negative_ttl``
+   segundos.
+"""
+
+import glob
+import os
+import time
+
+import psutil
+
+from nautapy import tracing
+
+PROC_DIR = "/proc"
+
+# Ficheros de PID habituales de openvpn; NAUTAPY_OPENVPN_PIDFILE añade otro
+OPENVPN_PIDFILES = (
+    "/run/openvpn.pid",
+    "/run/openvpn/*.pid",
+    "/run/openvpn-client/*.pid",
+    "/run/openvpn-server/*.pid",
+)
+
+
+class ProcessTracker(object):
+    """
+    Sabe si hay un proceso cuyo nombre contiene ``name``
+
+    Args:
+        name: Parte del nombre del proceso (sin distinguir mayúsculas).
+        pidfiles: Rutas (admiten comodines) de ficheros con el PID.
+        negative_ttl: Segundos durante los que se recuerda que el proceso no
+            existe.
+        clock: Reloj monótono.
+    """
+
+    def __init__(self, name, pidfiles=(), negative_ttl=5, clock=time.monotonic):
+        self.name = name.lower()
+        self.pidfiles = pidfiles
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+
+        # (pid, create_time) del último proceso encontrado
+        self._cached = None
+        self._missing_until = None
+
+    def _matches(self, proc_name):
+        return bool(proc_name) and self.name in proc_name.lower()
+
+    def _validate(self, pid, create_time=None):
+        """(pid, create_time) si ``pid`` es un proceso vivo con el nombre buscado"""
+        try:
+            proc = psutil.Process(pid)
+            if create_time is not None and proc.create_time() != create_time:
+                return None
+            if not self._matches(proc.name()):
+                return None
+            return pid, proc.create_time()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return None
+
+    def _from_pidfiles(self):
+        for pattern in self.pidfiles:
+            for path in glob.glob(pattern):
+                try:
+                    with open(path) as fp:
+                        pid = int(fp.read().split()[0])
+                except (OSError, ValueError, IndexError):
+                    continue
+
+                found = self._validate(pid)
+                if found:
+                    return found
+        return None
+
+    def _candidates(self):
+        """PIDs cuyo nombre coincide, recorriendo la tabla de procesos una vez"""
+        if os.path.isdir(PROC_DIR):
+            # En Linux leer /proc/<pid>/comm es bastante más barato que
+            # psutil; comm se trunca a 15 caracteres, de sobra para "openvpn"
+            for entry in os.listdir(PROC_DIR):
+                if not entry.isdigit():
+                    continue
+                try:
+                    with open(os.path.join(PROC_DIR, entry, "comm"), "rb") as fp:
+                        name = fp.read().decode("utf-8", "replace")
+                except OSError:
+                    continue
+                yield int(entry), name
+        else:
+            for proc in psutil.process_iter(["name"], ad_value=None):
+                yield proc.pid, proc.info["name"]
+
+    def _scan(self):
+        with tracing.span("process.scan", process_name=self.name) as span:
+            scanned = 0
+            found = None
+            for pid, name in self._candidates():
+                scanned += 1
+                # La hora de creación solo se pide al candidato
+                if self._matches(name):
+                    found = self._validate(pid)
+                    if found:
+                        break
+            span.set(scanned=scanned)
+        return found
+
+    def find(self):
+        """
+        Returns:
+            int: El PID del proceso, o None si no está en ejecución.
+        """
+        with tracing.span("process.find", process_name=self.name) as span:
+            source = "cache"
+            found = self._validate(*self._cached) if self._cached else None
+
+            if not found:
+                if self._missing_until is not None and self.clock() < self._missing_until:
+                    span.set(source="negative_cache")
+                    return None
+
+                source = "pidfile"
+                found = self._from_pidfiles()
+            if not found:
+                source = "scan"
+                found = self._scan()
+
+            span.set(source=source)
+            self._cached = found
+            self._missing_until = None if found else self.clock() + self.negative_ttl
+            return found[0] if found else None
+
+    def is_running(self):
+        return self.find() is not None
+
+    def forget(self):
+        """Olvida lo que se sabe del proceso, p. ej. después de terminarlo"""
+        self._cached = None
+        self._missing_until = None
+
+
+def openvpn_tracker():
+    pidfiles = OPENVPN_PIDFILES
+    if os.environ.get("NAUTAPY_OPENVPN_PIDFILE"):
+        pidfiles = (os.environ["NAUTAPY_OPENVPN_PIDFILE"],) + pidfiles
+    return ProcessTracker("openvpn", pidfiles=pidfiles)
@@ -0,0 +1,299 @@
+"""
+Proxy HTTP/CONNECT que abre la sesión Nauta de forma transparente
+
+Ver PROXY_GUIDE.md. La sesión se abre al llegar la primera conexión (si no
+hay ya una sesión activa), se cuentan las conexiones activas y, cuando se
+cierra la última, se cierra la sesión, pero solo si la abrió el propio
+proxy. Así todas las máquinas de la red local comparten una sola sesión y
+no se paga tiempo sin uso. Con una unidad de tarificación el cierre espera
+hasta justo antes del final de la unidad ya cobrada, y se cancela si llega
+una conexión nueva mientras tanto.
+"""
+
+import asyncio
+import logging
+from urllib.parse import urlsplit
+
+from nautapy.exceptions import NautaException, NautaPreLoginException
+from nautapy.nauta_api import SessionObject
+from nautapy.relay import get_relay, relay_buffered
+from nautapy.scheduler import SessionScheduler
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_SIZE = 64 * 1024
+
+# Cabeceras que solo tienen sentido entre el cliente y el proxy
+_HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "proxy-connection",
+    "te",
+    "trailer",
+    "upgrade",
+}
+
+
+class SessionManager(object):
+    """
+    Cuenta las conexiones activas y abre/cierra la sesión Nauta
+
+    Args:
+        client: :class:`NautaClient` con el que se abre la sesión.
+        session_is_open: Función que indica si ya hay una sesión abierta
+            (por defecto la del fichero de sesión).
+        time_unit: Unidad mínima de tarificación en segundos, o None para
+            cerrar la sesión en cuanto no queden conexiones.
+    """
+
+    def __init__(self, client, session_is_open=SessionObject.is_logged_in, time_unit=None):
+        self.client = client
+        self.session_is_open = session_is_open
+        self.scheduler = SessionScheduler(time_unit)
+        self.active = 0
+        # True solo si la sesión actual la abrió este proxy
+        self.owns_session = False
+        self._idle_logout = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """
+        Registra una conexión nueva, abriendo la sesión si es la primera
+
+        Raises:
+            NautaException: Si no se pudo abrir la sesión.
+        """
+        async with self._lock:
+            self._cancel_idle_logout()
+            if not self.owns_session and not self.session_is_open():
+                await self._login()
+            self.active += 1
+
+    async def release(self):
+        async with self._lock:
+            self.active -= 1
+            if not self.active and self.owns_session:
+                if self.scheduler.time_unit:
+                    self._schedule_idle_logout()
+                else:
+                    await self._logout()
+
+    async def close(self):
+        """Cierra la sesión propia al terminar el proxy"""
+        async with self._lock:
+            self._cancel_idle_logout()
+            if self.owns_session:
+                await self._logout()
+
+    def _schedule_idle_logout(self):
+        delay = self.scheduler.idle_deadline() - self.scheduler.clock()
+        logger.info("Sin conexiones: la sesión se cerrará en %d segundos", delay)
+        self._idle_logout = asyncio.get_running_loop().create_task(
+            self._logout_when_idle(delay)
+        )
+
+    def _cancel_idle_logout(self):
+        if self._idle_logout:
+            self._idle_logout.cancel()
+            self._idle_logout = None
+
+    async def _logout_when_idle(self, delay):
+        await asyncio.sleep(delay)
+        async with self._lock:
+            self._idle_logout = None
+            if not self.active and self.owns_session:
+                await self._logout()
+
+    async def _login(self):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self.client.login)
+        except NautaPreLoginException as ex:
+            # Ya hay conexión por otra vía: no hay sesión que gestionar
+            logger.info("No se abre sesión: %s", ex.args[0])
+            return
+
+        self.owns_session = True
+        self.scheduler.start()
+        logger.info("Sesión abierta: %s", self.client.user)
+
+    async def _logout(self):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self.client.logout)
+            logger.info("Sesión cerrada: %s", self.client.user)
+        finally:
+            self.owns_session = False
+
+
+def _parse_host_port(authority, default_port):
+    """Separa ``host:port`` (admite IPv6 entre corchetes)"""
+    if authority.startswith("["):
+        host, _, rest = authority[1:].partition("]")
+        port = rest[1:] if rest.startswith(":") else ""
+    else:
+        host, _, port = authority.partition(":")
+    return host, int(port) if port.isdigit() else default_port
+
+
+class ProxyServer(object):
+    """
+    Proxy HTTP/CONNECT sobre asyncio
+
+    Args:
+        sessions: :class:`SessionManager` compartido por las conexiones.
+        host: Dirección donde escuchar.
+        port: Puerto donde escuchar.
+        max_conn: Máximo de conexiones simultáneas (None sin límite).
+        relay_mode: Modo de reenvío de los túneles CONNECT (ver
+            :mod:`nautapy.relay`).
+    """
+
+    def __init__(
+            self,
+            sessions,
+            host="0.0.0.0",
+            port=3128,
+            max_conn=None,
+            relay_mode="auto",
+    ):
+        self.sessions = sessions
+        self.host = host
+        self.port = port
+        self.max_conn = max_conn
+        self.tunnel_relay = get_relay(relay_mode)
+        self.connections = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(
+            self.handle_client, self.host, self.port, limit=MAX_HEADER_SIZE
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info("Proxy escuchando en %s:%s", self.host, self.port)
+
+    async def serve_forever(self):
+        if not self.server:
+            await self.start()
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            await self.sessions.close()
+
+    async def handle_client(self, reader, writer):
+        self.connections += 1
+        try:
+            await self._handle_request(reader, writer)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            await self._respond(writer, 400, "Bad Request")
+        except (ConnectionError, OSError) as ex:
+            logger.debug("Conexión terminada: %s", ex)
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _handle_request(self, reader, writer):
+        head = await reader.readuntil(b"\r\n\r\n")
+        request_line, _, headers = head.partition(b"\r\n")
+        method, target, version = request_line.decode("latin-1").split(" ", 2)
+
+        if self.max_conn and self.connections > self.max_conn:
+            await self._respond(writer, 503, "Service Unavailable")
+            return
+
+        if method == "CONNECT":
+            host, port = _parse_host_port(target, 443)
+        else:
+            url = urlsplit(target)
+            if url.scheme != "http" or not url.hostname:
+                await self._respond(writer, 400, "Bad Request")
+                return
+            host, port = url.hostname, url.port or 80
+
+        try:
+            await self.sessions.acquire()
+        except (NautaException, OSError) as ex:
+            logger.error("No se pudo abrir la sesión: %s", ex)
+            await self._respond(writer, 502, "Bad Gateway")
+            return
+
+        try:
+            logger.info("%s %s", method, target)
+            try:
+                remote_reader, remote_writer = await asyncio.open_connection(host, port)
+            except OSError as ex:
+                logger.warning("No se pudo conectar a %s:%s: %s", host, port, ex)
+                await self._respond(writer, 502, "Bad Gateway")
+                return
+
+            try:
+                if method == "CONNECT":
+                    writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+                    await writer.drain()
+                    await self.tunnel_relay(reader, writer, remote_reader, remote_writer)
+                else:
+                    remote_writer.write(self._origin_request(
+                        method, url, version, headers.decode("latin-1")
+                    ))
+                    await relay_buffered(reader, writer, remote_reader, remote_writer)
+            finally:
+                remote_writer.close()
+        finally:
+            await self.sessions.release()
+
+    @staticmethod
+    def _origin_request(method, url, version, headers):
+        """Reescribe la petición del cliente para enviarla al servidor de origen"""
+        path = url.path or "/"
+        if url.query:
+            path += "?" + url.query
+
+        lines = ["{} {} {}".format(method, path, version)]
+        for line in headers.split("\r\n"):
+            name = line.partition(":")[0].strip().lower()
+            if line and name not in _HOP_BY_HOP_HEADERS:
+                lines.append(line)
+        # Una petición por conexión: el final de la respuesta es el cierre
+        lines.append("Connection: close")
+
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    @staticmethod
+    async def _respond(writer, status, reason):
+        try:
+            writer.write(
+                "HTTP/1.1 {} {}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".format(
+                    status, reason
+                ).encode("latin-1")
+            )
+            await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+
+def configure_logging(log):
+    """``log`` es la ruta del fichero de logs, o "-" para stdout"""
+    handler = logging.StreamHandler() if log == "-" else logging.FileHandler(log)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logging.getLogger("nautapy").addHandler(handler)
+    logging.getLogger("nautapy").setLevel(logging.INFO)
+
+
+def run(client, port=3128, time_unit=None, max_conn=None, host="0.0.0.0", relay_mode="auto"):
+    """Ejecuta el proxy hasta que se interrumpa con Ctrl+C"""
+    proxy = ProxyServer(
+        SessionManager(client, time_unit=time_unit),
+        host=host,
+        port=port,
+        max_conn=max_conn,
+        relay_mode=relay_mode,
+    )
+    try:
+        asyncio.run(proxy.serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,197 @@
+"""
+Reenvío de datos entre dos conexiones del proxy
+
+Dos implementaciones con la misma interfaz:
+
+- ``buffered``: bucle de lectura/escritura sobre los streams de asyncio.
+  Funciona en cualquier plataforma.
+- ``splice``: en Linux los sockets se sacan de asyncio y los datos pasan de
+  un socket a otro a través de una tubería con ``os.splice``, sin copiarse
+  al espacio de usuario. ``socket.sendfile`` no sirve aquí porque el origen
+  tiene que ser un fichero, no un socket.
+
+``auto`` usa ``splice`` si está disponible y ``buffered`` en otro caso.
+"""
+
+import asyncio
+import os
+import socket
+
+RELAY_MODES = ("auto", "splice", "buffered")
+
+RELAY_CHUNK_SIZE = 64 * 1024
+
+SPLICE_AVAILABLE = hasattr(os, "splice")
+
+if SPLICE_AVAILABLE:
+    _SPLICE_FLAGS = os.SPLICE_F_MOVE | os.SPLICE_F_NONBLOCK
+
+
+async def _pipe(reader, writer):
+    try:
+        while True:
+            data = await reader.read(RELAY_CHUNK_SIZE)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+        if writer.can_write_eof():
+            writer.write_eof()
+    except (ConnectionError, OSError):
+        pass
+
+
+async def relay_buffered(client_reader, client_writer, remote_reader, remote_writer):
+    """Copia los datos en ambos sentidos hasta que los dos lados terminen"""
+    await asyncio.gather(
+        _pipe(client_reader, remote_writer),
+        _pipe(remote_reader, client_writer),
+    )
+
+
+async def _read_buffered(reader):
+    """
+    Lo que ``reader`` ya recibió, sin esperar a que lleguen más datos
+
+    ``StreamReader.read`` termina sin suspenderse si tiene datos en su
+    buffer: se le deja dar un único paso y se cancela si tuvo que esperar.
+    """
+    chunks = []
+    while True:
+        task = asyncio.ensure_future(reader.read(RELAY_CHUNK_SIZE))
+        await asyncio.sleep(0)
+        if not task.done():
+            task.cancel()
+            await asyncio.wait([task])
+            break
+
+        data = task.result()
+        if not data:
+            break
+        chunks.append(data)
+    return b"".join(chunks)
+
+
+async def _stop_reading(reader, transport):
+    """
+    Deja de leer del socket de ``transport`` y devuelve lo que ``reader`` ya
+    había recibido; lo que llegue después se queda en el socket
+    """
+    chunks = []
+    while True:
+        transport.pause_reading()
+        chunks.append(await _read_buffered(reader))
+        # Vaciar el buffer de reader puede reanudar la lectura del transporte
+        if not transport.is_reading():
+            return b"".join(chunks)
+
+
+async def _flush(writer):
+    """Espera a que el transporte haya enviado todo lo que tiene pendiente"""
+    # Con el límite a 0, drain() solo vuelve cuando el buffer está vacío
+    writer.transport.set_write_buffer_limits(high=0)
+    await writer.drain()
+
+
+def _detach_socket(writer):
+    """
+    Duplica el socket del transporte y cierra el transporte de asyncio
+
+    Lo que quede en el buffer del transporte se pierde: antes hay que
+    esperar a :func:`_flush`.
+    """
+    fd = os.dup(writer.get_extra_info("socket").fileno())
+    # El descriptor duplicado mantiene abierta la conexión
+    writer.transport.abort()
+    return socket.socket(fileno=fd)
+
+
+async def _wait_fd(add, remove, fd):
+    future = asyncio.get_running_loop().create_future()
+    add(fd, future.set_result, None)
+    try:
+        await future
+    finally:
+        remove(fd)
+
+
+async def _splice_pipe(src, dst):
+    loop = asyncio.get_running_loop()
+    pipe_r, pipe_w = os.pipe()
+    try:
+        pending = 0
+        while True:
+            if not pending:
+                await _wait_fd(loop.add_reader, loop.remove_reader, src.fileno())
+                try:
+                    pending = os.splice(src.fileno(), pipe_w, RELAY_CHUNK_SIZE, flags=_SPLICE_FLAGS)
+                except BlockingIOError:
+                    continue
+                if not pending:
+                    break
+
+            try:
+                pending -= os.splice(pipe_r, dst.fileno(), pending, flags=_SPLICE_FLAGS)
+            except BlockingIOError:
+                await _wait_fd(loop.add_writer, loop.remove_writer, dst.fileno())
+
+        dst.shutdown(socket.SHUT_WR)
+    except (ConnectionError, OSError):
+        # Sin un sentido de la conexión no tiene sentido mantener el otro
+        for sock in (src, dst):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+    finally:
+        os.close(pipe_r)
+        os.close(pipe_w)
+
+
+async def relay_splice(client_reader, client_writer, remote_reader, remote_writer):
+    """
+    Como :func:`relay_buffered` pero con ``os.splice`` (solo Linux)
+
+    Los transportes de asyncio se cierran; la conexión sigue abierta sobre
+    descriptores duplicados que se cierran al terminar.
+    """
+    # Lo que asyncio ya leyó no está en el socket: se reenvía primero
+    for reader, transport, writer in (
+            (client_reader, client_writer.transport, remote_writer),
+            (remote_reader, remote_writer.transport, client_writer),
+    ):
+        data = await _stop_reading(reader, transport)
+        if data:
+            writer.write(data)
+
+    # Incluye lo escrito antes de llamar al relay (p. ej. la respuesta al CONNECT)
+    await _flush(client_writer)
+    await _flush(remote_writer)
+
+    client_sock = _detach_socket(client_writer)
+    remote_sock = _detach_socket(remote_writer)
+    try:
+        await asyncio.gather(
+            _splice_pipe(client_sock, remote_sock),
+            _splice_pipe(remote_sock, client_sock),
+        )
+    finally:
+        client_sock.close()
+        remote_sock.close()
+
+
+def get_relay(mode="auto"):
+    """
+    Returns:
+        Corrutina ``relay(client_reader, client_writer, remote_reader,
+        remote_writer)`` para el modo pedido.
+    """
+    if mode not in RELAY_MODES:
+        raise ValueError("Modo de reenvío desconocido: {}".format(mode))
+
+    if mode == "splice" and not SPLICE_AVAILABLE:
+        raise ValueError("os.splice no está disponible en esta plataforma")
+
+    if mode == "buffered" or not SPLICE_AVAILABLE:
+        return relay_buffered
+    return relay_splice
@@ -0,0 +1,83 @@
+"""
+Estimación local del tiempo restante de cada cuenta
+
+Consultar el tiempo restante al portal (``getLeftTime``) cuesta una petición
+cada vez. :class:`RemainingTimeCache` guarda la última respuesta de cada
+cuenta junto con la sesión en la que se obtuvo (su ``ATTRIBUTE_UUID``, o
+None si la cuenta no estaba conectada) y, mientras esa sesión sigue abierta,
+descuenta el tiempo transcurrido desde entonces. El valor guardado deja de
+usarse, y hay que volver a preguntar al portal, cuando:
+
+- han pasado ``resync_interval`` segundos desde la última consulta, o
+- la sesión actual de la cuenta no es aquella en la que se consultó (se
+  abrió, se cerró o se abrió otra distinta).
+"""
+
+import json
+import os
+import time
+
+from nautapy import appdata_path
+from nautapy.utils import file_lock, write_json_atomic
+
+REMAINING_TIME_FILE = os.path.join(appdata_path, "remaining-time")
+
+# Segundos durante los que se confía en la estimación local
+DEFAULT_RESYNC_INTERVAL = 300
+
+
+class RemainingTimeCache(object):
+    """
+    Tiempo restante de cada cuenta, compartido entre procesos en ``path``
+
+    Args:
+        path: Fichero JSON con la última consulta de cada cuenta.
+        resync_interval: Segundos tras los que hay que volver a consultar
+            al portal.
+        clock: Función que devuelve el momento actual.
+    """
+
+    def __init__(self, path=None, resync_interval=DEFAULT_RESYNC_INTERVAL, clock=time.time):
+        self.path = path or REMAINING_TIME_FILE
+        self.resync_interval = resync_interval
+        self.clock = clock
+
+    def _load(self):
+        try:
+            with open(self.path) as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return {}
+
+    def estimate(self, user, session):
+        """
+        Segundos restantes de ``user`` según la última consulta
+
+        Args:
+            session: Identificador de la sesión abierta de ``user``, o None
+                si no está conectado.
+
+        Returns:
+            int: Los segundos restantes, o None si hay que consultar al portal.
+        """
+        record = self._load().get(user)
+        if not record or record.get("session") != session:
+            return None
+
+        elapsed = self.clock() - record["synced_at"]
+        if not 0 <= elapsed < self.resync_interval:
+            return None
+
+        return max(0, int(record["seconds"] - (elapsed if session else 0)))
+
+    def update(self, user, seconds, session):
+        """
+        Guarda la respuesta del portal: ``seconds`` restantes en este momento,
+        con la sesión ``session`` abierta (None si ``user`` no está conectado)
+        """
+        # Otro proceso (p. ej. 'users status' durante un 'up') puede estar
+        # actualizando otra cuenta: se lee y se escribe bajo el cerrojo
+        with file_lock(self.path + ".lock"):
+            data = self._load()
+            data[user] = {"seconds": seconds, "synced_at": self.clock(), "session": session}
+            write_json_atomic(self.path, data)
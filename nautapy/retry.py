@@ -0,0 +1,159 @@
+"""
+Reintentos con plazo máximo para las operaciones contra el portal
+
+En lugar de esperar siempre lo mismo entre intentos, :class:`RetryPolicy`
+espera poco al principio y cada vez más (backoff exponencial con jitter),
+sin pasarse nunca de un plazo total. Si se le da una comprobación rápida
+de que el portal responde (``probe``), mientras el portal no responda no
+reintenta a ciegas: espera a que vuelva y reintenta en ese momento.
+
+Example:
+    policy = RetryPolicy(deadline=30, probe=portal_reachable)
+    policy.call(lambda: NautaProtocol.logout(session, user))
+"""
+
+import random
+import time
+
+DEFAULT_DEADLINE = 60
+
+
+class RetryPolicy(object):
+    """
+    Política de reintentos
+
+    Args:
+        deadline: Segundos máximos desde el primer intento. Con 0 se hace un
+            único intento.
+        initial_delay: Espera tras el primer fallo.
+        max_delay: Espera máxima entre dos intentos.
+        multiplier: Factor de crecimiento de la espera.
+        jitter: Fracción de la espera que se elige al azar (0 a 1), para que
+            varios clientes no reintenten a la vez.
+        probe: Función sin argumentos que devuelve True si el portal
+            responde. Debe ser rápida (p. ej. una conexión TCP).
+        probe_interval: Segundos entre comprobaciones mientras el portal no
+            responde.
+        clock, sleep, rand: Reloj monótono, espera y generador de números
+            aleatorios; se pueden sustituir en las pruebas.
+    """
+
+    def __init__(
+            self,
+            deadline=DEFAULT_DEADLINE,
+            initial_delay=0.5,
+            max_delay=8.0,
+            multiplier=2.0,
+            jitter=0.5,
+            probe=None,
+            probe_interval=0.5,
+            clock=time.monotonic,
+            sleep=time.sleep,
+            rand=random.random,
+    ):
+        if deadline < 0:
+            raise ValueError("El plazo de los reintentos no puede ser negativo")
+        if not 0 <= jitter <= 1:
+            raise ValueError("El jitter debe estar entre 0 y 1")
+
+        self.deadline = deadline
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.probe = probe
+        self.probe_interval = probe_interval
+        self.clock = clock
+        self.sleep = sleep
+        self.rand = rand
+
+    def backoff(self, attempt):
+        """Espera tras el intento número ``attempt`` (empezando en 1)"""
+        delay = min(self.max_delay, self.initial_delay * self.multiplier ** (attempt - 1))
+        return delay * (1 - self.jitter * self.rand())
+
+    def _remaining(self, deadline_at):
+        return max(0, deadline_at - self.clock())
+
+    def call(self, func, retry_on=None, on_retry=None):
+        """
+        Llama a ``func`` hasta que no lance ``retry_on`` o se acabe el plazo
+
+        Args:
+            func: Función sin argumentos.
+            retry_on: Excepciones que provocan un reintento (por defecto
+                ``requests.RequestException``).
+            on_retry: Función opcional ``on_retry(excepción, intento)``
+                llamada antes de cada espera.
+
+        Returns:
+            Lo que devuelva ``func``.
+
+        Raises:
+            La última excepción de ``func`` si se agotó el plazo.
+        """
+        if retry_on is None:
+            from requests import RequestException
+
+            retry_on = (RequestException,)
+
+        deadline_at = self.clock() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return func()
+            except retry_on as ex:
+                if self._remaining(deadline_at) <= 0:
+                    raise
+                if on_retry:
+                    on_retry(ex, attempt)
+                self._wait(self.backoff(attempt), deadline_at)
+
+    def _wait(self, delay, deadline_at):
+        """Espera ``delay`` segundos o, si el portal no responde, hasta que vuelva"""
+        if self.probe is None or self.probe():
+            self.sleep(min(delay, self._remaining(deadline_at)))
+            return
+
+        while self._remaining(deadline_at) > 0:
+            self.sleep(min(self.probe_interval, self._remaining(deadline_at)))
+            if self.probe():
+                return
+
+    async def acall(self, func, retry_on, on_retry=None):
+        """
+        Equivalente a :meth:`call` para corutinas
+
+        ``func`` devuelve un awaitable; las esperas usan ``asyncio.sleep`` y
+        ``probe`` se ejecuta en el executor por defecto.
+        """
+        deadline_at = self.clock() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await func()
+            except retry_on as ex:
+                if self._remaining(deadline_at) <= 0:
+                    raise
+                if on_retry:
+                    on_retry(ex, attempt)
+                await self._async_wait(self.backoff(attempt), deadline_at)
+
+    async def _async_wait(self, delay, deadline_at):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        if self.probe is None or await loop.run_in_executor(None, self.probe):
+            await asyncio.sleep(min(delay, self._remaining(deadline_at)))
+            return
+
+        while self._remaining(deadline_at) > 0:
+            await asyncio.sleep(min(self.probe_interval, self._remaining(deadline_at)))
+            if await loop.run_in_executor(None, self.probe):
+                return
+
+
+# Un único intento, sin reintentos
+NO_RETRY = RetryPolicy(deadline=0)
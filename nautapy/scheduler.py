@@ -0,0 +1,95 @@
+"""
+Planificación del cierre de sesión según la unidad de tarificación
+
+ETECSA cobra el tiempo por unidades completas (por ejemplo 120 segundos en
+Nauta Hogar): una vez que empieza una unidad se paga entera. Cerrar la
+sesión justo después de un límite de unidad desperdicia casi toda la unidad
+recién cobrada, así que :class:`SessionScheduler` sitúa los cierres, tanto
+los programados por tiempo como los que se hacen por inactividad, justo
+antes del siguiente límite.
+"""
+
+import math
+import time
+
+# Segundos de antelación con los que se cierra la sesión antes del límite de
+# la unidad, para que el logout llegue al portal a tiempo
+LOGOUT_MARGIN = 10
+
+
+class SessionScheduler(object):
+    """
+    Calcula cuándo cerrar una sesión
+
+    Sin ``time_unit`` se comporta como hasta ahora: los cierres se hacen en
+    el momento exacto pedido.
+
+    Args:
+        time_unit: Unidad mínima de tarificación en segundos, o None.
+        started_at: Momento (``time.time()``) en que se abrió la sesión.
+            Si es None se toma al llamar a :meth:`start`.
+        margin: Segundos de antelación respecto al límite de la unidad.
+        clock: Función que devuelve el momento actual.
+    """
+
+    def __init__(self, time_unit=None, started_at=None, margin=LOGOUT_MARGIN, clock=time.time):
+        if time_unit is not None and time_unit <= 0:
+            raise ValueError("La unidad de tarificación debe ser positiva")
+
+        self.time_unit = time_unit
+        self.started_at = started_at
+        # Un margen mayor que la unidad cerraría antes de tiempo siempre
+        self.margin = min(margin, time_unit / 2) if time_unit else 0
+        self.clock = clock
+
+    def start(self, started_at=None):
+        self.started_at = self.clock() if started_at is None else started_at
+        return self
+
+    def elapsed(self, now=None):
+        return (self.clock() if now is None else now) - self.started_at
+
+    def billed_units(self, now=None):
+        """Unidades cobradas hasta ``now`` (la unidad en curso cuenta entera)"""
+        if not self.time_unit:
+            return None
+        return max(1, math.ceil(self.elapsed(now) / self.time_unit))
+
+    def next_boundary(self, now=None):
+        """Momento en que termina la unidad en curso"""
+        if not self.time_unit:
+            return None
+        units = math.floor(max(0, self.elapsed(now)) / self.time_unit) + 1
+        return self.started_at + units * self.time_unit
+
+    def session_deadline(self, session_time):
+        """
+        Momento en que cerrar una sesión limitada a ``session_time`` segundos
+
+        El límite se alarga hasta justo antes del final de la unidad en la
+        que cae, que de todas formas se va a cobrar. Si cae dentro del margen
+        de un límite, se alarga hasta la unidad siguiente: cerrar justo en el
+        límite cobraría una unidad nueva mientras se hace el logout.
+        """
+        requested = self.started_at + session_time
+        if not self.time_unit:
+            return requested
+
+        units = max(1, math.ceil(session_time / self.time_unit))
+        deadline = self.started_at + units * self.time_unit - self.margin
+        if deadline < requested:
+            deadline += self.time_unit
+        return deadline
+
+    def idle_deadline(self, now=None):
+        """
+        Momento en que cerrar una sesión que quedó sin uso en ``now``
+
+        Es justo antes del final de la unidad en curso; si ya se está dentro
+        del margen, es ``now``.
+        """
+        now = self.clock() if now is None else now
+        if not self.time_unit:
+            return now
+
+        return max(now, self.next_boundary(now) - self.margin)
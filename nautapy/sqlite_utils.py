@@ -1,25 +1,175 @@
+import atexit
 import os
 import sqlite3
+import threading
 from base64 import b85encode, b85decode
+from contextlib import contextmanager
 from datetime import datetime
 from getpass import getpass
 
-from nautapy import appdata_path
+from nautapy import appdata_path, tracing
+from nautapy.utils import ensure_parent_dir
 
 # Base de datos de los usuarios
 USERS_DB = os.path.join(appdata_path, "users.db")
 # Base de datos de las conexiones hechas por los usuarios
 CONNECTIONS_DB = os.path.join(appdata_path, "connections.db")
 
+_USERS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (user TEXT, password TEXT);
+CREATE TABLE IF NOT EXISTS default_user (user TEXT);
+CREATE TABLE IF NOT EXISTS balances (user TEXT PRIMARY KEY, seconds INTEGER, updated_ts INTEGER);
+CREATE INDEX IF NOT EXISTS balances_seconds ON balances (seconds);
+"""
+
+_CONNECTIONS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS connections (
+    user TEXT,
+    fecha_inicio_sesion DATETIME,
+    fecha_cierre_sesion DATETIME,
+    inicio_ts INTEGER,
+    cierre_ts INTEGER
+);
+CREATE INDEX IF NOT EXISTS connections_user_inicio ON connections (user, inicio_ts);
+CREATE INDEX IF NOT EXISTS connections_inicio ON connections (inicio_ts);
+CREATE TABLE IF NOT EXISTS monthly_usage (
+    user TEXT,
+    month TEXT,
+    total_seconds INTEGER,
+    sessions INTEGER,
+    PRIMARY KEY (user, month)
+);
+"""
+
+# Versión del esquema de connections.db (PRAGMA user_version)
+#   0: solo las fechas como texto
+#   1: columnas inicio_ts/cierre_ts (segundos desde epoch) con índices
+#   2: resumen mensual monthly_usage, mantenido por save_logout
+CONNECTIONS_SCHEMA_VERSION = 2
+
+# Conexiones abiertas por ruta de la base de datos: (pid, conexión)
+_pool = {}
+# Protege el pool y serializa las escrituras de distintos hilos
+_lock = threading.RLock()
+
+
+def _connect(path, init):
+    """
+    Conexión compartida a la base de datos ``path``
+
+    Se abre una sola vez por proceso (en modo WAL, con ``synchronous=NORMAL``
+    para que los commits no esperen a un fsync) y ``init(conn)`` crea o
+    actualiza el esquema solo al abrirla. Puede usarse desde varios hilos.
+    """
+    with _lock:
+        entry = _pool.get(path)
+        # Una conexión heredada de otro proceso (fork) no se puede reutilizar
+        if entry and entry[0] == os.getpid():
+            return entry[1]
+
+        ensure_parent_dir(path)
+        conn = sqlite3.connect(path, check_same_thread=False, cached_statements=64)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        init(conn)
+        _pool[path] = (os.getpid(), conn)
+        return conn
+
+
+def _init_users_db(conn):
+    conn.executescript(_USERS_SCHEMA)
+
+
+def _schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _init_connections_db(conn):
+    if _schema_version(conn) >= CONNECTIONS_SCHEMA_VERSION:
+        return
+
+    with conn:
+        # Bloquea la base de datos por si otro proceso la migra a la vez
+        conn.execute("BEGIN IMMEDIATE")
+        version = _schema_version(conn)
+        if version >= CONNECTIONS_SCHEMA_VERSION:
+            return
+
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(connections)")}
+        if version < 1 and columns and "inicio_ts" not in columns:
+            # Base de datos anterior: se añaden las columnas y se rellenan a
+            # partir de las fechas, guardadas en hora local
+            conn.execute("ALTER TABLE connections ADD COLUMN inicio_ts INTEGER")
+            conn.execute("ALTER TABLE connections ADD COLUMN cierre_ts INTEGER")
+            conn.execute(
+                """
+                UPDATE connections SET
+                    inicio_ts = CAST(strftime('%s', fecha_inicio_sesion, 'utc') AS INTEGER),
+                    cierre_ts = CAST(strftime('%s', fecha_cierre_sesion, 'utc') AS INTEGER)
+                """
+            )
+
+        for statement in _CONNECTIONS_SCHEMA.split(";"):
+            if statement.strip():
+                conn.execute(statement)
+
+        if version < 2:
+            _rebuild_monthly_usage(conn)
+        conn.execute("PRAGMA user_version = {}".format(CONNECTIONS_SCHEMA_VERSION))
+
+
+# Horas por usuario y mes calculadas en SQLite. El mes es el de inicio de
+# la conexión, en hora local; las conexiones abiertas no cuentan
+_MONTHLY_USAGE_SELECT = """
+SELECT
+    user,
+    strftime('%Y-%m', inicio_ts, 'unixepoch', 'localtime') AS month,
+    SUM(cierre_ts - inicio_ts),
+    COUNT(*)
+FROM connections
+WHERE inicio_ts IS NOT NULL AND cierre_ts IS NOT NULL
+GROUP BY user, month
+"""
+
+
+def _rebuild_monthly_usage(conn):
+    conn.execute("DELETE FROM monthly_usage")
+    conn.execute(
+        "INSERT INTO monthly_usage (user, month, total_seconds, sessions) "
+        + _MONTHLY_USAGE_SELECT
+    )
+
+
+def users_db():
+    return _connect(USERS_DB, _init_users_db)
+
+
+def connections_db():
+    return _connect(CONNECTIONS_DB, _init_connections_db)
 
-def users_db_connect():
-    conn = sqlite3.connect(USERS_DB)
-    cursor = conn.cursor()
-    cursor.execute("CREATE TABLE IF NOT EXISTS users (user TEXT, password TEXT)")
-    cursor.execute("CREATE TABLE IF NOT EXISTS default_user (user TEXT)")
 
-    conn.commit()
-    return cursor, conn
+@contextmanager
+def _transaction(conn):
+    """Ejecuta el bloque en una transacción, sin solaparse con otros hilos"""
+    with _lock, conn:
+        yield conn
+
+
+def close_all():
+    """Cierra las conexiones abiertas por este proceso"""
+    with _lock:
+        for pid, conn in _pool.values():
+            if pid == os.getpid():
+                conn.close()
+        _pool.clear()
+
+
+atexit.register(close_all)
+
+
+def users_db_connect():
+    conn = users_db()
+    return conn.cursor(), conn
 
 
 def _get_default_user():
@@ -50,38 +200,43 @@ def _find_credentials(user, default_password=None):
         return user, default_password
 
 
+def _all_credentials():
+    """Lista ``[(usuario, contraseña)]`` de todos los usuarios guardados"""
+    cursor, _ = users_db_connect()
+    return [
+        (rec[0], b85decode(rec[1]).decode("utf-8"))
+        for rec in cursor.execute("SELECT user, password FROM users")
+    ]
+
+
 def add_user(args):
     password = args.password or getpass("Contraseña para {}: ".format(args.user))
 
-    cursor, connection = users_db_connect()
-    cursor.execute(
-        "INSERT INTO users VALUES (?, ?)",
-        (args.user, b85encode(password.encode("utf-8"))),
-    )
-    connection.commit()
+    with _transaction(users_db()) as conn:
+        conn.execute(
+            "INSERT INTO users VALUES (?, ?)",
+            (args.user, b85encode(password.encode("utf-8"))),
+        )
 
     print("Usuario guardado: {}".format(args.user))
 
 
 def set_default_user(args):
-    cursor, connection = users_db_connect()
-    cursor.execute("SELECT count(user) FROM default_user")
-    res = cursor.fetchone()
-
-    if res[0]:
-        cursor.execute("UPDATE default_user SET user=?", (args.user,))
-    else:
-        cursor.execute("INSERT INTO default_user VALUES (?)", (args.user,))
+    with _transaction(users_db()) as conn:
+        res = conn.execute("SELECT count(user) FROM default_user").fetchone()
 
-    connection.commit()
+        if res[0]:
+            conn.execute("UPDATE default_user SET user=?", (args.user,))
+        else:
+            conn.execute("INSERT INTO default_user VALUES (?)", (args.user,))
 
     print("Usuario predeterminado: {}".format(args.user))
 
 
 def remove_user(args):
-    cursor, connection = users_db_connect()
-    cursor.execute("DELETE FROM users WHERE user=?", (args.user,))
-    connection.commit()
+    with _transaction(users_db()) as conn:
+        conn.execute("DELETE FROM users WHERE user=?", (args.user,))
+        conn.execute("DELETE FROM balances WHERE user=?", (args.user,))
 
     print("Usuario eliminado: {}".format(args.user))
 
@@ -89,13 +244,11 @@ def remove_user(args):
 def set_password(args):
     password = args.password or getpass("Contraseña para {}: ".format(args.user))
 
-    cursor, connection = users_db_connect()
-    cursor.execute(
-        "UPDATE users SET password=? WHERE user=?",
-        (b85encode(password.encode("utf-8")), args.user),
-    )
-
-    connection.commit()
+    with _transaction(users_db()) as conn:
+        conn.execute(
+            "UPDATE users SET password=? WHERE user=?",
+            (b85encode(password.encode("utf-8")), args.user),
+        )
 
     print("Contraseña actualizada: {}".format(args.user))
 
@@ -107,128 +260,269 @@ def list_users(args):
         print(rec[0])
 
 
-def create_connections_db():
-    conn = sqlite3.connect(CONNECTIONS_DB)
-    cursor = conn.cursor()
+def save_balances(balances):
+    """
+    Actualiza el índice de saldos con el tiempo restante de cada cuenta
+
+    Args:
+        balances: Pares ``(usuario, segundos restantes)`` según el portal.
+    """
+    now = int(datetime.now().timestamp())
+    with _transaction(users_db()) as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO balances (user, seconds, updated_ts) VALUES (?, ?, ?)",
+            [(user, seconds, now) for user, seconds in balances],
+        )
+
+
+def _most_time_user():
+    """
+    Cuenta guardada con más tiempo restante según el índice de saldos
+
+    Returns:
+        tuple: ``(usuario, segundos, momento de la consulta)`` o None si no
+        hay ninguna cuenta guardada con saldo conocido.
+    """
+    cursor, _ = users_db_connect()
     cursor.execute(
         """
-        CREATE TABLE IF NOT EXISTS connections (
-            user TEXT,
-            fecha_inicio_sesion DATETIME,
-            fecha_cierre_sesion DATETIME
-        )
+        SELECT balances.user, balances.seconds, balances.updated_ts
+        FROM balances JOIN users ON users.user = balances.user
+        WHERE balances.seconds > 0
+        ORDER BY balances.seconds DESC
+        LIMIT 1
         """
     )
-    conn.commit()
-    conn.close()
+    return cursor.fetchone()
+
 
+def create_connections_db():
+    connections_db()
 
+
+@tracing.traced("db.save_login")
 def save_login(user):
-    create_connections_db()
-    conn = sqlite3.connect(CONNECTIONS_DB)
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        INSERT INTO connections (user, fecha_inicio_sesion)
-        VALUES (?, ?)
-        """,
-        (user, datetime.now()),
-    )
-    conn.commit()
-    conn.close()
+    now = datetime.now()
+    with _transaction(connections_db()) as conn:
+        conn.execute(
+            """
+            INSERT INTO connections (user, fecha_inicio_sesion, inicio_ts)
+            VALUES (?, ?, ?)
+            """,
+            (user, now, int(now.timestamp())),
+        )
 
 
+@tracing.traced("db.save_logout")
 def save_logout(user):
-    # create_connections_db()
-    conn = sqlite3.connect(CONNECTIONS_DB)
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        UPDATE connections
-        SET fecha_cierre_sesion = ?
-        WHERE user = ? AND fecha_cierre_sesion IS NULL
-        AND fecha_inicio_sesion = (
-            SELECT MAX(fecha_inicio_sesion)
+    now = datetime.now()
+    with _transaction(connections_db()) as conn:
+        # Última conexión abierta del usuario, recorriendo el índice
+        # (user, inicio_ts) desde el final
+        rec = conn.execute(
+            """
+            SELECT rowid
             FROM connections
-            WHERE user = ?
-            AND fecha_cierre_sesion IS NULL
+            WHERE user = ? AND cierre_ts IS NULL
+            ORDER BY inicio_ts DESC
+            LIMIT 1
+            """,
+            (user,)
+        ).fetchone()
+        if not rec:
+            return
+
+        conn.execute(
+            """
+            UPDATE connections
+            SET fecha_cierre_sesion = ?, cierre_ts = ?
+            WHERE rowid = ?
+            """,
+            (now, int(now.timestamp()), rec[0])
+        )
+        # El resumen mensual se actualiza en la misma transacción
+        conn.execute(
+            """
+            INSERT INTO monthly_usage (user, month, total_seconds, sessions)
+            SELECT
+                user,
+                strftime('%Y-%m', inicio_ts, 'unixepoch', 'localtime'),
+                cierre_ts - inicio_ts,
+                1
+            FROM connections
+            WHERE rowid = ? AND inicio_ts IS NOT NULL
+            ON CONFLICT (user, month) DO UPDATE SET
+                total_seconds = total_seconds + excluded.total_seconds,
+                sessions = sessions + 1
+            """,
+            (rec[0],)
         )
-        """,
-        (datetime.now(), user, user)
-    )
-    conn.commit()
-    conn.close()
 
 
-def list_connections(args):
-    # Asegurarse de que la base de datos de conexiones esté creada
-    create_connections_db()
+def rebuild_monthly_usage(args=None):
+    """Recalcula el resumen mensual a partir de todas las conexiones"""
+    with _transaction(connections_db()) as conn:
+        _rebuild_monthly_usage(conn)
 
-    # Conectarse a la base de datos
-    conn = sqlite3.connect(CONNECTIONS_DB)
-    cursor = conn.cursor()
 
-    # Ejecutar la consulta para obtener los datos de las conexiones
+def monthly_usage(args=None):
+    """
+    Returns:
+        list: Tuplas ``(user, month, total_seconds, sessions)``, con ``month``
+        como ``YYYY-MM``. Los usuarios salen en el orden de su primera
+        conexión cerrada, como en el resumen original, y sus meses del más
+        reciente al más antiguo.
+    """
+    cursor = connections_db().cursor()
+    # La primera conexión de cada usuario sale del índice (user, inicio_ts)
     cursor.execute(
         """
-        SELECT user, fecha_inicio_sesion, fecha_cierre_sesion
-        FROM connections
-        ORDER BY fecha_inicio_sesion
+        SELECT user, month, total_seconds, sessions
+        FROM monthly_usage
+        ORDER BY (
+            SELECT MIN(inicio_ts) FROM connections
+            WHERE connections.user = monthly_usage.user AND cierre_ts IS NOT NULL
+        ), month DESC
         """
     )
+    return cursor.fetchall()
 
-    # Obtener todos los registros y almacenarlos en una lista
-    connections = cursor.fetchall()
 
-    # Cerrar la conexión a la base de datos
-    conn.close()
+def _month_range(year, month):
+    """Inicio y fin (excluido) del mes en hora local, como epoch"""
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return int(start.timestamp()), int(end.timestamp())
 
-    # Devolver los registros obtenidos
-    return connections
 
+def _range_filter(start=None, end=None, user=None):
+    """Cláusula WHERE y parámetros para las conexiones iniciadas en ``[start, end)``"""
+    conditions = []
+    params = []
+    if user is not None:
+        conditions.append("user = ?")
+        params.append(user)
+    if start is not None:
+        conditions.append("inicio_ts >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("inicio_ts < ?")
+        params.append(end)
 
-def list_connections_current_month(args):
-    # Asegurarse de que la base de datos de conexiones esté creada
-    create_connections_db()
+    return "WHERE " + " AND ".join(conditions) if conditions else "", params
 
-    # Conectarse a la base de datos
-    conn = sqlite3.connect(CONNECTIONS_DB)
-    cursor = conn.cursor()
 
-    # Obtener el mes y año actual
-    current_date = datetime.now()
-    current_month = current_date.month
-    current_year = current_date.year
+# Fecha tal como se muestra: sin los microsegundos, o "N/A" si no hay
+_DISPLAY_DATE = "COALESCE(substr({0}, 1, instr({0} || '.', '.') - 1), 'N/A')"
 
-    # Ejecutar la consulta para obtener los datos de las conexiones del mes actual
-    cursor.execute(
+
+def iter_connections_between(start=None, end=None, user=None):
+    """
+    Como :func:`list_connections_between`, pero devuelve el cursor para
+    recorrer las filas a medida que se leen, con las fechas ya preparadas
+    para mostrarlas (sin microsegundos, "N/A" si no hay)
+    """
+    where, params = _range_filter(start, end, user)
+    return connections_db().execute(
         """
-        SELECT user, fecha_inicio_sesion, fecha_cierre_sesion
+        SELECT user, {}, {}
         FROM connections
-        WHERE strftime('%m', fecha_inicio_sesion) = ? AND strftime('%Y', fecha_inicio_sesion) = ?
-        ORDER BY fecha_inicio_sesion
-        """,
-        (f'{current_month:02}', str(current_year))
+        {}
+        ORDER BY inicio_ts
+        """.format(
+            _DISPLAY_DATE.format("fecha_inicio_sesion"),
+            _DISPLAY_DATE.format("fecha_cierre_sesion"),
+            where,
+        ),
+        params,
     )
 
-    # Obtener todos los registros y almacenarlos en una lista
-    connections = cursor.fetchall()
 
-    # Cerrar la conexión a la base de datos
-    conn.close()
+def connections_column_widths(start=None, end=None, user=None):
+    """
+    Ancho máximo de cada columna de :func:`iter_connections_between`
+
+    Returns:
+        tuple: Los tres anchos, o None si no hay conexiones en el rango.
+    """
+    where, params = _range_filter(start, end, user)
+    rec = connections_db().execute(
+        """
+        SELECT COUNT(*), MAX(LENGTH(user)), MAX(LENGTH({})), MAX(LENGTH({}))
+        FROM connections
+        {}
+        """.format(
+            _DISPLAY_DATE.format("fecha_inicio_sesion"),
+            _DISPLAY_DATE.format("fecha_cierre_sesion"),
+            where,
+        ),
+        params,
+    ).fetchone()
+    if not rec[0]:
+        return None
+    return tuple(width or 0 for width in rec[1:])
+
+
+# Columnas de :func:`iter_connections_export`
+EXPORT_COLUMNS = ("user", "inicio", "cierre", "inicio_ts", "cierre_ts", "duracion")
+
+
+def iter_connections_export(start=None, end=None, user=None):
+    """
+    Cursor con las conexiones iniciadas en ``[start, end)`` para exportarlas
+
+    Cada fila tiene las columnas de ``EXPORT_COLUMNS``: las fechas en hora
+    local (``YYYY-MM-DD HH:MM:SS``), los epoch y la duración en segundos
+    (None si la conexión sigue abierta).
+    """
+    where, params = _range_filter(start, end, user)
+    return connections_db().execute(
+        """
+        SELECT
+            user,
+            datetime(inicio_ts, 'unixepoch', 'localtime'),
+            datetime(cierre_ts, 'unixepoch', 'localtime'),
+            inicio_ts,
+            cierre_ts,
+            cierre_ts - inicio_ts
+        FROM connections
+        {}
+        ORDER BY inicio_ts
+        """.format(where),
+        params,
+    )
 
-    # Devolver los registros obtenidos
-    return connections
 
+def list_connections_between(start=None, end=None, user=None):
+    """
+    Conexiones iniciadas en ``[start, end)`` (epoch), opcionalmente de un usuario
 
-def list_connections_last_month(args):
-    # Asegurarse de que la base de datos de conexiones esté creada
-    create_connections_db()
+    Returns:
+        list: Tuplas ``(user, fecha_inicio_sesion, fecha_cierre_sesion)``
+        ordenadas por inicio.
+    """
+    where, params = _range_filter(start, end, user)
+    cursor = connections_db().cursor()
+    cursor.execute(
+        """
+        SELECT user, fecha_inicio_sesion, fecha_cierre_sesion
+        FROM connections
+        {}
+        ORDER BY inicio_ts
+        """.format(where),
+        params,
+    )
+    return cursor.fetchall()
 
-    # Conectarse a la base de datos
-    conn = sqlite3.connect(CONNECTIONS_DB)
-    cursor = conn.cursor()
 
+def current_month_range():
+    # Obtener el mes y año actual
+    current_date = datetime.now()
+
+    return _month_range(current_date.year, current_date.month)
+
+
+def last_month_range():
     # Obtener el mes y año actual
     current_date = datetime.now()
     current_month = current_date.month
@@ -242,22 +536,17 @@ def list_connections_last_month(args):
         past_month = current_month - 1
         past_year = current_year
 
-    # Ejecutar la consulta para obtener los datos de las conexiones del mes anterior
-    cursor.execute(
-        """
-        SELECT user, fecha_inicio_sesion, fecha_cierre_sesion
-        FROM connections
-        WHERE strftime('%m', fecha_inicio_sesion) = ? AND strftime('%Y', fecha_inicio_sesion) = ?
-        ORDER BY fecha_inicio_sesion
-        """,
-        (f'{past_month:02}', str(past_year))
-    )
+    return _month_range(past_year, past_month)
+
+
+def list_connections(args):
+    # Todas las conexiones, ordenadas por inicio
+    return list_connections_between()
 
-    # Obtener todos los registros y almacenarlos en una lista
-    connections = cursor.fetchall()
 
-    # Cerrar la conexión a la base de datos
-    conn.close()
+def list_connections_current_month(args):
+    return list_connections_between(*current_month_range())
 
-    # Devolver los registros obtenidos
-    return connections
\ No newline at end of file
+
+def list_connections_last_month(args):
+    return list_connections_between(*last_month_range())
@@ -0,0 +1,274 @@
+"""
+Medición de la latencia de cada fase del inicio y cierre de sesión
+
+El código de nautapy marca sus fases con :func:`span` (bloques ``with``) o
+con el decorador :func:`traced`. Mientras no se llame a :func:`enable`, la
+medición está desactivada y ambas cuestan solo una comprobación de una
+variable global.
+
+Las fases medidas se pueden exportar como líneas JSON (una por fase) o
+como un fichero de texto para el *textfile collector* de Prometheus, que
+acumula un histograma por fase entre ejecuciones.
+
+Example:
+    tracer = tracing.enable()
+    NautaClient(user, password).login()
+    tracer.write_jsonl("fases.jsonl")
+    tracer.write_prometheus("/var/lib/node_exporter/nautapy.prom")
+"""
+
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from nautapy.utils import write_text_atomic
+
+# Límites superiores (segundos) de los buckets del histograma de Prometheus
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+METRIC_PREFIX = "nautapy_span"
+
+_tracer = None
+
+
+class _NoopSpan(object):
+    """Fase que no mide nada, usada mientras la medición está desactivada"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span(object):
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self.name)
+        self.start = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        duration = time.perf_counter() - self._started
+        self.tracer._stack().pop()
+        record = {
+            "name": self.name,
+            "start": self.start,
+            "duration": duration,
+            "parent": self.parent,
+            "pid": os.getpid(),
+            "error": exc_type.__name__ if exc_type else None,
+        }
+        record.update(self.attrs)
+        self.tracer.record(record)
+        return False
+
+    def set(self, **attrs):
+        """Añade atributos conocidos solo durante la fase"""
+        self.attrs.update(attrs)
+
+
+class Tracer(object):
+    """Guarda en memoria las fases medidas de este proceso"""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def span(self, name, **attrs):
+        return _Span(self, name, attrs)
+
+    def record(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+    def write_jsonl(self, path):
+        """
+        Añade las fases a ``path`` en formato JSON Lines
+
+        Args:
+            path: Fichero de salida, ``"-"`` para stderr.
+        """
+        lines = "".join(json.dumps(record) + "\n" for record in self.spans)
+        if path == "-":
+            sys.stderr.write(lines)
+            return
+
+        with open(path, "a") as fp:
+            fp.write(lines)
+
+    def write_prometheus(self, path):
+        """
+        Acumula las fases en el fichero de texto de Prometheus ``path``
+
+        Los histogramas y contadores que ya hubiera en el fichero se suman a
+        los de este proceso; la duración de la última ejecución de cada fase
+        se sobrescribe. El fichero se reemplaza de forma atómica.
+        """
+        stats = _read_prometheus(path)
+        for record in self.spans:
+            _add_sample(stats, record["name"], record["duration"], record["error"])
+
+        write_text_atomic(path, _format_prometheus(stats))
+
+
+def _new_stats():
+    return {
+        "buckets": [0] * len(BUCKETS),
+        "sum": 0.0,
+        "count": 0,
+        "errors": 0,
+        "last": 0.0,
+    }
+
+
+def _add_sample(stats, name, duration, error=None):
+    entry = stats.setdefault(name, _new_stats())
+    for i, bound in enumerate(BUCKETS):
+        if duration <= bound:
+            entry["buckets"][i] += 1
+    entry["sum"] += duration
+    entry["count"] += 1
+    entry["errors"] += 1 if error else 0
+    entry["last"] = float(duration)
+
+
+_re_sample = re.compile(
+    r'^' + METRIC_PREFIX + r'_(?P<metric>\w+)\{span="(?P<span>[^"]*)"(?:,le="(?P<le>[^"]+)")?\} (?P<value>\S+)$'
+)
+
+_BUCKET_LABELS = ["{:g}".format(bound) for bound in BUCKETS]
+
+
+def _read_prometheus(path):
+    """Lee los valores de un fichero escrito por :meth:`Tracer.write_prometheus`"""
+    stats = {}
+    try:
+        with open(path) as fp:
+            lines = fp.read().splitlines()
+    except FileNotFoundError:
+        return stats
+
+    for line in lines:
+        match = _re_sample.match(line)
+        if not match:
+            continue
+
+        entry = stats.setdefault(match["span"], _new_stats())
+        metric, value = match["metric"], float(match["value"])
+        if metric == "duration_seconds_bucket" and match["le"] in _BUCKET_LABELS:
+            entry["buckets"][_BUCKET_LABELS.index(match["le"])] = int(value)
+        elif metric == "duration_seconds_sum":
+            entry["sum"] = value
+        elif metric == "duration_seconds_count":
+            entry["count"] = int(value)
+        elif metric == "errors_total":
+            entry["errors"] = int(value)
+        elif metric == "last_duration_seconds":
+            entry["last"] = value
+
+    return stats
+
+
+def _format_prometheus(stats):
+    names = sorted(stats)
+    lines = [
+        "# HELP {}_duration_seconds Duración de las fases de nautapy".format(METRIC_PREFIX),
+        "# TYPE {}_duration_seconds histogram".format(METRIC_PREFIX),
+    ]
+    for name in names:
+        entry = stats[name]
+        for label, count in zip(_BUCKET_LABELS, entry["buckets"]):
+            lines.append('{}_duration_seconds_bucket{{span="{}",le="{}"}} {}'.format(
+                METRIC_PREFIX, name, label, count
+            ))
+        lines.append('{}_duration_seconds_bucket{{span="{}",le="+Inf"}} {}'.format(
+            METRIC_PREFIX, name, entry["count"]
+        ))
+        lines.append('{}_duration_seconds_sum{{span="{}"}} {!r}'.format(METRIC_PREFIX, name, entry["sum"]))
+        lines.append('{}_duration_seconds_count{{span="{}"}} {}'.format(METRIC_PREFIX, name, entry["count"]))
+
+    lines += [
+        "# HELP {}_errors_total Fases que terminaron con una excepción".format(METRIC_PREFIX),
+        "# TYPE {}_errors_total counter".format(METRIC_PREFIX),
+    ]
+    for name in names:
+        lines.append('{}_errors_total{{span="{}"}} {}'.format(METRIC_PREFIX, name, stats[name]["errors"]))
+
+    lines += [
+        "# HELP {}_last_duration_seconds Duración de la última ejecución de cada fase".format(METRIC_PREFIX),
+        "# TYPE {}_last_duration_seconds gauge".format(METRIC_PREFIX),
+    ]
+    for name in names:
+        lines.append('{}_last_duration_seconds{{span="{}"}} {!r}'.format(METRIC_PREFIX, name, stats[name]["last"]))
+
+    return "\n".join(lines) + "\n"
+
+
+def enable(tracer=None):
+    """Activa la medición y devuelve el :class:`Tracer` que la recoge"""
+    global _tracer
+    _tracer = tracer or Tracer()
+    return _tracer
+
+
+def disable():
+    global _tracer
+    _tracer = None
+
+
+def get_tracer():
+    """El :class:`Tracer` activo, o None si la medición está desactivada"""
+    return _tracer
+
+
+def span(name, **attrs):
+    """
+    Bloque ``with`` que mide la fase ``name``
+
+    Los ``attrs`` se añaden al registro de la fase en JSON.
+    """
+    if _tracer is None:
+        return _NOOP_SPAN
+    return _tracer.span(name, **attrs)
+
+
+def traced(name):
+    """Decorador que mide cada llamada a la función como la fase ``name``"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _tracer.span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -1,4 +1,12 @@
+import json
+import os
 import re
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 from nautapy.exceptions import NautaFormatException
 
@@ -30,3 +38,93 @@ def val_or_error(callback):
         return callback()
     except Exception as ex:
         return ex.args[0]
+
+
+def table_row(row, widths):
+    """Fila de una tabla de texto con columnas de ``widths`` caracteres"""
+    return "| " + " | ".join(str(value).ljust(width) for value, width in zip(row, widths)) + " |"
+
+
+def table_separator(widths):
+    return "+" + "+".join("-" * (width + 2) for width in widths) + "+"
+
+
+def format_table(headers, rows, row_separators=False):
+    """
+    Tabla de texto con ``headers`` y ``rows``, con el ancho de cada columna
+    ajustado a su valor más largo
+
+    Args:
+        row_separators: Si es True, se pone un separador tras cada fila y no
+            solo tras los encabezados.
+    """
+    widths = [
+        max(len(str(row[i])) for row in rows + [headers])
+        for i in range(len(headers))
+    ]
+    separator = table_separator(widths)
+
+    lines = [table_row(headers, widths), separator]
+    for row in rows:
+        lines.append(table_row(row, widths))
+        if row_separators:
+            lines.append(separator)
+    return "\n".join(lines)
+
+
+def ensure_parent_dir(path):
+    """Crea, si no existe, el directorio en el que se va a escribir ``path``"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+@contextmanager
+def file_lock(lock_path):
+    """Cerrojo exclusivo entre procesos sobre ``lock_path`` (sin efecto en Windows)"""
+    if fcntl is None:
+        yield
+        return
+
+    ensure_parent_dir(lock_path)
+    with open(lock_path, "a") as fp:
+        fcntl.flock(fp, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fp, fcntl.LOCK_UN)
+
+
+def write_text_atomic(path, text):
+    """
+    Escribe ``text`` en ``path`` de forma atómica
+
+    Se escribe primero a un fichero temporal en el mismo directorio y luego
+    se renombra, así un lector nunca ve el fichero a medio escribir. Cada
+    escritura usa su propio temporal, así que se puede llamar desde varios
+    hilos a la vez, y se vuelca a disco antes de renombrarlo para que un
+    corte no deje el fichero vacío.
+    """
+    import tempfile
+
+    ensure_parent_dir(path)
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path) or "."
+    )
+    try:
+        with os.fdopen(fd, "w") as fp:
+            fp.write(text)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json_atomic(path, data):
+    """Escribe ``data`` como JSON en ``path`` de forma atómica"""
+    write_text_atomic(path, json.dumps(data))
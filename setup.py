@@ -51,6 +51,9 @@ setup(
     keywords="nauta portal cautivo",
     packages=find_packages(),
     install_requires=get_requirements(),
+    extras_require={
+        "async": get_requirements("async.txt"),
+    },
     entry_points={
         "console_scripts": [about["__cli__"] + "=nautapy.cli:main"],
     },
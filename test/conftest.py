@@ -0,0 +1,42 @@
+import pytest
+
+import nautapy.nauta_api as nauta_api
+import nautapy.remaining_time as remaining_time
+from nautapy.nauta_api import NautaProtocol
+from test.portal_server import PortalServer
+
+USER = "pepe@nauta.com.cu"
+PASSWORD = "secreto"
+
+
+@pytest.fixture(autouse=True)
+def session_file(tmp_path, monkeypatch):
+    """Fichero de sesión temporal, sin escribir en las BD de nautapy ni buscar openvpn"""
+    session_file = str(tmp_path / "nauta-session")
+    monkeypatch.setattr(nauta_api, "NAUTA_SESSION_FILE", session_file)
+    monkeypatch.setattr(nauta_api, "save_logout", lambda user: None)
+    monkeypatch.setattr(nauta_api, "save_balances", lambda balances: None)
+    monkeypatch.setattr(remaining_time, "REMAINING_TIME_FILE", str(tmp_path / "remaining-time"))
+    monkeypatch.setattr(NautaProtocol, "check_if_process_running",
+                        classmethod(lambda cls, name: False))
+    return session_file
+
+
+@pytest.fixture()
+def portal_accounts():
+    return {USER: PASSWORD}
+
+
+@pytest.fixture()
+def portal_options():
+    return {"time_left": 7200}
+
+
+@pytest.fixture()
+def portal(portal_accounts, portal_options):
+    """Portal simulado (:class:`PortalServer`) al que apunta nauta_api durante la prueba"""
+    original = (nauta_api.PORTAL_URL, nauta_api.CHECK_PAGE, nauta_api.NO_CONTENT_PAGE)
+    with PortalServer(portal_accounts, **portal_options) as server:
+        nauta_api.set_portal(server.url, server.check_page, server.no_content_page)
+        yield server
+    nauta_api.set_portal(*original)
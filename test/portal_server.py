@@ -0,0 +1,450 @@
+"""
+Simulador local del portal cautivo de ETECSA
+
+Reproduce el flujo que espera :class:`nautapy.nauta_api.NautaProtocol` con
+las páginas grabadas de ``test/assets``:
+
+- ``GET /``: página de entrada (``CMCCWLANFORM``).
+- ``POST /``: página de inicio de sesión con ``form#formulario``, un CSRFHW
+  nuevo y la cookie ``JSESSIONID``.
+- ``POST //LoginServlet``: con credenciales válidas redirige a
+  ``/web/online.do``, que devuelve la página con el ``ATTRIBUTE_UUID``. Con
+  credenciales incorrectas devuelve la página con ``alert(...)``, y con un
+  CSRFHW o cookie desconocidos la página de inicio de sesión sin mensaje.
+- ``POST /LogoutServlet``: ``logoutcallback('SUCCESS')`` o ``'FAILURE'``.
+- ``POST /EtecsaQueryServlet``: con ``op=getLeftTime`` el tiempo restante;
+  sin ``op`` la tabla ``#sessioninfo`` con el crédito.
+- ``GET /check`` y ``GET /generate_204``: páginas de comprobación de
+  conexión, interceptadas (redirección al portal) si no hay sesión abierta.
+
+Con ``faults`` se inyectan fallos (ver :class:`Fault`): latencia, conexiones
+cortadas, cuerpos lentos, errores HTTP y fallos de login con ``alert(...)``.
+
+Uso::
+
+    with PortalServer(accounts={"pepe@nauta.com.cu": "secreto"}) as portal:
+        nauta_api.set_portal(portal.url, portal.check_page, portal.no_content_page)
+        ...
+
+o desde la línea de comandos (``python -m test.portal_server``), con las
+variables de entorno ``NAUTAPY_PORTAL_URL``, ``NAUTAPY_CHECK_PAGE`` y
+``NAUTAPY_NO_CONTENT_PAGE`` que se muestran al arrancar.
+"""
+
+import argparse
+import os
+import random
+import secrets
+import socket
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+_assets_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+
+ORIGINAL_PORTAL_URL = "https://secure.etecsa.net:8443"
+
+# Valores de las páginas grabadas que el simulador sustituye
+_ASSET_CSRFHW = "1fe3ee0634195096337177a0994723fb"
+_ASSET_LOGGED_IN_CSRFHW = "61cf73483775cf865a0fdf4640990e45"
+_ASSET_ATTRIBUTE_UUID = "B2F6AAB9A9868BABC0BDC6B7A235ABE2"
+
+
+def read_asset(asset_name):
+    with open(os.path.join(_assets_dir, asset_name)) as fp:
+        return fp.read()
+
+
+FAULT_KINDS = ("latency", "drop", "slow_body", "error", "alert")
+
+
+class Fault(object):
+    """
+    Fallo a inyectar en las peticiones a una ruta
+
+    Args:
+        kind: Uno de ``FAULT_KINDS``:
+
+            - ``latency``: espera ``delay`` segundos antes de responder.
+            - ``drop``: cierra la conexión sin responder.
+            - ``slow_body``: envía el cuerpo en trozos de ``chunk_size``
+              bytes, esperando ``delay`` segundos entre ellos.
+            - ``error``: responde con el código ``status``.
+            - ``alert``: el login falla con un ``alert(...)`` del portal.
+
+        route: Ruta afectada (p. ej. ``/LogoutServlet``), None para todas.
+        times: Cuántas veces se inyecta, None para siempre.
+        probability: Probabilidad de inyectarlo en cada petición.
+    """
+
+    def __init__(
+            self,
+            kind,
+            route=None,
+            times=None,
+            probability=1.0,
+            delay=0.5,
+            status=503,
+            chunk_size=256,
+    ):
+        if kind not in FAULT_KINDS:
+            raise ValueError("Tipo de fallo desconocido: {}".format(kind))
+
+        self.kind = kind
+        self.route = route
+        self.times = times
+        self.probability = probability
+        self.delay = delay
+        self.status = status
+        self.chunk_size = chunk_size
+        self.injected = 0
+
+    def matches(self, route, rnd):
+        if self.route is not None and self.route != route:
+            return False
+        if self.times is not None and self.injected >= self.times:
+            return False
+        return rnd.random() < self.probability
+
+    @classmethod
+    def parse(cls, spec):
+        """
+        Crea un fallo a partir de ``tipo[:ruta[:veces[:parámetro]]]``
+
+        El parámetro es el retardo en segundos para ``latency`` y
+        ``slow_body``, y el código HTTP para ``error``. Por ejemplo
+        ``drop:/LogoutServlet:2`` o ``error:/LoginServlet:1:500``.
+        """
+        kind, route, times, param = (spec.split(":") + [""] * 3)[:4]
+        kwargs = {}
+        if param:
+            if kind == "error":
+                kwargs["status"] = int(param)
+            else:
+                kwargs["delay"] = float(param)
+        return cls(kind, route=route or None, times=int(times) if times else None, **kwargs)
+
+
+class PortalState(object):
+    """
+    Estado del portal simulado
+
+    Args:
+        accounts: Dict ``{usuario: contraseña}``.
+        time_left: Segundos disponibles de cada cuenta.
+        credit: Texto del crédito de cada cuenta.
+        faults: Lista de :class:`Fault` a inyectar.
+        seed: Semilla para los fallos con ``probability``.
+    """
+
+    def __init__(self, accounts, time_left=3600, credit="12,34 CUP", faults=(), seed=0):
+        self.accounts = dict(accounts)
+        self.time_left = {user: time_left for user in accounts}
+        self.credit = credit
+        # CSRFHW emitidos -> JSESSIONID con el que se emitieron
+        self.tokens = {}
+        # ATTRIBUTE_UUID -> (usuario, inicio)
+        self.online = {}
+        self.requests = []
+        self.faults = list(faults)
+        self.lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    def take_faults(self, route):
+        """Fallos a inyectar en esta petición (y los cuenta como inyectados)"""
+        with self.lock:
+            faults = [fault for fault in self.faults if fault.matches(route, self._random)]
+            for fault in faults:
+                fault.injected += 1
+        return faults
+
+    @property
+    def is_online(self):
+        return bool(self.online)
+
+    def left_time(self, user):
+        with self.lock:
+            left = self.time_left.get(user, 0)
+            for uuid, (online_user, started) in self.online.items():
+                if online_user == user:
+                    left -= int(time.time() - started)
+        left = max(0, left)
+        return "{:02d}:{:02d}:{:02d}".format(left // 3600, left % 3600 // 60, left % 60)
+
+
+class PortalHandler(BaseHTTPRequestHandler):
+    # Keep-alive, como el portal real
+    protocol_version = "HTTP/1.1"
+    # Cabeceras y cuerpo se escriben por separado: sin TCP_NODELAY el
+    # algoritmo de Nagle añadiría ~40 ms a cada respuesta
+    disable_nagle_algorithm = True
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        pass
+
+    def _route(self):
+        # El formulario real apunta a "//LoginServlet"
+        return "/" + urlsplit(self.path).path.lstrip("/")
+
+    def _params(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8") if length else ""
+        params = parse_qs(urlsplit(self.path).query)
+        params.update(parse_qs(body))
+        return {key: values[-1] for key, values in params.items()}
+
+    def _cookie(self, name):
+        for part in (self.headers.get("Cookie") or "").split(";"):
+            key, _, value = part.strip().partition("=")
+            if key == name:
+                return value
+        return None
+
+    def _send(self, status, body="", content_type="text/html; charset=UTF-8", headers=None):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        if not self._slow_body:
+            self.wfile.write(data)
+            return
+
+        chunk_size, delay = self._slow_body
+        for i in range(0, len(data), chunk_size):
+            time.sleep(delay)
+            self.wfile.write(data[i:i + chunk_size])
+
+    def _page(self, asset_name, **replacements):
+        html = read_asset(asset_name).replace(ORIGINAL_PORTAL_URL, self.server.url)
+        for old, new in replacements.items():
+            html = html.replace(old, new)
+        return html
+
+    def _redirect_to_portal(self):
+        self._send(302, headers={"Location": self.server.url + "/"})
+
+    def _inject_faults(self, route):
+        """
+        Aplica los fallos de esta petición
+
+        Returns:
+            bool: True si la petición ya quedó resuelta por un fallo.
+        """
+        self._slow_body = None
+        for fault in self.state.take_faults(route):
+            if fault.kind == "latency":
+                time.sleep(fault.delay)
+            elif fault.kind == "slow_body":
+                self._slow_body = (fault.chunk_size, fault.delay)
+            elif fault.kind == "drop":
+                self.close_connection = True
+                self.connection.shutdown(socket.SHUT_RDWR)
+                return True
+            elif fault.kind == "error":
+                self._params()
+                self._send(fault.status, "Error {}".format(fault.status))
+                return True
+            elif fault.kind == "alert" and route == "/LoginServlet":
+                self._params()
+                self._send(200, self._page("login_failed.html"))
+                return True
+        return False
+
+    def do_GET(self):
+        route = self._route()
+        self.state.requests.append(("GET", route))
+        if self._inject_faults(route):
+            return
+
+        if route == "/":
+            self._send(200, self._page("landing.html"))
+        elif route == "/web/online.do":
+            params = self._params()
+            self._send(200, self._page(
+                "logged_in.html",
+                **{
+                    _ASSET_ATTRIBUTE_UUID: params.get("uuid", ""),
+                    _ASSET_LOGGED_IN_CSRFHW: params.get("CSRFHW", ""),
+                }
+            ))
+        elif route == "/check":
+            if self.state.is_online:
+                self._send(200, "<html><body>Cubadebate</body></html>")
+            else:
+                self._redirect_to_portal()
+        elif route == "/generate_204":
+            if self.state.is_online:
+                self._send(204)
+            else:
+                self._redirect_to_portal()
+        else:
+            self._send(404, "Not Found")
+
+    def do_POST(self):
+        route = self._route()
+        self.state.requests.append(("POST", route))
+        if self._inject_faults(route):
+            return
+        params = self._params()
+
+        if route == "/":
+            self._login_page()
+        elif route == "/LoginServlet":
+            self._login(params)
+        elif route == "/LogoutServlet":
+            self._logout(params)
+        elif route == "/EtecsaQueryServlet":
+            self._query(params)
+        else:
+            self._send(404, "Not Found")
+
+    def _login_page(self):
+        session_id = self._cookie("JSESSIONID") or secrets.token_hex(16).upper()
+        csrfhw = secrets.token_hex(16)
+        with self.state.lock:
+            self.state.tokens[csrfhw] = session_id
+
+        self._send(
+            200,
+            self._page("login_page.html", **{_ASSET_CSRFHW: csrfhw}),
+            headers={"Set-Cookie": "JSESSIONID={}; Path=/".format(session_id)},
+        )
+
+    def _login(self, params):
+        csrfhw = params.get("CSRFHW")
+        with self.state.lock:
+            session_id = self.state.tokens.get(csrfhw)
+            if not session_id or session_id != self._cookie("JSESSIONID"):
+                # El portal no reconoce la sesión: vuelve al formulario sin explicación
+                valid = None
+            else:
+                user = params.get("username")
+                valid = self.state.accounts.get(user) == params.get("password")
+                if valid:
+                    del self.state.tokens[csrfhw]
+                    uuid = secrets.token_hex(16).upper()
+                    self.state.online[uuid] = (user, time.time())
+
+        if valid is None:
+            self._send(200, self._page("login_page.html", **{_ASSET_CSRFHW: csrfhw or ""}))
+        elif not valid:
+            self._send(200, self._page("login_failed.html", **{_ASSET_CSRFHW: csrfhw}))
+        else:
+            self._send(302, headers={
+                "Location": "{}/web/online.do?uuid={}&CSRFHW={}".format(
+                    self.server.url, uuid, csrfhw
+                )
+            })
+
+    def _logout(self, params):
+        with self.state.lock:
+            online = self.state.online.get(params.get("ATTRIBUTE_UUID"))
+            if online and online[0] == params.get("username"):
+                del self.state.online[params["ATTRIBUTE_UUID"]]
+                user, started = online
+                self.state.time_left[user] -= int(time.time() - started)
+                result = "SUCCESS"
+            else:
+                result = "FAILURE"
+
+        self._send(200, "logoutcallback('{}');".format(result), "text/javascript")
+
+    def _query(self, params):
+        user = params.get("username")
+        if params.get("op") == "getLeftTime":
+            self._send(200, self.state.left_time(user), "text/plain")
+        elif self.state.accounts.get(user) == params.get("password"):
+            self._send(200, self._page("user_info.html").replace("12,34 CUP", self.state.credit))
+        else:
+            self._send(200, self._page("login_failed.html"))
+
+
+class PortalServer(ThreadingHTTPServer):
+    """
+    Portal simulado escuchando en ``127.0.0.1`` en un hilo aparte
+
+    Args:
+        accounts: Dict ``{usuario: contraseña}`` de las cuentas válidas.
+        port: Puerto donde escuchar (0 para uno libre).
+        certfile: Certificado (con la clave) para servir por HTTPS.
+        **state_kwargs: Opciones de :class:`PortalState` (p. ej. ``faults``).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, accounts, port=0, certfile=None, **state_kwargs):
+        super().__init__(("127.0.0.1", port), PortalHandler)
+        self.state = PortalState(accounts, **state_kwargs)
+        scheme = "http"
+        if certfile:
+            context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            context.load_cert_chain(certfile)
+            self.socket = context.wrap_socket(self.socket, server_side=True)
+            scheme = "https"
+
+        self.url = "{}://127.0.0.1:{}".format(scheme, self.server_address[1])
+        self.check_page = self.url + "/check"
+        self.no_content_page = self.url + "/generate_204"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador local del portal de ETECSA")
+    parser.add_argument("-p", "--port", type=int, default=8443)
+    parser.add_argument("--certfile", help="Certificado y clave (PEM) para servir por HTTPS")
+    parser.add_argument(
+        "-f",
+        "--fault",
+        action="append",
+        default=[],
+        type=Fault.parse,
+        metavar="TIPO[:RUTA[:VECES[:PARÁMETRO]]]",
+        help="Fallo a inyectar ({}), se puede repetir".format(", ".join(FAULT_KINDS)),
+    )
+    parser.add_argument(
+        "accounts", nargs="+", metavar="USUARIO:CONTRASEÑA", help="Cuentas válidas"
+    )
+    args = parser.parse_args()
+
+    accounts = dict(account.split(":", 1) for account in args.accounts)
+    server = PortalServer(accounts, port=args.port, certfile=args.certfile, faults=args.fault)
+    print("NAUTAPY_PORTAL_URL={}".format(server.url))
+    print("NAUTAPY_CHECK_PAGE={}".format(server.check_page))
+    print("NAUTAPY_NO_CONTENT_PAGE={}".format(server.no_content_page))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
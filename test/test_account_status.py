@@ -0,0 +1,51 @@
+import pytest
+
+from nautapy.account_status import sweep
+from test.portal_server import Fault
+
+ACCOUNTS = {"user{}@nauta.com.cu".format(i): "secreto{}".format(i) for i in range(6)}
+
+
+@pytest.fixture()
+def portal_accounts():
+    return ACCOUNTS
+
+
+@pytest.fixture()
+def portal_options():
+    return {"time_left": 3600, "credit": "5,00 CUP"}
+
+
+def test_time_and_credit_of_every_account(portal):
+    results, _ = sweep(sorted(ACCOUNTS.items()), online=False)
+
+    assert [result.user for result in results] == sorted(ACCOUNTS)
+    for result in results:
+        assert result.ok
+        assert result.remaining_time == "01:00:00"
+        assert result.credit == "5,00 CUP"
+
+
+def test_credit_is_not_queried_while_online(portal):
+    results, _ = sweep(sorted(ACCOUNTS.items()), online=True)
+
+    assert all(result.credit is None for result in results)
+    assert all(route == "/EtecsaQueryServlet" for _, route in portal.state.requests)
+
+
+def test_queries_run_concurrently(portal):
+    portal.state.faults.append(Fault("latency", route="/EtecsaQueryServlet", delay=0.3))
+
+    results, elapsed = sweep(sorted(ACCOUNTS.items()), workers=6, online=True)
+
+    assert sum(result.latency for result in results) >= 6 * 0.3
+    assert elapsed < 2 * 0.3 + 0.5
+
+
+def test_timeout_and_errors_do_not_stop_the_sweep(portal):
+    portal.state.faults.append(Fault("latency", route="/EtecsaQueryServlet", times=1, delay=2))
+
+    results, _ = sweep(sorted(ACCOUNTS.items()), workers=1, timeout=0.3, online=True)
+
+    assert not results[0].ok
+    assert all(result.ok for result in results[1:])
@@ -0,0 +1,127 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+
+import nautapy.aio_nauta_api as aio_nauta_api
+from nautapy.aio_nauta_api import AsyncNautaClient, AsyncNautaProtocol
+from nautapy.nauta_api import NautaProtocol
+from nautapy.exceptions import NautaLoginException, NautaPreLoginException
+
+
+_assets_dir = os.path.join(
+    os.path.dirname(__file__),
+    "assets"
+)
+
+
+def read_asset(asset_name):
+    with open(os.path.join(_assets_dir, asset_name)) as fp:
+        return fp.read()
+
+
+LANDING_HTML = read_asset("landing.html")
+LOGIN_HTML = read_asset("login_page.html")
+LOGGED_IN_HTML = read_asset("logged_in.html")
+
+
+@pytest.fixture(autouse=True)
+def no_connection_log(monkeypatch):
+    # El fixture session_file de conftest solo cubre el cliente síncrono
+    monkeypatch.setattr(aio_nauta_api, "save_logout", lambda user: None)
+
+
+def set_connected(monkeypatch, connected):
+    # Las sondas de conectividad son las del cliente síncrono, no pasan por httpx
+    monkeypatch.setattr(NautaProtocol, "is_connected", classmethod(lambda cls: connected))
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    set_connected(monkeypatch, False)
+
+
+def portal_transport(login_ok=True):
+    requests_log = []
+
+    def handler(request):
+        requests_log.append((request.method, request.url.path))
+
+        if request.url.path == "/" and request.method == "GET":
+            return httpx.Response(200, text=LANDING_HTML)
+        if request.url.path == "/" and request.method == "POST":
+            return httpx.Response(200, text=LOGIN_HTML)
+        if request.url.path == "//LoginServlet":
+            if login_ok:
+                return httpx.Response(
+                    302, headers={"Location": "/online.do?fooo"}
+                )
+            return httpx.Response(
+                200, text='<script>alert("Usuario o password incorrectos")</script>'
+            )
+        if request.url.path == "/online.do":
+            return httpx.Response(200, text=LOGGED_IN_HTML)
+        if request.url.path == "/EtecsaQueryServlet":
+            return httpx.Response(200, text="01:02:03")
+        if request.url.path == "/LogoutServlet":
+            return httpx.Response(200, text="logoutcallback('SUCCESS');")
+
+        return httpx.Response(404)
+
+    return httpx.MockTransport(handler), requests_log
+
+
+def test_async_protocol_creates_valid_session():
+    async def run():
+        transport, log = portal_transport()
+        async with httpx.AsyncClient(transport=transport) as http_client:
+            session = await AsyncNautaProtocol.create_session(http_client)
+
+        assert session.login_action == "https://secure.etecsa.net:8443//LoginServlet"
+        assert session.csrfhw and session.wlanuserip
+        assert ("POST", "/") in log
+
+    asyncio.run(run())
+
+
+def test_async_protocol_create_session_raises_when_connected(monkeypatch):
+    set_connected(monkeypatch, True)
+
+    async def run():
+        transport, log = portal_transport()
+        async with httpx.AsyncClient(transport=transport) as http_client:
+            with pytest.raises(NautaPreLoginException):
+                await AsyncNautaProtocol.create_session(http_client)
+
+        assert log == []
+
+    asyncio.run(run())
+
+
+def test_async_client_login_and_logout_share_one_http_client(session_file):
+    async def run():
+        transport, log = portal_transport()
+        async with AsyncNautaClient("pepe@nauta.com.cu", "pass", transport=transport) as client:
+            http_client = client.http_client
+            await client.login()
+
+            assert client.is_logged_in
+            assert client.session.requests_session is http_client
+            assert await client.get_remaining_time() == "01:02:03"
+
+        assert not os.path.exists(session_file)
+        assert http_client.is_closed
+        assert ("POST", "/LogoutServlet") in log
+
+    asyncio.run(run())
+
+
+def test_async_client_login_failure_reports_reason():
+    async def run():
+        transport, _ = portal_transport(login_ok=False)
+        async with AsyncNautaClient("pepe@nauta.com.cu", "bad", transport=transport) as client:
+            with pytest.raises(NautaLoginException, match="incorrectos"):
+                await client.login()
+
+    asyncio.run(run())
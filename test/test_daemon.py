@@ -0,0 +1,130 @@
+import os
+import threading
+
+import pytest
+import requests
+from requests_mock import Mocker as RequestMocker
+
+import nautapy.nauta_api as nauta_api
+from nautapy import daemon_client
+from nautapy.daemon import DaemonServer, NautaDaemon
+from nautapy.daemon_client import RemoteNautaClient
+from nautapy.exceptions import NautaLoginException
+
+_assets_dir = os.path.join(
+    os.path.dirname(__file__),
+    "assets"
+)
+
+
+def read_asset(asset_name):
+    with open(os.path.join(_assets_dir, asset_name)) as fp:
+        return fp.read()
+
+
+PORTAL = "https://secure.etecsa.net:8443"
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    monkeypatch.setattr(nauta_api.NautaProtocol, "is_connected", classmethod(lambda cls: False))
+
+
+@pytest.fixture()
+def daemon(tmp_path):
+    path = str(tmp_path / "nauta.sock")
+    server = DaemonServer(NautaDaemon(), path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield daemon_client.connect(path)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture()
+def portal():
+    with RequestMocker() as mock:
+        mock.get(PORTAL, text=read_asset("landing.html"))
+        mock.post(PORTAL, text=read_asset("login_page.html"))
+        mock.post(PORTAL + "//LoginServlet", status_code=302,
+                  headers={"Location": "/online.do?x"})
+        mock.get(PORTAL + "/online.do?x", text="ATTRIBUTE_UUID=UUID1&CSRFHW=x")
+        mock.post(PORTAL + "/EtecsaQueryServlet", text="01:02:03")
+        mock.post(PORTAL + "/LogoutServlet", text="logoutcallback('SUCCESS');")
+        yield mock
+
+
+def test_connect_without_daemon_returns_none(tmp_path):
+    assert daemon_client.connect(str(tmp_path / "missing.sock")) is None
+
+
+def test_remote_client_session_lifecycle(daemon, portal, session_file):
+    client = RemoteNautaClient(daemon, "pepe@nauta.com.cu", "pass")
+
+    with client.login():
+        assert client.is_logged_in and os.path.exists(session_file)
+        assert client.remaining_time == "01:02:03"
+
+        other = RemoteNautaClient(daemon, None, None)
+        other.load_last_session()
+        assert other.session.username == "pepe@nauta.com.cu"
+        assert other.session.attribute_uuid == "UUID1"
+
+    assert not client.is_logged_in
+    assert portal.request_history[-1].url.startswith(PORTAL + "/LogoutServlet")
+
+
+def test_daemon_reuses_one_requests_session(daemon, portal, monkeypatch):
+    sessions = set()
+    # requests_mock sustituye Session.send: se sigue Session.request, que
+    # monkeypatch puede restaurar sin pisar al mock
+    request = requests.Session.request
+
+    def tracking_request(self, *args, **kwargs):
+        sessions.add(id(self))
+        return request(self, *args, **kwargs)
+
+    monkeypatch.setattr(requests.Session, "request", tracking_request)
+    client = RemoteNautaClient(daemon, "pepe@nauta.com.cu", "pass")
+    client.login()
+    client.remaining_time
+    client.logout()
+
+    assert len(sessions) == 1
+
+
+def test_remaining_time_without_session_keeps_shared_cookies(portal, session_file):
+    nauta_daemon = NautaDaemon()
+    nauta_daemon.requests_session.cookies.set_cookie(requests.cookies.create_cookie("JSESSIONID", "abc"))
+
+    assert nauta_daemon.handle({"op": "remaining_time", "user": "pepe@nauta.com.cu"}) == "01:02:03"
+    assert [cookie.value for cookie in nauta_daemon.requests_session.cookies] == ["abc"]
+    assert not os.path.exists(session_file)
+
+
+def test_cli_options_configure_the_daemon_client(portal):
+    nauta_daemon = NautaDaemon()
+    options = {"retry_deadline": 5, "login_retry_deadline": 2, "time_resync": 60}
+
+    nauta_daemon.handle(dict(op="login", user="pepe@nauta.com.cu", password="pass", **options))
+    client = nauta_daemon.client
+    assert (client.retry_policy.deadline, client.login_retry_policy.deadline) == (5, 2)
+    assert client.time_cache.resync_interval == 60
+
+    # Con --time-resync el tiempo restante se estima localmente
+    for _ in range(2):
+        assert nauta_daemon.handle(
+            dict(op="remaining_time", user="pepe@nauta.com.cu", **options)
+        ) in ("01:02:03", "01:02:02")
+    assert sum(request.path == "/etecsaqueryservlet" for request in portal.request_history) == 1
+
+    nauta_daemon.handle(dict(op="logout", user="pepe@nauta.com.cu", retry_deadline=0))
+    assert client.retry_policy.deadline == 0
+
+
+def test_daemon_errors_are_raised_in_client(daemon, portal):
+    portal.post(PORTAL + "//LoginServlet", text=read_asset("login_failed.html"))
+    client = RemoteNautaClient(daemon, "pepe@nauta.com.cu", "bad")
+
+    with pytest.raises(NautaLoginException, match="correctos"):
+        client.login()
@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from nautapy import export, sqlite_utils
+from nautapy.cli import export as export_cli
+
+
+def ts(*args):
+    return int(datetime(*args).timestamp())
+
+
+ROWS = [
+    ("pepe@nauta.com.cu", ts(2024, 3, 1, 10), ts(2024, 3, 1, 11, 30)),
+    ("juan@nauta.co.cu", ts(2024, 3, 2, 8), ts(2024, 3, 2, 8, 5)),
+    ("pepe@nauta.com.cu", ts(2024, 4, 1, 9), None),
+]
+
+
+@pytest.fixture(autouse=True)
+def connections(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_utils, "CONNECTIONS_DB", str(tmp_path / "connections.db"))
+    conn = sqlite_utils.connections_db()
+    with conn:
+        conn.executemany("INSERT INTO connections (user, inicio_ts, cierre_ts) VALUES (?, ?, ?)", ROWS)
+    yield
+    sqlite_utils.close_all()
+
+
+def test_export_rows():
+    rows = list(sqlite_utils.iter_connections_export())
+
+    assert rows[0] == (
+        "pepe@nauta.com.cu", "2024-03-01 10:00:00", "2024-03-01 11:30:00",
+        ROWS[0][1], ROWS[0][2], 5400,
+    )
+    assert rows[2][2] is None and rows[2][5] is None
+    assert len(list(sqlite_utils.iter_connections_export(user="juan@nauta.co.cu"))) == 1
+
+
+def test_csv_and_jsonl():
+    fp = io.StringIO()
+    assert export.export_csv(sqlite_utils.iter_connections_export(), fp) == 3
+    lines = list(csv.reader(io.StringIO(fp.getvalue())))
+    assert lines[0] == list(sqlite_utils.EXPORT_COLUMNS)
+    assert lines[2][:3] == ["juan@nauta.co.cu", "2024-03-02 08:00:00", "2024-03-02 08:05:00"]
+
+    fp = io.StringIO()
+    assert export.export_jsonl(sqlite_utils.iter_connections_export(), fp) == 3
+    records = [json.loads(line) for line in fp.getvalue().splitlines()]
+    assert records[2] == {
+        "user": "pepe@nauta.com.cu",
+        "inicio": "2024-04-01 09:00:00",
+        "cierre": None,
+        "inicio_ts": ROWS[2][1],
+        "cierre_ts": None,
+        "duracion": None,
+    }
+
+
+def test_columnar_round_trip():
+    fp = io.BytesIO()
+    assert export.export_columnar(sqlite_utils.iter_connections_export(), fp, block_size=2) == 3
+
+    fp.seek(0)
+    assert list(export.read_columnar(fp)) == list(sqlite_utils.iter_connections_export())
+
+
+def test_columnar_rejects_other_files():
+    with pytest.raises(ValueError):
+        list(export.read_columnar(io.BytesIO(b"user,inicio\n")))
+
+
+def test_cli_export_filters_by_date(tmp_path, capsys):
+    output = tmp_path / "marzo.jsonl"
+    export_cli(SimpleNamespace(
+        format="jsonl",
+        output=str(output),
+        since=datetime(2024, 3, 2),
+        until=datetime(2024, 3, 31),
+        user=None,
+    ))
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [record["user"] for record in records] == ["juan@nauta.co.cu"]
+    assert "1 conexiones exportadas" in capsys.readouterr().err
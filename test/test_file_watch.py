@@ -0,0 +1,66 @@
+import functools
+import threading
+import time
+
+import pytest
+
+from nautapy import cli
+from nautapy.file_watch import InotifyWatcher, PollingWatcher, watch_removal
+
+
+def remove_later(path, delay=0.1):
+    timer = threading.Timer(delay, path.unlink)
+    timer.start()
+    return timer
+
+
+@pytest.fixture()
+def session_file(tmp_path):
+    path = tmp_path / "nauta-session"
+    path.write_text("{}")
+    return path
+
+
+@pytest.mark.parametrize("watcher_class", [InotifyWatcher, functools.partial(PollingWatcher, interval=0.05)])
+def test_wait_removed(session_file, watcher_class):
+    with watcher_class(str(session_file)) as watcher:
+        assert not watcher.wait_removed(timeout=0.05)
+
+        remove_later(session_file)
+        started = time.monotonic()
+        assert watcher.wait_removed(timeout=5)
+
+    if watcher_class is InotifyWatcher:
+        # Sin esperar al siguiente sondeo
+        assert time.monotonic() - started < 0.5
+
+
+def test_changes_that_keep_the_file_do_not_wake_up(session_file):
+    with InotifyWatcher(str(session_file)) as watcher:
+        threading.Timer(0.05, session_file.write_text, ("{}",)).start()
+        assert not watcher.wait_removed(timeout=0.2)
+
+
+def test_missing_file_falls_back_to_polling(tmp_path):
+    watcher = watch_removal(str(tmp_path / "no" / "existe"))
+    assert isinstance(watcher, PollingWatcher)
+    assert watcher.wait_removed(timeout=0)
+
+
+def test_up_loop_ends_on_logout_from_another_process(session_file, capsys):
+    remove_later(session_file)
+
+    result = cli._wait_session_end(str(session_file), int(time.time()), refresh=0)
+
+    assert result == "logout"
+    assert capsys.readouterr().out == ""
+
+
+def test_up_loop_ends_at_deadline(session_file, capsys):
+    login_time = int(time.time())
+    result = cli._wait_session_end(
+        str(session_file), login_time, deadline=time.time() + 0.2, refresh=0.1
+    )
+
+    assert result == "deadline"
+    assert "Tiempo de conexión" in capsys.readouterr().out
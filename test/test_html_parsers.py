@@ -0,0 +1,107 @@
+import os
+
+import bs4
+import pytest
+
+from nautapy import html_parsers
+from nautapy.exceptions import NautaLoginException
+from nautapy.nauta_api import NautaProtocol
+
+
+_assets_dir = os.path.join(
+    os.path.dirname(__file__),
+    "assets"
+)
+
+
+def read_asset(asset_name):
+    with open(os.path.join(_assets_dir, asset_name)) as fp:
+        return fp.read()
+
+
+ASSETS = [
+    "landing.html",
+    "login_page.html",
+    "logged_in.html",
+    "login_failed.html",
+    "user_info.html",
+]
+
+CREDIT_SELECTOR = "#sessioninfo > tbody:nth-child(1) > tr:nth-child(2) > td:nth-child(2)"
+
+
+# Implementaciones de referencia con BeautifulSoup (las que usaba el protocolo)
+def bs4_inputs(soup):
+    return {
+        _["name"]: _.get("value", default=None)
+        for _ in soup.select("input[name]")
+    }
+
+
+@pytest.mark.parametrize("asset", ASSETS)
+def test_extract_inputs_matches_bs4(asset):
+    html = read_asset(asset)
+    soup = bs4.BeautifulSoup(html, "html.parser")
+
+    assert html_parsers.extract_inputs(html) == bs4_inputs(soup)
+
+
+@pytest.mark.parametrize("asset", ASSETS)
+def test_extract_form_matches_bs4(asset):
+    html = read_asset(asset)
+    form_soup = bs4.BeautifulSoup(html, "html.parser").find("form", id="formulario")
+
+    expected = form_soup and (form_soup["action"], bs4_inputs(form_soup))
+    assert html_parsers.extract_form(html, "formulario") == expected
+
+
+@pytest.mark.parametrize("asset", ASSETS)
+def test_extract_last_script_matches_bs4(asset):
+    html = read_asset(asset)
+    scripts = bs4.BeautifulSoup(html, "html.parser").find_all("script")
+
+    expected = scripts[-1].get_text() if scripts else None
+    assert html_parsers.extract_last_script(html) == expected
+
+
+@pytest.mark.parametrize("asset", ASSETS)
+def test_extract_credit_matches_bs4(asset):
+    html = read_asset(asset)
+    tag = bs4.BeautifulSoup(html, "html.parser").select_one(CREDIT_SELECTOR)
+
+    expected = tag.get_text() if tag else None
+    assert html_parsers.extract_child_path_text(
+        html, "sessioninfo", [("tbody", 1), ("tr", 2), ("td", 2)]
+    ) == expected
+
+
+@pytest.mark.parametrize("html", [
+    '<div id="sessioninfo"><tbody><tr><td>a</td><td>b<br>c</td></tr>'
+    '<tr><td>x</td><td><b>1,00</b> CUP<img src="x"></td></tr></tbody></div>',
+    '<table id="sessioninfo"><thead></thead><tbody><tr><td>a</td><td>b</td></tr>'
+    '<tr><td>x</td><td>y</td></tr></tbody></table>',
+    '<table id="sessioninfo"><tbody><tr><td>a</td></span><td>b</td></tr>'
+    '<tr><td>x</td><td>&aacute;</td></tr></tbody></table>',
+])
+def test_extract_child_path_edge_cases_match_bs4(html):
+    tag = bs4.BeautifulSoup(html, "html.parser").select_one(CREDIT_SELECTOR)
+
+    expected = tag.get_text() if tag else None
+    assert html_parsers.extract_child_path_text(
+        html, "sessioninfo", [("tbody", 1), ("tr", 2), ("td", 2)]
+    ) == expected
+
+
+def test_protocol_parses_recorded_pages():
+    action, data = NautaProtocol._parse_login_form(read_asset("login_page.html"))
+
+    assert action == "https://secure.etecsa.net:8443//LoginServlet"
+    assert data["CSRFHW"] == "1fe3ee0634195096337177a0994723fb"
+    assert data["wlanuserip"] == "10.190.20.96"
+    assert NautaProtocol._parse_user_credit(read_asset("user_info.html")) == "12,34 CUP"
+
+    with pytest.raises(NautaLoginException, match="contraseña correctos"):
+        NautaProtocol._parse_login_result(
+            "https://secure.etecsa.net:8443//LoginServlet",
+            read_asset("login_failed.html")
+        )
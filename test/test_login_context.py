@@ -0,0 +1,128 @@
+import os
+import time
+
+import pytest
+from requests_mock import Mocker as RequestMocker
+
+import nautapy.nauta_api as nauta_api
+from nautapy.exceptions import NautaLoginException
+from nautapy.login_context import LoginContextCache
+from nautapy.nauta_api import NautaClient, SessionObject
+
+_assets_dir = os.path.join(
+    os.path.dirname(__file__),
+    "assets"
+)
+
+
+def read_asset(asset_name):
+    with open(os.path.join(_assets_dir, asset_name)) as fp:
+        return fp.read()
+
+
+LANDING_HTML = read_asset("landing.html")
+LOGIN_HTML = read_asset("login_page.html")
+LOGIN_FAILED_HTML = read_asset("login_failed.html")
+
+LOGIN_ACTION = "https://secure.etecsa.net:8443//LoginServlet"
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    monkeypatch.setattr(nauta_api.NautaProtocol, "is_connected", classmethod(lambda cls: False))
+
+
+@pytest.fixture()
+def cache(tmp_path):
+    return LoginContextCache(path=str(tmp_path / "nauta-login-context"), max_age=60)
+
+
+def cached_session():
+    session = SessionObject(
+        login_action=LOGIN_ACTION, csrfhw="cached-csrfhw", wlanuserip="10.0.0.1"
+    )
+    session.import_cookies([{
+        "name": "JSESSIONID", "value": "abc", "domain": "secure.etecsa.net",
+        "path": "/", "secure": True, "expires": None,
+    }])
+    return session
+
+
+def mock_portal(mock):
+    mock.get("https://secure.etecsa.net:8443", text=LANDING_HTML)
+    mock.post("https://secure.etecsa.net:8443", text=LOGIN_HTML)
+
+
+def test_take_returns_stored_context_once(cache):
+    cache.store(cached_session())
+    assert cache.is_valid()
+
+    session = cache.take()
+
+    assert session.csrfhw == "cached-csrfhw"
+    assert session.login_action == LOGIN_ACTION
+    assert [(c.name, c.value) for c in session.requests_session.cookies] == [("JSESSIONID", "abc")]
+    assert cache.take() is None
+
+
+def test_expired_context_is_not_used(cache):
+    cache.store(cached_session())
+    cache.max_age = 0
+
+    assert not cache.is_valid()
+    assert cache.take() is None
+
+
+def test_client_with_prewarmed_context_only_posts_credentials(cache):
+    cache.store(cached_session())
+    client = NautaClient("pepe@nauta.com.cu", "pass", login_context=cache)
+
+    with RequestMocker() as mock:
+        mock_portal(mock)
+        login = mock.post(LOGIN_ACTION, text="ATTRIBUTE_UUID=UUID1&CSRFHW=x",
+                          headers={"Location": "/online.do?x"}, status_code=302)
+        mock.get("https://secure.etecsa.net:8443/online.do?x",
+                 text="ATTRIBUTE_UUID=UUID1&CSRFHW=x")
+        client.login()
+
+    assert client.session.attribute_uuid == "UUID1"
+    assert login.call_count == 1
+    assert "CSRFHW=cached-csrfhw" in login.last_request.text
+    assert login.last_request.headers["Cookie"] == "JSESSIONID=abc"
+    assert [r.method for r in mock.request_history] == ["POST", "GET"]
+
+
+def test_client_falls_back_when_context_is_stale(cache):
+    cache.store(cached_session())
+    client = NautaClient("pepe@nauta.com.cu", "pass", login_context=cache)
+
+    def login_response(request, context):
+        if "cached-csrfhw" in request.text:
+            # Un contexto caducado devuelve de nuevo la página de entrada
+            return LANDING_HTML
+        context.status_code = 302
+        context.headers["Location"] = "/online.do?x"
+        return ""
+
+    with RequestMocker() as mock:
+        mock_portal(mock)
+        mock.post(LOGIN_ACTION, text=login_response)
+        mock.get("https://secure.etecsa.net:8443/online.do?x",
+                 text="ATTRIBUTE_UUID=UUID2&CSRFHW=x")
+        client.login()
+
+    assert client.session.attribute_uuid == "UUID2"
+    assert client.session.csrfhw == "1fe3ee0634195096337177a0994723fb"
+
+
+def test_client_does_not_retry_rejected_credentials(cache):
+    cache.store(cached_session())
+    client = NautaClient("pepe@nauta.com.cu", "bad", login_context=cache)
+
+    with RequestMocker() as mock:
+        mock_portal(mock)
+        login = mock.post(LOGIN_ACTION, text=LOGIN_FAILED_HTML)
+        with pytest.raises(NautaLoginException, match="correctos"):
+            client.login()
+
+    assert login.call_count == 1
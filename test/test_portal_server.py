@@ -0,0 +1,186 @@
+import asyncio
+import time
+
+import pytest
+import requests
+
+import nautapy.nauta_api as nauta_api
+from nautapy.aio_nauta_api import AsyncNautaClient, AsyncNautaProtocol
+from nautapy.exceptions import NautaLoginException, NautaPreLoginException
+from nautapy.nauta_api import NautaClient, NautaProtocol
+from nautapy.retry import RetryPolicy
+from test.portal_server import Fault
+
+USER = "pepe@nauta.com.cu"
+PASSWORD = "secreto"
+
+
+def test_login_query_logout(portal):
+    client = NautaClient(USER, PASSWORD)
+    assert not NautaProtocol.is_connected()
+
+    client.login()
+    assert client.session.attribute_uuid in portal.state.online
+    assert NautaProtocol.is_connected()
+    assert client.remaining_time in ("02:00:00", "01:59:59")
+
+    with pytest.raises(NautaPreLoginException):
+        NautaClient(USER, PASSWORD).login()
+
+    client.logout()
+    assert not portal.state.online
+    assert not client.is_logged_in
+
+
+def test_last_session_is_closed_from_another_client(portal):
+    NautaClient(USER, PASSWORD).login()
+
+    client = NautaClient(None, None)
+    client.load_last_session()
+    client.user = client.session.username
+    client.logout()
+
+    assert not portal.state.online
+
+
+def test_async_client_uses_the_same_connectivity_probes(portal):
+    assert asyncio.run(AsyncNautaProtocol.is_connected()) is False
+
+    client = NautaClient(USER, PASSWORD).login()
+    assert asyncio.run(AsyncNautaProtocol.is_connected()) is True
+    client.logout()
+
+
+def test_wrong_password(portal):
+    with pytest.raises(NautaLoginException) as ex:
+        NautaClient(USER, "otra").login()
+
+    assert "Entre el nombre de usuario" in ex.value.args[0]
+    assert not portal.state.online
+
+
+def test_user_credit_while_offline(portal):
+    assert NautaClient(USER, PASSWORD).user_credit == "12,34 CUP"
+
+
+def test_async_client(portal):
+    async def run():
+        async with AsyncNautaClient(USER, PASSWORD) as client:
+            await client.login()
+            assert portal.state.online
+            assert await client.get_remaining_time() in ("02:00:00", "01:59:59")
+        assert not portal.state.online
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("fault, exception", [
+    (Fault("error", route="/LoginServlet", times=1, status=500), NautaLoginException),
+    (Fault("alert", route="/LoginServlet", times=1), NautaLoginException),
+    (Fault("drop", route="/", times=1), requests.ConnectionError),
+])
+def test_login_faults(portal, fault, exception):
+    portal.state.faults.append(fault)
+
+    with pytest.raises(exception):
+        NautaClient(USER, PASSWORD).login()
+
+    # El fallo se inyecta una sola vez
+    NautaClient(USER, PASSWORD).login()
+    assert portal.state.online
+
+
+def test_slow_body_and_latency(portal):
+    portal.state.faults += [
+        Fault("slow_body", route="/", delay=0.01, chunk_size=1024),
+        Fault("latency", route="/LoginServlet", delay=0.2),
+    ]
+
+    started = time.monotonic()
+    NautaClient(USER, PASSWORD).login()
+
+    assert time.monotonic() - started >= 0.2
+    assert portal.state.online
+
+
+def test_logout_is_retried_after_dropped_connection(portal):
+    sleeps = []
+    policy = RetryPolicy(probe=nauta_api.portal_reachable, sleep=sleeps.append, rand=lambda: 0)
+    client = NautaClient(USER, PASSWORD, retry_policy=policy).login()
+    portal.state.faults.append(Fault("drop", route="/LogoutServlet", times=2))
+
+    client.logout()
+
+    # El portal responde, así que solo se espera el backoff
+    assert sleeps == [0.5, 1.0]
+    assert not portal.state.online
+
+
+def test_async_logout_is_retried_after_dropped_connection(portal):
+    async def run():
+        policy = RetryPolicy(initial_delay=0.01)
+        async with AsyncNautaClient(USER, PASSWORD, retry_policy=policy) as client:
+            await client.login()
+            portal.state.faults.append(Fault("drop", route="/LogoutServlet", times=1))
+            await client.logout()
+
+    asyncio.run(run())
+    assert not portal.state.online
+
+
+def test_create_session_is_retried_with_login_retry_policy(portal):
+    portal.state.faults.append(Fault("drop", route="/", times=1))
+    policy = RetryPolicy(deadline=5, initial_delay=0.01)
+
+    NautaClient(USER, PASSWORD, login_retry_policy=policy).login()
+    assert portal.state.online
+
+
+def test_fault_parse():
+    fault = Fault.parse("error:/LoginServlet:2:500")
+    assert (fault.kind, fault.route, fault.times, fault.status) == ("error", "/LoginServlet", 2, 500)
+
+    fault = Fault.parse("latency")
+    assert (fault.kind, fault.route, fault.times) == ("latency", None, None)
+
+    with pytest.raises(ValueError):
+        Fault.parse("explode")
+
+
+def test_run_connected_queries_remaining_time_after_logout(portal, monkeypatch):
+    from types import SimpleNamespace
+
+    from nautapy import cli
+
+    balances = []
+    monkeypatch.setattr(cli, "_get_credentials", lambda args: (USER, PASSWORD))
+    monkeypatch.setattr(nauta_api, "save_balances", balances.extend)
+    monkeypatch.setattr(cli.os, "system", lambda cmd: 0)
+    args = SimpleNamespace(
+        no_daemon=True, retry_deadline=0, login_retry_deadline=0, time_resync=0,
+        time_unit=None, linger=False, cmd=["true"],
+    )
+
+    cli.run_connected(args)
+
+    # Una sola consulta, con la sesión ya cerrada
+    assert portal.state.requests[-2:] == [("POST", "/LogoutServlet"), ("POST", "/EtecsaQueryServlet")]
+    assert portal.state.requests.count(("POST", "/EtecsaQueryServlet")) == 1
+    assert [user for user, _ in balances] == [USER]
+    assert balances[0][1] in (7200, 7199)
+
+
+def test_down_stores_balance(portal, monkeypatch, capsys):
+    from types import SimpleNamespace
+
+    from nautapy import cli
+
+    balances = []
+    monkeypatch.setattr(nauta_api, "save_balances", balances.extend)
+    NautaClient(USER, PASSWORD).login()
+
+    cli.down(SimpleNamespace(no_daemon=True, retry_deadline=0, login_retry_deadline=0, time_resync=0))
+
+    assert not portal.state.online
+    assert [user for user, _ in balances] == [USER]
+    assert "Tiempo restante: " in capsys.readouterr().out
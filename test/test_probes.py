@@ -0,0 +1,105 @@
+import time
+
+import pytest
+from requests_mock import Mocker as RequestMocker
+
+from nautapy.probes import ConnectivityDetector, NoContentProbe, PagePrefixProbe, Probe
+
+LOGIN_DOMAIN = b"secure.etecsa.net"
+
+
+class FakeProbe(Probe):
+    def __init__(self, verdict, delay=0.0):
+        self.verdict = verdict
+        self.delay = delay
+        self.calls = 0
+
+    def check(self, timeout):
+        self.calls += 1
+        time.sleep(self.delay)
+        return self.verdict
+
+
+def test_detector_returns_first_decisive_verdict():
+    slow = FakeProbe(False, delay=1)
+    detector = ConnectivityDetector([slow, FakeProbe(None), FakeProbe(True, delay=0.01)])
+
+    started = time.monotonic()
+    assert detector.probe() is True
+    assert time.monotonic() - started < 0.5
+
+
+def test_detector_without_decisive_verdict_is_offline():
+    detector = ConnectivityDetector([FakeProbe(None), FakeProbe(None)], timeout=0.2)
+    assert detector.probe() is False
+
+    detector = ConnectivityDetector([FakeProbe(True, delay=1)], timeout=0.1)
+    assert detector.probe() is False
+
+
+def test_detector_caches_verdict_for_ttl(tmp_path):
+    cache_file = str(tmp_path / "connectivity-cache")
+    probe = FakeProbe(True)
+    detector = ConnectivityDetector([probe], cache_file=cache_file, cache_ttl=60)
+
+    assert detector.is_connected() and detector.is_connected()
+    assert probe.calls == 1
+
+    detector.remember(False)
+    assert detector.is_connected() is False
+    assert probe.calls == 1
+
+    detector.invalidate()
+    assert detector.is_connected() is True
+    assert probe.calls == 2
+
+
+def test_detector_without_ttl_always_probes(tmp_path):
+    cache_file = tmp_path / "connectivity-cache"
+    probe = FakeProbe(True)
+    detector = ConnectivityDetector([probe], cache_file=str(cache_file))
+
+    detector.is_connected()
+    detector.is_connected()
+
+    assert probe.calls == 2
+    assert not cache_file.exists()
+
+
+def test_page_probe_detects_captive_portal():
+    probe = PagePrefixProbe("http://check.test/", LOGIN_DOMAIN)
+    with RequestMocker() as mock:
+        mock.get("http://check.test/", text="<form action='https://secure.etecsa.net:8443'>")
+        assert probe.check(timeout=1) is False
+
+        mock.get("http://check.test/", status_code=302,
+                 headers={"Location": "https://secure.etecsa.net:8443/"})
+        assert probe.check(timeout=1) is False
+
+        mock.get("http://check.test/", status_code=301,
+                 headers={"Location": "https://check.test/"})
+        assert probe.check(timeout=1) is True
+
+        mock.get("http://check.test/", text="<html>noticias</html>")
+        assert probe.check(timeout=1) is True
+
+
+def test_no_content_probe():
+    probe = NoContentProbe("http://check.test/generate_204", LOGIN_DOMAIN)
+    with RequestMocker() as mock:
+        mock.get("http://check.test/generate_204", status_code=204)
+        assert probe.check(timeout=1) is True
+
+        mock.get("http://check.test/generate_204", text="secure.etecsa.net")
+        assert probe.check(timeout=1) is False
+
+        mock.get("http://check.test/generate_204", text="otra cosa")
+        assert probe.check(timeout=1) is None
+
+
+def test_probe_requires_check():
+    class Incomplete(Probe):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,95 @@
+import os
+import shutil
+import subprocess
+import time
+
+import psutil
+import pytest
+
+from nautapy import process_tracker
+from nautapy.process_tracker import ProcessTracker
+
+NAME = "nautafakevpn"
+
+
+@pytest.fixture()
+def fake_vpn(tmp_path):
+    """Proceso con un nombre único, copiando el ejecutable de sleep"""
+    executable = str(tmp_path / NAME)
+    shutil.copy(shutil.which("sleep"), executable)
+    proc = subprocess.Popen([executable, "30"])
+    # Espera a que el hijo haya hecho exec y tenga ya su nombre
+    deadline = time.monotonic() + 5
+    while psutil.Process(proc.pid).name() != NAME and time.monotonic() < deadline:
+        time.sleep(0.01)
+    yield proc
+    proc.kill()
+    proc.wait()
+
+
+@pytest.fixture()
+def no_scan(monkeypatch):
+    def scan(self):
+        raise AssertionError("No se debería recorrer la tabla de procesos")
+
+    monkeypatch.setattr(ProcessTracker, "_candidates", scan)
+
+
+class Clock(object):
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_scan_then_cached_pid(fake_vpn, request):
+    tracker = ProcessTracker(NAME)
+    assert tracker.find() == fake_vpn.pid
+
+    request.getfixturevalue("no_scan")
+    assert tracker.find() == fake_vpn.pid
+
+
+def test_pidfile(fake_vpn, tmp_path, no_scan):
+    pidfile = tmp_path / "vpn.pid"
+    pidfile.write_text("{}\n".format(fake_vpn.pid))
+
+    tracker = ProcessTracker(NAME, pidfiles=(str(tmp_path / "*.pid"),))
+    assert tracker.is_running()
+
+
+def test_stale_pidfile_falls_back_to_scan(fake_vpn, tmp_path):
+    (tmp_path / "vpn.pid").write_text(str(os.getpid()))
+
+    tracker = ProcessTracker(NAME, pidfiles=(str(tmp_path / "*.pid"),))
+    assert tracker.find() == fake_vpn.pid
+
+
+def test_missing_process_is_remembered(fake_vpn, request):
+    clock = Clock()
+    tracker = ProcessTracker(NAME, negative_ttl=5, clock=clock)
+    assert tracker.is_running()
+
+    fake_vpn.kill()
+    fake_vpn.wait()
+    assert not tracker.is_running()
+
+    request.getfixturevalue("no_scan")
+    clock.now = 4
+    assert not tracker.is_running()
+
+    clock.now = 6
+    with pytest.raises(AssertionError):
+        tracker.is_running()
+
+
+def test_scan_without_procfs(fake_vpn, monkeypatch):
+    monkeypatch.setattr(process_tracker, "PROC_DIR", "/nonexistent")
+    assert ProcessTracker(NAME).find() == fake_vpn.pid
+
+
+def test_reused_pid_is_not_trusted(fake_vpn):
+    tracker = ProcessTracker(NAME)
+
+    assert tracker._validate(fake_vpn.pid)
+    assert tracker._validate(fake_vpn.pid, create_time=0) is None
@@ -0,0 +1,218 @@
+import asyncio
+
+import pytest
+
+from nautapy.exceptions import NautaLoginException, NautaPreLoginException
+from nautapy.proxy import ProxyServer, SessionManager
+
+
+class FakeClient(object):
+    user = "pepe@nauta.com.cu"
+
+    def __init__(self, login_error=None):
+        self.login_error = login_error
+        self.logins = 0
+        self.logouts = 0
+
+    def login(self):
+        if self.login_error:
+            raise self.login_error
+        self.logins += 1
+        return self
+
+    def logout(self):
+        self.logouts += 1
+
+
+async def start_echo_server():
+    async def echo(reader, writer):
+        while True:
+            data = await reader.read(1024)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(echo, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+async def start_proxy(client, session_is_open=lambda: False, **kwargs):
+    proxy = ProxyServer(
+        SessionManager(client, session_is_open=session_is_open),
+        host="127.0.0.1",
+        port=0,
+        **kwargs
+    )
+    await proxy.start()
+    return proxy
+
+
+async def open_tunnel(proxy, target_port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", proxy.port)
+    writer.write(
+        "CONNECT 127.0.0.1:{0} HTTP/1.1\r\nHost: 127.0.0.1:{0}\r\n\r\n".format(
+            target_port
+        ).encode()
+    )
+    status = await reader.readuntil(b"\r\n\r\n")
+    return reader, writer, status
+
+
+async def close_tunnel(writer):
+    writer.close()
+    await writer.wait_closed()
+    # Deja que el proxy procese el cierre
+    for _ in range(20):
+        await asyncio.sleep(0.01)
+
+
+def test_connections_share_one_session_closed_when_drained():
+    async def run():
+        echo, echo_port = await start_echo_server()
+        client = FakeClient()
+        proxy = await start_proxy(client)
+
+        r1, w1, status = await open_tunnel(proxy, echo_port)
+        assert status.startswith(b"HTTP/1.1 200")
+        r2, w2, _ = await open_tunnel(proxy, echo_port)
+
+        w1.write(b"hola")
+        assert await r1.readexactly(4) == b"hola"
+        assert client.logins == 1 and proxy.sessions.active == 2
+
+        await close_tunnel(w1)
+        assert client.logouts == 0
+
+        await close_tunnel(w2)
+        assert client.logouts == 1 and not proxy.sessions.owns_session
+
+        # Una conexión nueva vuelve a abrir la sesión
+        r3, w3, _ = await open_tunnel(proxy, echo_port)
+        assert client.logins == 2
+        await close_tunnel(w3)
+
+        proxy.server.close()
+        echo.close()
+
+    asyncio.run(run())
+
+
+def test_foreign_session_is_never_closed():
+    async def run():
+        echo, echo_port = await start_echo_server()
+        client = FakeClient()
+        proxy = await start_proxy(client, session_is_open=lambda: True)
+
+        _, writer, status = await open_tunnel(proxy, echo_port)
+        assert status.startswith(b"HTTP/1.1 200")
+        await close_tunnel(writer)
+
+        assert client.logins == 0 and client.logouts == 0
+        proxy.server.close()
+        echo.close()
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("error, expected_status", [
+    (NautaLoginException("Falló el inicio de sesión"), b"HTTP/1.1 502"),
+    (NautaPreLoginException("Hay una conexión activa"), b"HTTP/1.1 200"),
+])
+def test_login_errors(error, expected_status):
+    async def run():
+        echo, echo_port = await start_echo_server()
+        client = FakeClient(login_error=error)
+        proxy = await start_proxy(client)
+
+        _, writer, status = await open_tunnel(proxy, echo_port)
+        assert status.startswith(expected_status)
+        await close_tunnel(writer)
+
+        assert client.logouts == 0
+        proxy.server.close()
+        echo.close()
+
+    asyncio.run(run())
+
+
+def test_plain_http_request_is_forwarded_in_origin_form():
+    async def run():
+        received = asyncio.get_running_loop().create_future()
+
+        async def origin(reader, writer):
+            received.set_result(await reader.readuntil(b"\r\n\r\n"))
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+            await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(origin, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        proxy = await start_proxy(FakeClient())
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", proxy.port)
+        writer.write(
+            "GET http://127.0.0.1:{}/a?b=1 HTTP/1.1\r\nHost: x\r\n"
+            "Proxy-Connection: keep-alive\r\n\r\n".format(port).encode()
+        )
+        response = await reader.read()
+
+        assert response.endswith(b"\r\n\r\nok")
+        request = await received
+        assert request.startswith(b"GET /a?b=1 HTTP/1.1\r\n")
+        assert b"Proxy-Connection" not in request and b"Connection: close" in request
+        proxy.server.close()
+        server.close()
+
+    asyncio.run(run())
+
+
+def test_max_conn_rejects_extra_connections():
+    async def run():
+        echo, echo_port = await start_echo_server()
+        proxy = await start_proxy(FakeClient(), max_conn=1)
+
+        _, w1, status1 = await open_tunnel(proxy, echo_port)
+        _, w2, status2 = await open_tunnel(proxy, echo_port)
+
+        assert status1.startswith(b"HTTP/1.1 200")
+        assert status2.startswith(b"HTTP/1.1 503")
+        await close_tunnel(w1)
+        await close_tunnel(w2)
+        proxy.server.close()
+        echo.close()
+
+    asyncio.run(run())
+
+
+def test_idle_logout_waits_for_unit_boundary_and_is_cancelled_by_new_connection():
+    async def run():
+        echo, echo_port = await start_echo_server()
+        client = FakeClient()
+        proxy = ProxyServer(
+            SessionManager(client, session_is_open=lambda: False, time_unit=1),
+            host="127.0.0.1",
+            port=0,
+        )
+        proxy.sessions.scheduler.margin = 0.2
+        await proxy.start()
+
+        _, w1, _ = await open_tunnel(proxy, echo_port)
+        await close_tunnel(w1)
+        # La unidad cobrada aún no termina: la sesión sigue abierta
+        assert client.logouts == 0 and proxy.sessions.owns_session
+
+        # Una conexión nueva cancela el cierre pendiente
+        _, w2, _ = await open_tunnel(proxy, echo_port)
+        await asyncio.sleep(1)
+        assert client.logins == 1 and client.logouts == 0
+
+        await close_tunnel(w2)
+        await asyncio.sleep(1)
+        assert client.logouts == 1 and not proxy.sessions.owns_session
+
+        proxy.server.close()
+        echo.close()
+
+    asyncio.run(run())
@@ -0,0 +1,98 @@
+import asyncio
+import os
+
+import pytest
+
+from nautapy import relay
+
+MODES = ["buffered"] + (["splice"] if relay.SPLICE_AVAILABLE else [])
+
+
+async def start_echo_server():
+    async def echo(reader, writer):
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(echo, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+GREETING = b"HTTP/1.1 200 Connection established\r\n\r\n"
+
+
+async def start_relay_server(relay_func, target_port, header=False):
+    """
+    Reenvía cada conexión al eco tras responder con ``GREETING``
+
+    Con ``header`` se lee antes una línea, como la petición CONNECT del
+    proxy: los datos que llegaron con ella quedan en el buffer del stream.
+    """
+    async def handle(reader, writer):
+        if header:
+            await reader.readline()
+        writer.write(GREETING)
+        remote_reader, remote_writer = await asyncio.open_connection("127.0.0.1", target_port)
+        try:
+            await relay_func(reader, writer, remote_reader, remote_writer)
+        finally:
+            remote_writer.close()
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("header", [False, True])
+def test_relay_round_trip(mode, header):
+    async def run():
+        echo, echo_port = await start_echo_server()
+        server, port = await start_relay_server(relay.get_relay(mode), echo_port, header)
+
+        payload = os.urandom(1024 * 1024)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+        async def send():
+            # La cabecera y el principio de los datos van en el mismo envío
+            writer.write((b"CONNECT eco\n" if header else b"") + payload)
+            await writer.drain()
+            writer.write_eof()
+
+        _, received = await asyncio.gather(send(), reader.read())
+        assert received == GREETING + payload
+
+        writer.close()
+        server.close()
+        echo.close()
+
+    asyncio.run(run())
+
+
+def test_read_buffered_does_not_wait():
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"abc")
+        reader.feed_data(b"def")
+
+        assert await relay._read_buffered(reader) == b"abcdef"
+        assert await relay._read_buffered(reader) == b""
+
+        # Lo que llega después sigue disponible
+        reader.feed_data(b"ghi")
+        assert await reader.read(10) == b"ghi"
+
+    asyncio.run(run())
+
+
+def test_get_relay_modes():
+    assert relay.get_relay("buffered") is relay.relay_buffered
+    expected = relay.relay_splice if relay.SPLICE_AVAILABLE else relay.relay_buffered
+    assert relay.get_relay("auto") is expected
+
+    with pytest.raises(ValueError):
+        relay.get_relay("zero-copy")
@@ -0,0 +1,151 @@
+import threading
+
+import pytest
+
+from nautapy.nauta_api import NautaClient
+from nautapy.remaining_time import RemainingTimeCache
+
+USER = "pepe@nauta.com.cu"
+PASSWORD = "secreto"
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture()
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture()
+def cache(tmp_path, clock):
+    return RemainingTimeCache(str(tmp_path / "remaining-time"), resync_interval=300, clock=clock)
+
+
+def test_unknown_user_needs_sync(cache):
+    assert cache.estimate(USER, session=None) is None
+
+
+def test_counts_down_while_running(cache, clock):
+    cache.update(USER, 3600, session="uuid1")
+    clock.now += 100
+    assert cache.estimate(USER, session="uuid1") == 3500
+
+
+def test_frozen_while_offline(cache, clock):
+    cache.update(USER, 3600, session=None)
+    clock.now += 100
+    assert cache.estimate(USER, session=None) == 3600
+
+
+def test_resync_after_interval(cache, clock):
+    cache.update(USER, 3600, session="uuid1")
+    clock.now += 300
+    assert cache.estimate(USER, session="uuid1") is None
+
+
+def test_resync_at_session_boundaries(cache):
+    cache.update(USER, 3600, session=None)
+    assert cache.estimate(USER, session="uuid1") is None
+
+    cache.update(USER, 3600, session="uuid1")
+    assert cache.estimate(USER, session=None) is None
+    # down y up de nuevo dentro del intervalo: es otra sesión
+    assert cache.estimate(USER, session="uuid2") is None
+
+
+def test_never_negative(tmp_path, clock):
+    cache = RemainingTimeCache(str(tmp_path / "remaining-time"), resync_interval=9999, clock=clock)
+    cache.update(USER, 60, session="uuid1")
+    clock.now += 120
+    assert cache.estimate(USER, session="uuid1") == 0
+
+
+def test_shared_between_instances(cache, clock):
+    cache.update(USER, 3600, session=None)
+    other = RemainingTimeCache(cache.path, clock=clock)
+    assert other.estimate(USER, session=None) == 3600
+
+
+def test_concurrent_updates_keep_every_user(cache, clock):
+    users = ["user{}@nauta.com.cu".format(i) for i in range(8)]
+
+    def update(user):
+        for seconds in range(20):
+            RemainingTimeCache(cache.path, clock=clock).update(user, seconds, session=None)
+
+    threads = [threading.Thread(target=update, args=(user,)) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [cache.estimate(user, session=None) for user in users] == [19] * len(users)
+
+
+def test_client_queries_portal_only_on_resync(portal, cache, clock):
+    client = NautaClient(USER, PASSWORD, time_cache=cache)
+    client.login()
+
+    assert client.remaining_time in ("02:00:00", "01:59:59")
+    queries = len(portal.state.requests)
+
+    clock.now += 60
+    assert client.remaining_time in ("01:59:00", "01:58:59")
+    assert len(portal.state.requests) == queries
+
+    clock.now += 300
+    client.remaining_time
+    assert len(portal.state.requests) > queries
+
+    client.logout(query_remaining_time=True)
+    assert client.last_remaining_time in ("02:00:00", "01:59:59")
+
+
+def test_new_session_resyncs_and_logout_stores_portal_time(portal, cache, clock):
+    client = NautaClient(USER, PASSWORD, time_cache=cache)
+    client.login()
+    assert client.remaining_time in ("02:00:00", "01:59:59")
+    client.logout(query_remaining_time=True)
+
+    # El portal descuenta el tiempo conectado; el reloj local no avanzó
+    portal.state.time_left[USER] = 3000
+    assert cache.estimate(USER, session=None) is not None
+
+    client.login()
+    queries = len(portal.state.requests)
+    assert client.remaining_time == "00:50:00"
+    assert len(portal.state.requests) == queries + 1
+
+    portal.state.time_left[USER] = 2000
+    client.logout(query_remaining_time=True)
+    assert client.last_remaining_time == "00:33:20"
+    assert cache.estimate(USER, session=None) == 2000
+
+
+def test_logout_queries_remaining_time_only_on_request(portal):
+    client = NautaClient(USER, PASSWORD)
+    client.login()
+    client.logout()
+
+    assert portal.state.requests[-1] == ("POST", "/LogoutServlet")
+    assert ("POST", "/EtecsaQueryServlet") not in portal.state.requests
+    assert client.last_remaining_time is None
+
+
+def test_up_countdown_without_portal(monkeypatch):
+    from nautapy import cli
+
+    now = [5000.0]
+    monkeypatch.setattr(cli.time, "time", lambda: now[0])
+
+    remaining = cli._remaining_countdown("01:00:00")
+    now[0] += 90
+    assert remaining() == 3510
+
+    assert cli._remaining_countdown("No se pudo obtener el tiempo") is None
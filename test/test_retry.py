@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+from requests import ConnectionError
+
+from nautapy.retry import RetryPolicy
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def failing(times, result="ok"):
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) <= times:
+            raise ConnectionError("sin red")
+        return result
+
+    return func, calls
+
+
+def make_policy(clock, **kwargs):
+    kwargs.setdefault("rand", lambda: 0)
+    return RetryPolicy(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_backoff_grows_up_to_max_delay():
+    policy = RetryPolicy(initial_delay=0.5, max_delay=4, rand=lambda: 0)
+    assert [policy.backoff(n) for n in range(1, 6)] == [0.5, 1, 2, 4, 4]
+
+
+def test_jitter_shortens_the_delay():
+    policy = RetryPolicy(initial_delay=2, jitter=0.5, rand=lambda: 1)
+    assert policy.backoff(1) == 1
+
+
+def test_retries_until_success():
+    clock = FakeClock()
+    func, calls = failing(3)
+
+    assert make_policy(clock).call(func) == "ok"
+    assert len(calls) == 4
+    assert clock.sleeps == [0.5, 1, 2]
+
+
+def test_deadline_reraises_last_error():
+    clock = FakeClock()
+    func, calls = failing(100)
+
+    with pytest.raises(ConnectionError):
+        make_policy(clock, deadline=10).call(func)
+
+    assert clock.now == 10
+    assert sum(clock.sleeps) == 10
+
+
+def test_zero_deadline_is_a_single_attempt():
+    clock = FakeClock()
+    func, calls = failing(1)
+
+    with pytest.raises(ConnectionError):
+        make_policy(clock, deadline=0).call(func)
+    assert len(calls) == 1
+
+
+def test_other_exceptions_are_not_retried():
+    def func():
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        make_policy(FakeClock()).call(func)
+
+
+def test_retries_as_soon_as_portal_is_back():
+    clock = FakeClock()
+    # El portal vuelve a responder en t=1.5
+    policy = make_policy(
+        clock, initial_delay=8, probe_interval=0.5, probe=lambda: clock.now >= 1.5
+    )
+    func, calls = failing(1)
+
+    assert policy.call(func) == "ok"
+    assert clock.now == 1.5
+
+
+def test_on_retry_is_called_for_each_failure():
+    failures = []
+    func, calls = failing(2)
+
+    make_policy(FakeClock()).call(func, on_retry=lambda ex, attempt: failures.append(attempt))
+    assert failures == [1, 2]
+
+
+def test_acall():
+    func, calls = failing(2)
+
+    async def coro():
+        return func()
+
+    policy = RetryPolicy(initial_delay=0.001, rand=lambda: 0)
+    assert asyncio.run(policy.acall(coro, retry_on=(ConnectionError,))) == "ok"
+    assert len(calls) == 3
@@ -0,0 +1,63 @@
+import pytest
+
+from nautapy.scheduler import SessionScheduler
+
+
+def test_without_time_unit_deadlines_are_exact():
+    scheduler = SessionScheduler(started_at=1000)
+
+    assert scheduler.session_deadline(300) == 1300
+    assert scheduler.idle_deadline(now=1042) == 1042
+    assert scheduler.billed_units(now=1042) is None
+
+
+@pytest.mark.parametrize("session_time, expected", [
+    (1, 1110),
+    (110, 1110),
+    # Dentro del margen se pasa a la unidad siguiente
+    (115, 1230),
+    (120, 1230),
+    (121, 1230),
+    (600, 1710),
+])
+def test_session_deadline_extends_to_unit_boundary(session_time, expected):
+    scheduler = SessionScheduler(time_unit=120, started_at=1000, margin=10)
+
+    assert scheduler.session_deadline(session_time) == expected
+
+
+@pytest.mark.parametrize("now, expected", [
+    # Al principio de la unidad se aprovecha el resto de la unidad
+    (1000, 1110),
+    (1130, 1230),
+    # Dentro del margen ya no se espera
+    (1112, 1112),
+    (1119, 1119),
+    # Justo en el límite empieza a cobrarse la unidad siguiente
+    (1120, 1230),
+])
+def test_idle_deadline_lands_before_current_unit_boundary(now, expected):
+    scheduler = SessionScheduler(time_unit=120, started_at=1000, margin=10)
+
+    assert scheduler.idle_deadline(now=now) == expected
+
+
+def test_billed_units_counts_started_unit():
+    scheduler = SessionScheduler(time_unit=120, started_at=1000)
+
+    assert scheduler.billed_units(now=1000) == 1
+    assert scheduler.billed_units(now=1120) == 1
+    assert scheduler.billed_units(now=1121) == 2
+
+
+def test_start_uses_clock_and_margin_is_bounded():
+    scheduler = SessionScheduler(time_unit=10, margin=30, clock=lambda: 500).start()
+
+    assert scheduler.started_at == 500
+    assert scheduler.margin == 5
+    assert scheduler.idle_deadline() == 505
+
+
+def test_invalid_time_unit():
+    with pytest.raises(ValueError):
+        SessionScheduler(time_unit=0)
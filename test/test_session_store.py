@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+
+import httpx
+import pytest
+
+import nautapy.nauta_api as nauta_api
+from nautapy import utils
+from nautapy.aio_nauta_api import AsyncSessionObject
+from nautapy.nauta_api import SessionObject
+
+COOKIE = {
+    "name": "JSESSIONID",
+    "value": "abc",
+    "domain": "secure.etecsa.net",
+    "path": "/",
+    "secure": True,
+    "expires": None,
+}
+
+
+def saved_session(username="pepe@nauta.com.cu"):
+    session = SessionObject(login_action="/LoginServlet", csrfhw="x", wlanuserip="10.0.0.1")
+    session.attribute_uuid = "uuid"
+    session.import_cookies([COOKIE])
+    session.save(username)
+    return session
+
+
+def test_one_record_with_the_cookies(session_file):
+    saved_session()
+
+    assert sorted(os.listdir(os.path.dirname(session_file))) == ["nauta-session", "nauta-session.lock"]
+    with open(session_file) as fp:
+        data = json.load(fp)
+    assert data["username"] == "pepe@nauta.com.cu"
+    assert data["cookies"] == [COOKIE]
+
+
+def test_load_restores_the_cookies():
+    saved_session()
+
+    session = SessionObject.load()
+    assert (session.attribute_uuid, session.username) == ("uuid", "pepe@nauta.com.cu")
+    assert [(c.name, c.value) for c in session.requests_session.cookies] == [("JSESSIONID", "abc")]
+
+
+def test_async_load_restores_the_cookies():
+    saved_session()
+
+    session = AsyncSessionObject.load(httpx.AsyncClient())
+    assert session.attribute_uuid == "uuid"
+    assert session.requests_session.cookies.get("JSESSIONID") == "abc"
+
+
+def test_record_without_cookies_is_still_loaded(session_file):
+    with open(session_file, "w") as fp:
+        json.dump({"login_action": "/LoginServlet", "csrfhw": "x", "wlanuserip": "10.0.0.1",
+                   "attribute_uuid": "uuid", "username": "pepe@nauta.com.cu"}, fp)
+
+    assert SessionObject.load().attribute_uuid == "uuid"
+
+
+def test_failed_write_keeps_previous_record(session_file, monkeypatch):
+    session = saved_session()
+
+    def crash(src, dst):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(utils.os, "replace", crash)
+    with pytest.raises(OSError):
+        session.save("otro@nauta.com.cu")
+
+    assert SessionObject._read_state()["username"] == "pepe@nauta.com.cu"
+    assert not [name for name in os.listdir(os.path.dirname(session_file)) if name.endswith(".tmp")]
+
+
+def test_dispose_removes_the_record():
+    session = saved_session()
+
+    session.dispose()
+    assert not SessionObject.is_logged_in()
+    assert not list(session.requests_session.cookies)
+    session.dispose()
+
+
+def test_writes_wait_for_the_lock():
+    session = SessionObject(csrfhw="x")
+    writer = threading.Thread(target=session.save, args=("pepe@nauta.com.cu",))
+
+    with nauta_api._session_lock():
+        writer.start()
+        writer.join(0.2)
+        assert writer.is_alive()
+        assert not SessionObject.is_logged_in()
+
+    writer.join()
+    assert SessionObject.is_logged_in()
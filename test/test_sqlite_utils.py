@@ -0,0 +1,269 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from nautapy import sqlite_utils
+
+
+@pytest.fixture(autouse=True)
+def databases(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_utils, "USERS_DB", str(tmp_path / "users.db"))
+    monkeypatch.setattr(sqlite_utils, "CONNECTIONS_DB", str(tmp_path / "connections.db"))
+    yield tmp_path
+    sqlite_utils.close_all()
+
+
+def test_one_connection_per_database_in_wal_mode():
+    conn = sqlite_utils.connections_db()
+
+    assert sqlite_utils.connections_db() is conn
+    assert sqlite_utils.users_db() is not conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    # synchronous=NORMAL
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+
+
+def test_connection_is_reopened_in_forked_process(monkeypatch):
+    conn = sqlite_utils.users_db()
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+
+    assert sqlite_utils.users_db() is not conn
+
+
+def test_users(capsys):
+    sqlite_utils.add_user(SimpleNamespace(user="pepe@nauta.com.cu", password="secreto"))
+    sqlite_utils.add_user(SimpleNamespace(user="juan@nauta.co.cu", password="clave"))
+
+    assert sqlite_utils._get_default_user() == "pepe@nauta.com.cu"
+    sqlite_utils.set_default_user(SimpleNamespace(user="juan@nauta.co.cu"))
+    assert sqlite_utils._get_default_user() == "juan@nauta.co.cu"
+
+    sqlite_utils.set_password(SimpleNamespace(user="pepe@nauta.com.cu", password="nueva"))
+    assert sqlite_utils._find_credentials("pepe") == ("pepe@nauta.com.cu", "nueva")
+
+    sqlite_utils.remove_user(SimpleNamespace(user="pepe@nauta.com.cu"))
+    assert sqlite_utils._find_credentials("pepe", "x") == ("pepe", "x")
+
+    # Los cambios son visibles desde otras conexiones
+    other = sqlite3.connect(sqlite_utils.USERS_DB)
+    assert other.execute("SELECT user FROM users").fetchall() == [("juan@nauta.co.cu",)]
+    other.close()
+
+
+def test_most_time_user_uses_balance_index(capsys):
+    assert sqlite_utils._most_time_user() is None
+
+    for user in ("pepe@nauta.com.cu", "juan@nauta.co.cu", "ana@nauta.com.cu"):
+        sqlite_utils.add_user(SimpleNamespace(user=user, password="secreto"))
+    sqlite_utils.save_balances([("pepe@nauta.com.cu", 600), ("juan@nauta.co.cu", 3600)])
+    sqlite_utils.save_balances([("ana@nauta.com.cu", 0), ("otro@nauta.com.cu", 9999)])
+
+    user, seconds, _ = sqlite_utils._most_time_user()
+    assert (user, seconds) == ("juan@nauta.co.cu", 3600)
+
+    # La cuenta eliminada deja de elegirse
+    sqlite_utils.remove_user(SimpleNamespace(user="juan@nauta.co.cu"))
+    assert sqlite_utils._most_time_user()[0] == "pepe@nauta.com.cu"
+
+    plan = sqlite_utils.users_db().execute(
+        "EXPLAIN QUERY PLAN SELECT user FROM balances ORDER BY seconds DESC"
+    ).fetchall()
+    assert "balances_seconds" in str(plan)
+
+
+def test_login_logout_from_several_threads():
+    users = ["user{}@nauta.com.cu".format(i) for i in range(8)]
+
+    def session(user):
+        sqlite_utils.save_login(user)
+        sqlite_utils.save_logout(user)
+
+    threads = [threading.Thread(target=session, args=(user,)) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    connections = sqlite_utils.list_connections(None)
+    assert sorted(row[0] for row in connections) == users
+    assert all(row[2] for row in connections)
+    assert len(sqlite_utils.list_connections_current_month(None)) == len(users)
+
+
+def test_legacy_connections_db_is_migrated(databases):
+    legacy = sqlite3.connect(sqlite_utils.CONNECTIONS_DB)
+    legacy.execute(
+        "CREATE TABLE connections "
+        "(user TEXT, fecha_inicio_sesion DATETIME, fecha_cierre_sesion DATETIME)"
+    )
+    legacy.execute(
+        "INSERT INTO connections VALUES (?, ?, ?)",
+        ("pepe@nauta.com.cu", datetime(2024, 3, 1, 10, 0), datetime(2024, 3, 1, 11, 30, 0, 123)),
+    )
+    legacy.execute(
+        "INSERT INTO connections VALUES (?, ?, NULL)",
+        ("pepe@nauta.com.cu", datetime(2024, 3, 2, 8, 0)),
+    )
+    legacy.commit()
+    legacy.close()
+
+    conn = sqlite_utils.connections_db()
+
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == sqlite_utils.CONNECTIONS_SCHEMA_VERSION
+    rows = conn.execute("SELECT inicio_ts, cierre_ts FROM connections ORDER BY rowid").fetchall()
+    assert rows == [
+        (int(datetime(2024, 3, 1, 10, 0).timestamp()), int(datetime(2024, 3, 1, 11, 30).timestamp())),
+        (int(datetime(2024, 3, 2, 8, 0).timestamp()), None),
+    ]
+    assert sqlite_utils.list_connections_between(*sqlite_utils._month_range(2024, 3)) == [
+        ("pepe@nauta.com.cu", "2024-03-01 10:00:00", "2024-03-01 11:30:00.000123"),
+        ("pepe@nauta.com.cu", "2024-03-02 08:00:00", None),
+    ]
+    assert sqlite_utils.list_connections_between(*sqlite_utils._month_range(2024, 4)) == []
+
+
+def test_save_logout_closes_latest_open_connection():
+    conn = sqlite_utils.connections_db()
+    with conn:
+        conn.executemany(
+            "INSERT INTO connections (user, inicio_ts) VALUES (?, ?)",
+            [("pepe", 100), ("pepe", 300), ("juan", 400), ("pepe", 200)],
+        )
+
+    sqlite_utils.save_logout("pepe")
+
+    closed = conn.execute(
+        "SELECT user, inicio_ts FROM connections WHERE cierre_ts IS NOT NULL"
+    ).fetchall()
+    assert closed == [("pepe", 300)]
+
+
+def test_month_and_user_queries_use_indexes():
+    conn = sqlite_utils.connections_db()
+
+    def plan(sql, params):
+        return " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+    assert "USING INDEX connections_inicio" in plan(
+        "SELECT * FROM connections WHERE inicio_ts >= ? AND inicio_ts < ? ORDER BY inicio_ts",
+        (0, 1),
+    )
+    assert "USING INDEX connections_user_inicio" in plan(
+        "SELECT rowid FROM connections WHERE user = ? AND cierre_ts IS NULL "
+        "ORDER BY inicio_ts DESC LIMIT 1",
+        ("pepe",),
+    )
+
+
+def test_save_logout_updates_monthly_usage():
+    conn = sqlite_utils.connections_db()
+    start = int(datetime(2024, 5, 10, 8, 0).timestamp())
+    with conn:
+        conn.executemany(
+            "INSERT INTO connections (user, inicio_ts) VALUES (?, ?)",
+            [("pepe", start), ("juan", start)],
+        )
+
+    sqlite_utils.save_logout("pepe")
+    sqlite_utils.save_logout("pepe")  # Sin conexiones abiertas no cambia nada
+
+    usage = sqlite_utils.monthly_usage()
+    closed_at = conn.execute("SELECT cierre_ts FROM connections WHERE user = 'pepe'").fetchone()[0]
+    assert usage == [("pepe", "2024-05", closed_at - start, 1)]
+
+    # El resumen incremental coincide con el recalculado
+    sqlite_utils.rebuild_monthly_usage()
+    assert sqlite_utils.monthly_usage() == usage
+
+
+def test_migration_builds_monthly_usage(databases):
+    legacy = sqlite3.connect(sqlite_utils.CONNECTIONS_DB)
+    legacy.execute(
+        "CREATE TABLE connections "
+        "(user TEXT, fecha_inicio_sesion DATETIME, fecha_cierre_sesion DATETIME)"
+    )
+    legacy.executemany("INSERT INTO connections VALUES (?, ?, ?)", [
+        ("pepe", datetime(2024, 3, 1, 10, 0), datetime(2024, 3, 1, 11, 30)),
+        ("pepe", datetime(2024, 3, 5, 10, 0), datetime(2024, 3, 5, 10, 15)),
+        ("pepe", datetime(2024, 4, 1, 10, 0), datetime(2024, 4, 1, 12, 0)),
+        ("juan", datetime(2024, 3, 9, 10, 0), None),
+    ])
+    legacy.commit()
+    legacy.close()
+
+    assert sqlite_utils.monthly_usage() == [
+        ("pepe", "2024-04", 7200, 1),
+        ("pepe", "2024-03", 6300, 2),
+    ]
+
+
+def test_resume_connections_reads_rollup(capsys):
+    from nautapy.cli import resume_connections
+
+    conn = sqlite_utils.connections_db()
+    with conn:
+        conn.execute(
+            "INSERT INTO monthly_usage VALUES ('pepe', '2024-03', 6300, 2), ('pepe', '2024-04', 120, 1)"
+        )
+
+    resume_connections(None)
+
+    lines = capsys.readouterr().out.splitlines()
+    assert "| pepe" in lines[2] and "2024" in lines[2] and "2 minutos" in lines[2]
+    assert "1 hora 45 minutos" in lines[4]
+
+
+def test_list_connections_cli_streams_table(capsys):
+    from nautapy.cli import list_connections_cli
+
+    conn = sqlite_utils.connections_db()
+    with conn:
+        conn.executemany(
+            "INSERT INTO connections (user, fecha_inicio_sesion, fecha_cierre_sesion, inicio_ts) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                ("pepe@nauta.com.cu", "2024-03-01 10:00:00.123", "2024-03-01 11:00:00.5", 2),
+                ("juan", "2024-03-02 10:00:00", None, 1),
+            ],
+        )
+
+    args = SimpleNamespace(last_month=False, all_conn=True, resume_conn=False)
+    list_connections_cli(args)
+
+    assert capsys.readouterr().out.splitlines() == [
+        "| Usuario           | Fecha inicio sesión | Fecha cierre sesión |",
+        "+-------------------+---------------------+---------------------+",
+        "| juan              | 2024-03-02 10:00:00 | N/A                 |",
+        "+-------------------+---------------------+---------------------+",
+        "| pepe@nauta.com.cu | 2024-03-01 10:00:00 | 2024-03-01 11:00:00 |",
+        "+-------------------+---------------------+---------------------+",
+    ]
+
+    list_connections_cli(SimpleNamespace(last_month=True, all_conn=False, resume_conn=False))
+    assert capsys.readouterr().out == "No se encontraron conexiones.\n"
+
+
+def test_rebuilt_monthly_usage():
+    conn = sqlite_utils.connections_db()
+    rows = [
+        ("pepe", datetime(2024, 3, 1, 10, 0), datetime(2024, 3, 1, 11, 30)),
+        ("pepe", datetime(2024, 3, 31, 23, 30), datetime(2024, 4, 1, 0, 30)),
+        ("juan", datetime(2024, 4, 2, 10, 0), datetime(2024, 4, 2, 10, 1)),
+        ("juan", datetime(2024, 4, 3, 10, 0), None),
+    ]
+    with conn:
+        conn.executemany(
+            "INSERT INTO connections (user, inicio_ts, cierre_ts) VALUES (?, ?, ?)",
+            [(user, int(a.timestamp()), int(b.timestamp()) if b else None) for user, a, b in rows],
+        )
+    sqlite_utils.rebuild_monthly_usage()
+
+    # Los usuarios en el orden de su primera conexión, no alfabético
+    assert sqlite_utils.monthly_usage() == [
+        ("pepe", "2024-03", 9000, 2),
+        ("juan", "2024-04", 60, 1),
+    ]
@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.bench_startup import HEAVY_MODULES, ROOT, parse_importtime
+
+
+@pytest.mark.parametrize("command", [["is-logged-in"], ["users", "list"], ["--list-conn"]])
+def test_offline_commands_do_not_load_network_stack(command, tmp_path):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "nautapy", "--no-daemon"] + command,
+        env=dict(os.environ, HOME=str(tmp_path), PYTHONPATH=ROOT),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True,
+    )
+
+    _, loaded = parse_importtime(proc.stderr)
+    assert "nautapy.cli" in loaded
+    assert not loaded.intersection(HEAVY_MODULES)
+
+
+def test_import_does_not_create_appdata_dir(tmp_path):
+    subprocess.run(
+        [sys.executable, "-c", "import nautapy.cli"],
+        env=dict(os.environ, HOME=str(tmp_path), PYTHONPATH=ROOT),
+        check=True,
+    )
+
+    assert not os.path.exists(tmp_path / ".local")
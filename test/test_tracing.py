@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from nautapy import tracing
+from nautapy.nauta_api import NautaClient
+
+USER = "pepe@nauta.com.cu"
+PASSWORD = "secreto"
+
+
+@pytest.fixture()
+def tracer():
+    yield tracing.enable()
+    tracing.disable()
+
+
+def test_disabled_spans_record_nothing():
+    assert tracing.get_tracer() is None
+    with tracing.span("fase") as span:
+        pass
+    assert span is tracing._NOOP_SPAN
+
+
+def test_nested_spans_and_errors(tracer):
+    @tracing.traced("externa")
+    def outer():
+        with tracing.span("interna", intento=1):
+            pass
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        outer()
+
+    inner, outer_span = tracer.spans
+    assert (inner["name"], inner["parent"], inner["intento"]) == ("interna", "externa", 1)
+    assert (outer_span["name"], outer_span["parent"], outer_span["error"]) == ("externa", None, "ValueError")
+    assert outer_span["duration"] >= inner["duration"]
+
+
+def test_write_jsonl_appends(tracer, tmp_path):
+    path = str(tmp_path / "trace.jsonl")
+    with tracing.span("fase"):
+        pass
+
+    tracer.write_jsonl(path)
+    tracer.write_jsonl(path)
+
+    with open(path) as fp:
+        records = [json.loads(line) for line in fp]
+    assert [record["name"] for record in records] == ["fase", "fase"]
+
+
+def test_prometheus_textfile_accumulates(tmp_path):
+    path = str(tmp_path / "nautapy.prom")
+    for duration in (0.02, 3):
+        tracer = tracing.Tracer()
+        tracer.record({"name": "portal.logout_post", "duration": duration, "error": None})
+        tracer.write_prometheus(path)
+
+    with open(path) as fp:
+        text = fp.read()
+
+    assert 'nautapy_span_duration_seconds_count{span="portal.logout_post"} 2' in text
+    assert 'nautapy_span_duration_seconds_bucket{span="portal.logout_post",le="0.025"} 1' in text
+    assert 'nautapy_span_duration_seconds_bucket{span="portal.logout_post",le="5"} 2' in text
+    assert 'nautapy_span_duration_seconds_sum{span="portal.logout_post"} 3.02' in text
+    assert 'nautapy_span_last_duration_seconds{span="portal.logout_post"} 3.0' in text
+
+
+def test_login_logout_phases(tracer, portal):
+    NautaClient(USER, PASSWORD).login().logout()
+
+    parents = {span["name"]: span["parent"] for span in tracer.spans}
+    assert parents["portal.landing_get"] == "protocol.create_session"
+    assert parents["protocol.create_session"] == "client.login"
+    assert parents["portal.credentials_post"] == "client.login"
+    assert parents["session.save"] == "client.login"
+    assert parents["portal.logout_post"] == "client.logout"
@@ -1,5 +1,9 @@
+import json
+import os
+import threading
+
 from nautapy.exceptions import NautaFormatException
-from nautapy.utils import strtime2seconds, seconds2strtime
+from nautapy.utils import format_table, strtime2seconds, seconds2strtime, write_json_atomic
 import pytest
 
 
@@ -33,3 +37,39 @@ def test_strtime2seconds_raises_format_exception(bad_formated):
 def test_seconds2strtime(strtime, seconds):
     assert seconds2strtime(seconds) == strtime
 
+
+
+def test_write_json_atomic_from_several_threads(tmp_path):
+    path = str(tmp_path / "data")
+    errors = []
+
+    def writer(value):
+        try:
+            for _ in range(50):
+                write_json_atomic(path, {"value": value})
+        except OSError as ex:
+            errors.append(ex)
+
+    threads = [threading.Thread(target=writer, args=(value,)) for value in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    with open(path) as fp:
+        assert json.load(fp)["value"] in range(8)
+    assert os.listdir(str(tmp_path)) == ["data"]
+
+
+def test_format_table():
+    headers = ["Usuario", "Tiempo"]
+    rows = [["pepe@nauta.com.cu", "01:00:00"], ["ana", "00:05:00"]]
+
+    assert format_table(headers, rows).splitlines() == [
+        "| Usuario           | Tiempo   |",
+        "+-------------------+----------+",
+        "| pepe@nauta.com.cu | 01:00:00 |",
+        "| ana               | 00:05:00 |",
+    ]
+    assert format_table(headers, rows, row_separators=True).splitlines()[3::2] == ["+-------------------+----------+"] * 2